@@ -15,8 +15,11 @@ from database.connection import init_database
 from services.auth_service import get_auth_service
 from services.room_service import get_room_service
 from services.socket_service import init_socket_service
-from proxy_server import get_proxy_server
+from services.chat_store import CHAT_PAGE_SIZE_MAX
+from proxy_server import get_proxy_server, flask_session_authorizer
 from utils.validators import sanitize_string
+from utils.logging_config import configure_logging, SOCKETIO_PACKET_LOGGING
+from utils.proxy_tokens import issue_proxy_token, verify_proxy_token
 
 
 app = Flask(__name__)
@@ -26,27 +29,39 @@ if not app.secret_key:
 
 
 IS_PRODUCTION = os.environ.get('FLASK_ENV') == 'production'
+
+# Motor de proxy assíncrono: 'embedded' inicia no próprio processo; com
+# PROXY_ENGINE_URL definido, /proxy/* redireciona para ele (embutido ou separado)
+PROXY_ENGINE_MODE = os.environ.get('PROXY_ENGINE_MODE', 'off')
+PROXY_ENGINE_URL = os.environ.get('PROXY_ENGINE_URL', '').rstrip('/')
+
+# Playlists HLS carregadas pelo proxy (reescrita das URIs e pré-busca de segmentos)
+PROXY_HLS = os.environ.get('PROXY_HLS', '1') == '1'
+
+# Páginas do Netflix carregadas pelo proxy (token de prefixo emitido para salas Netflix)
+NETFLIX_PROXY_BASE = 'https://www.netflix.com'
+
+# Token opcional exigido pelo endpoint /metrics (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 app.config['SESSION_COOKIE_SECURE'] = IS_PRODUCTION
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
 
+# Configuração de logging (fila + thread de escrita, JSON)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True,
+    logger=SOCKETIO_PACKET_LOGGING,
+    engineio_logger=SOCKETIO_PACKET_LOGGING,
     async_mode='threading'
 )
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
 # Instância dos serviços
 auth_service = get_auth_service()
 room_service = get_room_service()
@@ -55,6 +70,10 @@ proxy_server = get_proxy_server()
 # Inicializar serviço de socket
 socket_service = init_socket_service(socketio)
 
+if PROXY_ENGINE_MODE == 'embedded':
+    from services.stream_proxy import start_proxy_engine_thread, any_authorizer, token_authorizer
+    start_proxy_engine_thread(any_authorizer(token_authorizer(), flask_session_authorizer(app.secret_key)))
+
 
 @app.route('/')
 def index():
@@ -79,9 +98,13 @@ def proxy_page():
         if not url:
             return jsonify({'error': 'URL não fornecida'}), 400
         
-        if 'user_id' not in session:
+        if 'user_id' not in session and not verify_proxy_token(request.args.get('token'), url):
             return jsonify({'error': 'Não autenticado'}), 401
         
+        # Streaming sem ocupar uma thread do worker
+        if PROXY_ENGINE_URL:
+            return redirect(f'{PROXY_ENGINE_URL}{request.full_path}', code=307)
+        
         response = proxy_server.proxy_request(url)
         if response:
             return response
@@ -309,13 +332,23 @@ def room_view(room_id):
         }
         provider_info = provider_details.get(room['provider_type'], provider_details['external'])
         
+        # Tokens do proxy: o proxy de mídia os valida sem sessão nem banco
+        proxy_config = {
+            'base_url': PROXY_ENGINE_URL,
+            'stream_token': issue_proxy_token(room['stream_url'], user_id, room_id),
+            'hls': PROXY_HLS
+        }
+        if room['provider_type'] == 'netflix':
+            proxy_config['page_token'] = issue_proxy_token(NETFLIX_PROXY_BASE, user_id, room_id, prefix=True)
+        
         # Preparar dados para o template
         room_data = {
             'room': room,
             'user_id': user_id,
             'user_role': user_role,
             'is_owner': room['owner_id'] == user_id,
-            'provider_info': provider_info  # Nova informação
+            'provider_info': provider_info,  # Nova informação
+            'proxy': proxy_config
         }
         
         # Renderizar template da sala
@@ -341,12 +374,17 @@ def proxy_stream():
         if not url:
             return jsonify({'error': 'URL não fornecida'}), 400
         
-        # Verificar se usuário está autenticado
-        if 'user_id' not in session:
+        # Sessão do app ou token emitido na renderização da sala
+        claims = verify_proxy_token(request.args.get('token'), url)
+        if 'user_id' not in session and not claims:
             return jsonify({'error': 'Não autenticado'}), 401
         
+        # Streaming sem ocupar uma thread do worker
+        if PROXY_ENGINE_URL:
+            return redirect(f'{PROXY_ENGINE_URL}{request.full_path}', code=307)
+        
         # Fazer proxy do stream
-        response = proxy_server.proxy_stream(url)
+        response = proxy_server.proxy_stream(url, claims)
         if response:
             return response
         else:
@@ -582,6 +620,82 @@ def api_join_room():
         }), 500
 
 
+@app.route('/api/rooms/<int:room_id>/messages', methods=['GET'])
+def api_room_messages(room_id):
+    """API de histórico do chat paginado por cursor (before=<id da mensagem>)"""
+    try:
+        # Verificar autenticação
+        if 'user_id' not in session:
+            return jsonify({'error': 'Não autenticado'}), 401
+        
+        # Verificar se usuário está na sala
+        participant_query = room_service.db.execute_query(
+            'SELECT role FROM room_participants WHERE room_id = ? AND user_id = ? AND is_active = 1',
+            (room_id, session['user_id'])
+        )
+        if not participant_query:
+            return jsonify({'error': 'Sem permissão para esta sala'}), 403
+        
+        # Parâmetros de paginação
+        try:
+            before = request.args.get('before')
+            before = int(before) if before else None
+            limit = min(int(request.args.get('limit', 50)), CHAT_PAGE_SIZE_MAX)
+        except ValueError:
+            return jsonify({'error': 'Parâmetros inválidos'}), 400
+        
+        messages, has_more = socket_service.chat_store.get_messages(str(room_id), before=before, limit=limit)
+        
+        return jsonify({
+            'success': True,
+            'messages': messages,
+            'has_more': has_more
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar histórico do chat: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+
+@app.route('/api/rooms/<int:room_id>/chat/retention', methods=['GET', 'PUT'])
+def api_room_chat_retention(room_id):
+    """API de retenção do chat da sala (alteração apenas pelo dono)"""
+    try:
+        # Verificar autenticação
+        if 'user_id' not in session:
+            return jsonify({'error': 'Não autenticado'}), 401
+        
+        room = room_service.get_room_by_id(room_id)
+        if not room:
+            return jsonify({'error': 'Sala não encontrada'}), 404
+        
+        if room['owner_id'] != session['user_id']:
+            return jsonify({'error': 'Apenas o dono da sala pode alterar a retenção'}), 403
+        
+        chat_store = socket_service.chat_store
+        if request.method == 'GET':
+            return jsonify({'success': True, 'retention': chat_store.get_retention(str(room_id))})
+        
+        data = request.get_json() or {}
+        try:
+            max_messages = int(data.get('max_messages'))
+            max_age_days = int(data.get('max_age_days'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Parâmetros inválidos'}), 400
+        
+        if max_messages < 1 or max_age_days < 1:
+            return jsonify({'error': 'A retenção deve ser de pelo menos 1 mensagem e 1 dia'}), 400
+        
+        if not chat_store.set_retention(str(room_id), max_messages, max_age_days):
+            return jsonify({'error': 'Erro ao salvar retenção'}), 500
+        
+        return jsonify({'success': True, 'retention': chat_store.get_retention(str(room_id))})
+        
+    except Exception as e:
+        logger.error(f"Erro na retenção do chat: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+
 @app.route('/api/user/profile')
 def user_profile():
     """API para obter perfil do usuário"""
@@ -618,7 +732,8 @@ def health_check():
             'version': '1.0.0',
             'timestamp': datetime.now().isoformat(),
             'uptime': 'ok',
-            'database': 'connected'
+            'database': 'connected',
+            'rooms': socket_service.get_room_stats()
         }), 200
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -628,6 +743,21 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 503
 
+@app.route('/metrics')
+def metrics():
+    """Métricas dos eventos Socket.IO no formato de texto do Prometheus"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Não autorizado'}), 401
+
+    try:
+        response = make_response(socket_service.render_metrics())
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Erro ao gerar métricas: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @app.route('/api/stats')
 def api_stats():
     """API para estatísticas da plataforma"""
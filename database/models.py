@@ -152,6 +152,41 @@ class DatabaseSchema:
                 CHECK (role IN ('owner', 'moderator', 'participant')),
                 UNIQUE (room_id, user_id)
             )
+            ''',
+            
+            # Tabela de mensagens do chat (IDs atribuídos pela aplicação, em ordem)
+            '''
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY,
+                room_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                
+                -- Foreign Keys
+                FOREIGN KEY (room_id) REFERENCES rooms (id) ON DELETE CASCADE,
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                
+                -- Constraints
+                CHECK (length(message) >= 1 AND length(message) <= 500)
+            )
+            ''',
+            
+            # Retenção do chat por sala (ausente = padrão da aplicação)
+            '''
+            CREATE TABLE IF NOT EXISTS chat_retention (
+                room_id INTEGER PRIMARY KEY,
+                max_messages INTEGER NOT NULL,
+                max_age_days INTEGER NOT NULL,
+                
+                -- Foreign Keys
+                FOREIGN KEY (room_id) REFERENCES rooms (id) ON DELETE CASCADE,
+                
+                -- Constraints
+                CHECK (max_messages >= 1),
+                CHECK (max_age_days >= 1)
+            )
             '''
         ]
     
@@ -177,7 +212,11 @@ class DatabaseSchema:
             'CREATE INDEX IF NOT EXISTS idx_participants_room ON room_participants(room_id)',
             'CREATE INDEX IF NOT EXISTS idx_participants_user ON room_participants(user_id)',
             'CREATE INDEX IF NOT EXISTS idx_participants_joined ON room_participants(joined_at)',
-            'CREATE INDEX IF NOT EXISTS idx_participants_active ON room_participants(is_active)'
+            'CREATE INDEX IF NOT EXISTS idx_participants_active ON room_participants(is_active)',
+            
+            # Paginação por cursor (room_id, id) e retenção por data
+            'CREATE INDEX IF NOT EXISTS idx_chat_room_id ON chat_messages(room_id, id)',
+            'CREATE INDEX IF NOT EXISTS idx_chat_room_created ON chat_messages(room_id, created_at)'
         ]
     
     @staticmethod
@@ -5,11 +5,62 @@ Streamhive Proxy Server
 Servidor proxy para evitar mixed content com URLs HTTP
 """
 
+import os
+import argparse
+import threading
 import requests
-from flask import Response, request, stream_template
+from dotenv import load_dotenv
+from flask import Flask, Response, request, stream_template
+from werkzeug.wsgi import wrap_file
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadSignature
 import logging
+from collections import OrderedDict
 from urllib.parse import urlparse
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.logging_config import configure_logging
+from services.hls import HLS_PLAYLIST_MAX_BYTES, is_playlist, rewrite_playlist, proxied_url_builder
+from services.segment_cache import normalize_range, segment_cache
+from services.segment_prefetch import ThreadedSegmentPrefetcher
+from services.disk_cache import DiskEntry, disk_cache, response_extent
+from services.single_flight import SingleFlight, StreamTee, TeeRegistry, TeeSubscriber
+from services.mp4_index import Mp4Error, Mp4Index, load_index
+from services.upstream_pool import upstream_pool
+from services.metadata_cache import MetadataCache
+
+
+# Cabeçalhos do cliente repassados ao upstream no proxy de stream
+FORWARDED_REQUEST_HEADERS = ('Range', 'If-Range')
+
+# Cabeçalhos do upstream repassados ao cliente como vieram
+PASSTHROUGH_RESPONSE_HEADERS = (
+    'Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified'
+)
+
+# Timeouts do upstream (segundos): conexão e intervalo máximo entre leituras
+PROXY_CONNECT_TIMEOUT = float(os.environ.get('PROXY_CONNECT_TIMEOUT', 10))
+PROXY_READ_TIMEOUT = float(os.environ.get('PROXY_READ_TIMEOUT', 30))
+
+# Tamanho dos blocos lidos do upstream e escritos ao cliente
+PROXY_CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))
+
+# Após um seek, segundos de mídia trazidos para o cache em disco antes dos clientes pedirem
+PROXY_SEEK_PREFETCH_SECONDS = float(os.environ.get('PROXY_SEEK_PREFETCH_SECONDS', 10))
+
+# Teto de bytes pré-buscados por seek
+PROXY_SEEK_PREFETCH_MAX_BYTES = int(os.environ.get('PROXY_SEEK_PREFETCH_MAX_BYTES', 16 * 1024 * 1024))
+
+# Pré-buscas de seek simultâneas (as excedentes são descartadas)
+PROXY_SEEK_PREFETCH_CONCURRENCY = 4
+
+# Índices MP4 mantidos em memória (os menos usados são esquecidos)
+MP4_INDEX_CACHE_SIZE = 32
+
+# Cabeçalhos removidos no proxy de páginas (impediriam o embed)
+PAGE_HEADERS_TO_REMOVE = ('X-Frame-Options', 'Content-Security-Policy', 'Cross-Origin-Embedder-Policy')
+
+PROXY_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
 
 class ProxyServer:
@@ -18,11 +69,26 @@ class ProxyServer:
     def __init__(self):
         """Inicializa o servidor proxy"""
         self.logger = logging.getLogger(__name__)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.tees = TeeRegistry()      # streams idênticos em andamento
+        self.probes = SingleFlight()   # HEADs de get_video_info em andamento
+        self.video_info = MetadataCache(
+            lambda url: self.probes.do(url, lambda: self._probe_video(url))
+        )
+        self.index_loads = SingleFlight()  # leituras de moov em andamento
+        # url -> (índice, cabeçalhos do upstream); None para recursos sem índice
+        self._indexes: 'OrderedDict[str, Tuple[Optional[Mp4Index], Dict[str, str]]]' = OrderedDict()
+        self._seek_generation: Dict[str, int] = {}
+        self._seek_lock = threading.Lock()
+        self._seek_slots = threading.BoundedSemaphore(PROXY_SEEK_PREFETCH_CONCURRENCY)
+        self.seek_prefetches = 0
+        self.seek_prefetched_bytes = 0
+        self.prefetcher = ThreadedSegmentPrefetcher(self._fetch_segment, segment_cache)
 
+    @property
+    def session(self) -> requests.Session:
+        """Sessão da thread atual; as conexões vêm do pool por host compartilhado"""
+        return upstream_pool.session({'User-Agent': PROXY_USER_AGENT})
+    
     def proxy_request(self, url: str) -> Optional[Response]:
         """
         Faz proxy de uma URL genérica, removendo cabeçalhos de segurança.
@@ -47,16 +113,9 @@ class ProxyServer:
                 self.logger.error(f"Erro na requisição proxy para {url}: {response.status_code}")
                 return None
             
-            # Headers a serem removidos
-            headers_to_remove = [
-                'X-Frame-Options',
-                'Content-Security-Policy',
-                'Cross-Origin-Embedder-Policy'
-            ]
-            
             # Copiar e limpar cabeçalhos
             headers = dict(response.headers)
-            for header in headers_to_remove:
+            for header in PAGE_HEADERS_TO_REMOVE:
                 if header in headers:
                     del headers[header]
             
@@ -78,12 +137,22 @@ class ProxyServer:
             self.logger.error(f"Erro genérico no proxy: {e}")
             return None
     
-    def proxy_stream(self, url: str) -> Optional[Response]:
+    def proxy_stream(self, url: str, claims: Optional[Dict[str, Any]] = None) -> Optional[Response]:
         """
         Faz proxy de uma URL de streaming
         
+        Uma única requisição ao upstream carrega o Range/If-Range do cliente;
+        status (200/206/416), Content-Length e Content-Range são repassados
+        como vieram. A conexão com o upstream é fechada assim que o cliente
+        desconecta ou o corpo termina. Playlists HLS são reescritas para que
+        variantes e segmentos também passem pelo proxy. Respostas pequenas o
+        bastante ficam no cache compartilhado da sala; arquivos grandes vão
+        para o cache em disco, bloco a bloco. Pedidos idênticos simultâneos
+        compartilham a mesma requisição ao upstream (fan-out por tee).
+        
         Args:
             url: URL original para fazer proxy
+            claims: Claims do token de acesso (repassadas às URIs da playlist)
             
         Returns:
             Response: Response do Flask ou None se erro
@@ -95,64 +164,56 @@ class ProxyServer:
                 self.logger.error(f"URL inválida: {url}")
                 return None
             
-            # Fazer requisição com streaming
-            response = self.session.get(
-                url,
-                stream=True,
-                timeout=30,
-                allow_redirects=True
-            )
-            
-            if not response.ok:
-                self.logger.error(f"Erro na requisição proxy: {response.status_code}")
-                return None
-            
-            # Determinar tipo de conteúdo
-            content_type = response.headers.get('Content-Type', 'application/octet-stream')
-            
             # Headers para streaming
             headers = {
-                'Content-Type': content_type,
                 'Cache-Control': 'no-cache',
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
-                'Access-Control-Allow-Headers': 'Range, Content-Type',
+                'Access-Control-Allow-Headers': 'Range, If-Range, Content-Type',
+                'Access-Control-Expose-Headers': 'Content-Length, Content-Range, Accept-Ranges',
             }
             
-            # Suporte a range requests
-            if 'Range' in request.headers:
-                headers['Accept-Ranges'] = 'bytes'
-                range_header = request.headers.get('Range')
+            # Participantes da sala pedem os mesmos bytes: servir do cache
+            # compartilhado (com If-Range a resposta depende da versão do upstream)
+            range_header = request.headers.get('Range')
+            cacheable = 'If-Range' not in request.headers
+            if cacheable:
+                if not range_header:
+                    self.prefetcher.on_request(url)
+                cached = segment_cache.get(url, range_header)
+                if cached is None and not range_header:
+                    cached = self.prefetcher.wait(url)
+                if cached is not None:
+                    headers.update(cached.response_headers())
+                    headers.setdefault('Content-Type', 'application/octet-stream')
+                    return Response(cached.body, status=cached.status, headers=headers)
                 
-                # Repassar range request
-                proxy_headers = {'Range': range_header}
-                response = self.session.get(
-                    url,
-                    headers=proxy_headers,
-                    stream=True,
-                    timeout=30
-                )
+                # Arquivos grandes: o que já foi baixado sai do disco
+                entry = disk_cache.get(url)
+                plan = entry.plan(range_header) if entry is not None else None
+                if plan is not None:
+                    return self._disk_response(url, entry, plan, headers)
                 
-                if response.status_code == 206:
-                    headers['Content-Range'] = response.headers.get('Content-Range', '')
-                    headers['Content-Length'] = response.headers.get('Content-Length', '')
-                    
-                    return Response(
-                        response.iter_content(chunk_size=8192),
-                        status=206,
-                        headers=headers
-                    )
-            
-            # Stream normal
-            def generate():
-                try:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            yield chunk
-                except Exception as e:
-                    self.logger.error(f"Erro no streaming: {e}")
+                # O play dispara todos os players juntos: pedidos idênticos
+                # simultâneos compartilham uma única requisição ao upstream
+                flight_key = (url, normalize_range(range_header))
+                tee, subscriber, leader = self.tees.acquire(flight_key)
+                if not leader:
+                    if subscriber.wait_ready():
+                        return self._tee_response(url, subscriber)
+                    subscriber.close()
+                    tee = subscriber = None
+            else:
+                flight_key = tee = subscriber = None
             
-            return Response(generate(), headers=headers)
+            try:
+                return self._upstream_stream(url, claims, headers, range_header, cacheable,
+                                             tee, subscriber, flight_key)
+            finally:
+                # Líder que não chegou a repassar o corpo: os seguidores seguem sozinhos
+                if tee is not None and tee.status is None:
+                    tee.abandon()
+                    self.tees.release(flight_key, tee)
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Erro na requisição proxy: {e}")
@@ -161,16 +222,542 @@ class ProxyServer:
             self.logger.error(f"Erro no proxy: {e}")
             return None
     
+    def _upstream_stream(self, url: str, claims: Optional[Dict[str, Any]], headers: Dict[str, str],
+                         range_header: Optional[str], cacheable: bool, tee: Optional[StreamTee],
+                         subscriber: Optional[TeeSubscriber], flight_key: Optional[tuple]) -> Optional[Response]:
+        """
+        Abre o upstream e repassa o corpo pelo tee (aos seguidores também)
+        
+        Args:
+            url: URL original
+            claims: Claims do token de acesso
+            headers: Cabeçalhos base da resposta
+            range_header: Range do cliente
+            cacheable: Resposta pode ir para os caches e ser compartilhada
+            tee: Tee do qual este pedido é líder (None sem coalescência)
+            subscriber: Assinatura do líder no tee
+            flight_key: Chave do tee no registro
+            
+        Returns:
+            Response: Response do Flask ou None se erro
+        """
+        # Bytes exatamente como no upstream: sem compressão, para que
+        # Content-Length e Content-Range continuem valendo
+        upstream_headers = {'Accept-Encoding': 'identity'}
+        for header in FORWARDED_REQUEST_HEADERS:
+            value = request.headers.get(header)
+            if value:
+                upstream_headers[header] = value
+        
+        response = self.session.get(
+            url,
+            headers=upstream_headers,
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            allow_redirects=True
+        )
+        
+        if not response.ok and response.status_code != 416:
+            self.logger.error(f"Erro na requisição proxy: {response.status_code}")
+            response.close()
+            return None
+        
+        if response.status_code == 200 and is_playlist(url, response.headers.get('Content-Type')):
+            return self._playlist_response(url, response, claims)
+        
+        headers['Content-Type'] = response.headers.get('Content-Type', 'application/octet-stream')
+        for header in PASSTHROUGH_RESPONSE_HEADERS:
+            value = response.headers.get(header)
+            if value:
+                headers[header] = value
+        
+        content_length = response.headers.get('Content-Length', '')
+        store = cacheable and content_length.isdigit() and \
+            segment_cache.admits(response.status_code, int(content_length))
+        body = bytearray() if store else None
+        writer = None
+        if cacheable and not store:
+            writer = disk_cache.writer_for(url, response.status_code, response.headers,
+                                           min_size=segment_cache.max_entry_bytes)
+        
+        def sink(chunk: bytes):
+            if body is not None:
+                body.extend(chunk)
+            if writer is not None:
+                writer.write(chunk)
+        
+        def on_done(complete: bool):
+            # Corpo completo: os próximos participantes não tocam o upstream
+            if complete and body is not None and len(body) == int(content_length):
+                segment_cache.put(url, range_header, response.status_code, response.headers, body)
+            if writer is not None:
+                writer.close()
+            if flight_key is not None:
+                self.tees.release(flight_key, tee)
+        
+        if tee is None:
+            # Pedido sem coalescência (If-Range): tee com um único cliente
+            tee = StreamTee()
+            subscriber = tee.subscribe()
+        
+        # Leitura crua: o corpo já veio sem codificação
+        chunks = response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False)
+        tee.start(response.status_code, headers, chunks, response.close, sink, on_done)
+        return self._tee_response(url, subscriber)
+    
+    def _tee_response(self, url: str, subscriber: TeeSubscriber) -> Response:
+        """
+        Resposta de um cliente do tee
+        
+        Um cliente que fica para trás do fan-out continua com uma conexão
+        própria ao upstream, a partir do byte em que parou.
+        """
+        tee = subscriber.tee
+        
+        def generate():
+            try:
+                yield from subscriber
+                if subscriber.detached:
+                    yield from self._resume(url, tee.status, tee.headers, subscriber.offset)
+            except Exception as e:
+                self.logger.error(f"Erro no streaming: {e}")
+            finally:
+                # Cliente desconectou ou o corpo terminou: o último fecha o upstream
+                subscriber.close()
+        
+        proxied = Response(generate(), status=tee.status, headers=tee.headers)
+        proxied.call_on_close(subscriber.close)
+        return proxied
+    
+    def _resume(self, url: str, status: int, headers: Dict[str, str], offset: int):
+        """Restante de uma resposta a partir de `offset` bytes do corpo, por conexão própria"""
+        extent = response_extent(status, headers)
+        length = headers.get('Content-Length', '')
+        if extent is None or not length.isdigit() or (status == 200 and headers.get('Accept-Ranges') != 'bytes'):
+            self.logger.error(f"Cliente atrasado sem como retomar o stream de {url}")
+            return
+        
+        start = extent[0] + offset
+        end = extent[0] + int(length) - 1
+        if start > end:
+            return
+        
+        response = self.session.get(
+            url,
+            headers={'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'},
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            allow_redirects=True
+        )
+        try:
+            if response.status_code != 206 or response_extent(206, response.headers) != (start, extent[1]):
+                self.logger.error(f"Upstream não atendeu o intervalo {start}-{end}: {response.status_code}")
+                return
+            for chunk in response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+    
+    def _disk_response(self, url: str, entry: DiskEntry, plan: Tuple[int, int, int], headers: Dict[str, str]) -> Response:
+        """
+        Resposta a partir do cache em disco
+        
+        O trecho já presente sai do arquivo; a partir do primeiro bloco
+        ausente, o restante do intervalo vem do upstream numa única
+        requisição e é gravado no disco enquanto passa. Participantes que
+        pedem a mesma lacuna juntos (após um seek) compartilham essa requisição.
+        
+        Args:
+            url: URL do upstream
+            entry: Arquivo do cache
+            plan: (status, início, fim inclusivo) da resposta
+            headers: Cabeçalhos base da resposta
+            
+        Returns:
+            Response: Response do Flask
+        """
+        status, start, end = plan
+        available = disk_cache.record(entry, start, end)
+        headers.update(entry.response_headers(status, start, end))
+        
+        # Intervalo completo até o fim do arquivo: o servidor WSGI pode usar
+        # sendfile (o file wrapper lê até o EOF, que aqui é o fim do intervalo)
+        if available > end and end == entry.size - 1:
+            file = open(entry.path, 'rb')
+            file.seek(start)
+            return Response(wrap_file(request.environ, file), status=status, headers=headers,
+                            direct_passthrough=True)
+        
+        def generate():
+            try:
+                if available > start:
+                    with entry.mapped() as view:
+                        for offset in range(start, min(available, end + 1), PROXY_CHUNK_SIZE):
+                            yield view[offset:min(offset + PROXY_CHUNK_SIZE, available)]
+                
+                if available <= end:
+                    yield from self._shared_fill(url, entry, available, end)
+            except Exception as e:
+                self.logger.error(f"Erro no streaming do cache em disco: {e}")
+        
+        return Response(generate(), status=status, headers=headers)
+    
+    def _shared_fill(self, url: str, entry: DiskEntry, start: int, end: int):
+        """
+        Lacuna [start, end] do disco vinda do upstream, compartilhada por pedidos iguais
+        
+        A busca começa no início do bloco de `start`, para que pedidos que
+        caem no mesmo bloco usem a mesma chave (URL + blocos) e o primeiro
+        bloco fique completo no disco; cada cliente descarta os bytes
+        anteriores ao seu início.
+        """
+        fill_start = start - start % entry.block_size
+        key = ('disk', url, fill_start, end)
+        tee, subscriber, leader = self.tees.acquire(key)
+        
+        if leader:
+            try:
+                started = self._start_fill(url, entry, fill_start, end, tee, key)
+            finally:
+                if tee.status is None:
+                    tee.abandon()
+                    self.tees.release(key, tee)
+            if not started:
+                subscriber.close()
+                return
+        elif not subscriber.wait_ready():
+            # O líder desistiu: busca própria
+            subscriber.close()
+            yield from self._fill_from_upstream(url, entry, start, end)
+            return
+        
+        skip = start - fill_start
+        try:
+            for chunk in subscriber:
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk, skip = chunk[skip:], 0
+                yield chunk
+            
+            # Ficou para trás do fan-out: segue com conexão própria de onde parou
+            if subscriber.detached:
+                yield from self._fill_from_upstream(url, entry, max(start, fill_start + subscriber.offset), end)
+        finally:
+            subscriber.close()
+    
+    def _start_fill(self, url: str, entry: DiskEntry, start: int, end: int,
+                    tee: StreamTee, key: tuple) -> bool:
+        """Abre a busca de [start, end] no upstream e a liga ao tee (líder)"""
+        response = self.session.get(
+            url,
+            headers={'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'},
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            allow_redirects=True
+        )
+        if response.status_code != 206 or response_extent(206, response.headers) != (start, entry.size):
+            self.logger.error(f"Upstream não atendeu o intervalo {start}-{end}: {response.status_code}")
+            response.close()
+            return False
+        
+        writer = disk_cache.writer(entry, start)
+        
+        def on_done(complete: bool):
+            writer.close()
+            self.tees.release(key, tee)
+        
+        chunks = response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False)
+        tee.start(206, {}, chunks, response.close, writer.write, on_done)
+        return True
+    
+    def _fill_from_upstream(self, url: str, entry: DiskEntry, start: int, end: int):
+        """Busca [start, end] no upstream, gravando no disco e repassando ao cliente"""
+        response = self.session.get(
+            url,
+            headers={'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'},
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            allow_redirects=True
+        )
+        writer = disk_cache.writer(entry, start)
+        try:
+            # O corpo já foi anunciado: só serve um 206 que começa onde o disco parou
+            if response.status_code != 206 or response_extent(206, response.headers) != (start, entry.size):
+                self.logger.error(f"Upstream não atendeu o intervalo {start}-{end}: {response.status_code}")
+                return
+            
+            for chunk in response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                if chunk:
+                    writer.write(chunk)
+                    yield chunk
+        finally:
+            response.close()
+            writer.close()
+    
+    def _playlist_response(self, url: str, response: requests.Response,
+                           claims: Optional[Dict[str, Any]]) -> Optional[Response]:
+        """
+        Playlist HLS reescrita para o proxy
+        
+        Playlists de mídia passam a ser acompanhadas pela pré-busca: os
+        segmentos iniciais já são buscados enquanto o player processa a lista.
+        
+        Args:
+            url: URL pedida
+            response: Resposta do upstream (stream aberto)
+            claims: Claims do token de acesso
+            
+        Returns:
+            Response: Playlist reescrita ou None se erro
+        """
+        try:
+            body = bytearray()
+            for chunk in response.iter_content(PROXY_CHUNK_SIZE):
+                body += chunk
+                if len(body) > HLS_PLAYLIST_MAX_BYTES:
+                    self.logger.error(f"Playlist muito grande: {url}")
+                    return None
+            
+            # Playlists HLS são sempre UTF-8 (RFC 8216)
+            text = bytes(body).decode('utf-8', errors='replace')
+            playlist = rewrite_playlist(text, response.url, proxied_url_builder(claims))
+            if not playlist.is_master:
+                self.prefetcher.track(url, playlist)
+            
+            return Response(playlist.text, headers={
+                'Content-Type': 'application/vnd.apple.mpegurl',
+                'Cache-Control': 'no-cache',
+                'Access-Control-Allow-Origin': '*',
+            })
+        finally:
+            response.close()
+    
+    def _fetch_segment(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """Segmento HLS inteiro do upstream, ou None se falhar ou passar do limite"""
+        try:
+            response = self.session.get(
+                url,
+                headers={'Accept-Encoding': 'identity'},
+                stream=True,
+                timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+                allow_redirects=True
+            )
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Erro ao buscar segmento {url}: {e}")
+            return None
+        
+        try:
+            content_length = response.headers.get('Content-Length', '')
+            if response.status_code != 200 or \
+                    (content_length.isdigit() and int(content_length) > segment_cache.max_entry_bytes):
+                return None
+            
+            body = bytearray()
+            for chunk in response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                body += chunk
+                if len(body) > segment_cache.max_entry_bytes:
+                    return None
+            
+            return bytes(body), response.headers.get('Content-Type', 'application/octet-stream')
+        finally:
+            response.close()
+    
+    def prefetch_seek(self, url: str, position: float) -> bool:
+        """
+        Traz para o cache em disco os bytes de um MP4 a partir de `position`
+
+        Chamado quando o dono da sala faz seek: todos os participantes vão
+        pedir, quase juntos, um Range num offset ainda frio. O moov é lido
+        uma vez por URL; com a tabela de amostras, o tempo vira o intervalo
+        de bytes do quadro-chave anterior até PROXY_SEEK_PREFETCH_SECONDS
+        depois, buscado em segundo plano. Um seek mais novo na mesma URL
+        interrompe a pré-busca anterior.
+
+        Args:
+            url: URL do vídeo
+            position: Tempo de mídia do seek (segundos)
+
+        Returns:
+            bool: True se a pré-busca foi iniciada
+        """
+        if not disk_cache.enabled:
+            return False
+
+        # Sem vaga, a pré-busca em andamento para a URL continua valendo
+        if not self._seek_slots.acquire(blocking=False):
+            return False
+        
+        with self._seek_lock:
+            generation = self._seek_generation.get(url, 0) + 1
+            self._seek_generation[url] = generation
+            self.seek_prefetches += 1
+        threading.Thread(target=self._prefetch_seek, args=(url, position, generation),
+                         name='seek-prefetch', daemon=True).start()
+        return True
+    
+    def _mp4_index(self, url: str) -> Tuple[Optional[Mp4Index], Dict[str, str]]:
+        """
+        Índice MP4 da URL e os cabeçalhos do upstream
+        
+        O moov é lido na primeira vez (uma leitura por URL, mesmo com seeks
+        simultâneos); recursos que não são MP4 indexáveis ficam em cache
+        como None para não serem sondados a cada seek.
+        """
+        with self._seek_lock:
+            cached = self._indexes.get(url)
+            if cached is not None:
+                self._indexes.move_to_end(url, last=True)
+                return cached
+        
+        def load():
+            headers: Dict[str, str] = {}
+            
+            def fetch(start: int, end: int) -> Optional[Tuple[bytes, int]]:
+                part = self._fetch_range(url, start, end)
+                if part is None:
+                    return None
+                data, size, response_headers = part
+                headers.update(response_headers)
+                return data, size
+            
+            try:
+                index = load_index(fetch)
+            except Mp4Error as e:
+                self.logger.warning(f"MP4 sem índice utilizável em {url}: {e}")
+                index = None
+            
+            # Só chega aqui o que é do recurso (não é MP4, sem Range, moov inválido);
+            # falhas da busca (rede, 429, 5xx) saem como exceção e não entram no
+            # cache: o próximo seek tenta de novo
+            with self._seek_lock:
+                self._indexes[url] = (index, headers)
+                while len(self._indexes) > MP4_INDEX_CACHE_SIZE:
+                    self._indexes.popitem(last=False)
+            return index, headers
+        
+        try:
+            return self.index_loads.do(url, load)
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Erro ao ler o índice MP4 de {url}: {e}")
+            return None, {}
+    
+    def _fetch_range(self, url: str, start: int, end: int) -> Optional[Tuple[bytes, int, Dict[str, str]]]:
+        """
+        Intervalo [start, end] do upstream
+        
+        Returns:
+            tuple: (dados, tamanho total, cabeçalhos) ou None se o upstream não atende Range
+        
+        Raises:
+            requests.exceptions.HTTPError: Erro do upstream (429, 5xx etc.), possivelmente passageiro
+        """
+        response = self.session.get(
+            url,
+            headers={'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'},
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            allow_redirects=True
+        )
+        try:
+            # 200: o upstream ignora Range (não há como buscar só o moov); outros
+            # status são falhas da busca, não uma característica do recurso
+            if response.status_code == 200:
+                return None
+            if response.status_code != 206:
+                raise requests.exceptions.HTTPError(
+                    f"Upstream respondeu {response.status_code} ao intervalo {start}-{end}", response=response
+                )
+            extent = response_extent(response.status_code, response.headers)
+            if extent is None or extent[0] != start:
+                return None
+            
+            data = bytearray()
+            for chunk in response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                data.extend(chunk)
+                if len(data) > end - start:
+                    break
+            return bytes(data[:end - start + 1]), extent[1], dict(response.headers)
+        finally:
+            response.close()
+    
+    def _prefetch_seek(self, url: str, position: float, generation: int):
+        """Busca no upstream os intervalos do seek ainda ausentes do disco"""
+        try:
+            index, headers = self._mp4_index(url)
+            if index is None:
+                return
+            
+            entry = disk_cache.open(url, index.size, headers)
+            if entry is None:
+                return
+            
+            budget = PROXY_SEEK_PREFETCH_MAX_BYTES
+            for start, end in index.byte_ranges(position, PROXY_SEEK_PREFETCH_SECONDS):
+                # Blocos inteiros: o gravador só marca blocos completos
+                start -= start % entry.block_size
+                end = min(end - end % entry.block_size + entry.block_size, entry.size) - 1
+                end = min(end, start + budget - 1)
+                start = entry.available_until(start, end)
+                if start > end:
+                    continue
+                
+                for chunk in self._fill_from_upstream(url, entry, start, end):
+                    budget -= len(chunk)
+                    with self._seek_lock:
+                        self.seek_prefetched_bytes += len(chunk)
+                        superseded = self._seek_generation.get(url) != generation
+                    if superseded:
+                        return  # seek mais novo na mesma URL
+                if budget <= 0:
+                    return
+                
+        except Exception as e:
+            self.logger.error(f"Erro na pré-busca do seek em {url}: {e}")
+        finally:
+            self._seek_slots.release()
+            with self._seek_lock:
+                if self._seek_generation.get(url) == generation:
+                    del self._seek_generation[url]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Coalescência de streams e de HEADs, cache de info, conexões com o upstream, pré-buscas de seeks e HLS"""
+        with self._seek_lock:
+            seeks = {
+                'prefetches': self.seek_prefetches,
+                'prefetched_bytes': self.seek_prefetched_bytes,
+                'indexed_urls': len(self._indexes)
+            }
+        return {
+            'streams': self.tees.stats(),
+            'probes': self.probes.stats(),
+            'video_info': self.video_info.stats(),
+            'upstream': upstream_pool.stats(),
+            'seeks': seeks,
+            'hls': self.prefetcher.stats()
+        }
+    
     def get_video_info(self, url: str) -> Optional[dict]:
         """
         Obtém informações sobre o vídeo
         
+        Respostas vêm do cache de metadados: só a primeira consulta de uma
+        URL espera o HEAD; depois do TTL a informação anterior é servida
+        enquanto é revalidada em segundo plano. Participantes que abrem a
+        sala juntos compartilham o mesmo HEAD.
+        
         Args:
             url: URL do vídeo
             
         Returns:
             dict: Informações do vídeo ou None
         """
+        return self.video_info.get(url)
+    
+    def _probe_video(self, url: str) -> Optional[dict]:
+        """HEAD no upstream para get_video_info"""
         try:
             response = self.session.head(url, timeout=10, allow_redirects=True)
             
@@ -200,4 +787,66 @@ def get_proxy_server() -> ProxyServer:
     Returns:
         ProxyServer: Instância do servidor
     """
-    return proxy_server
\ No newline at end of file
+    return proxy_server
+
+
+def flask_session_authorizer(secret_key: str, cookie_name: str = 'session',
+                             max_age: int = 7 * 24 * 3600) -> Callable[[Any], Optional[dict]]:
+    """
+    Autorização do motor assíncrono pelo cookie de sessão do Flask
+    
+    Valida a assinatura do cookie com a SECRET_KEY do app, sem banco de
+    dados nem contexto de requisição do Flask.
+    
+    Args:
+        secret_key: SECRET_KEY do app principal
+        cookie_name: Nome do cookie de sessão
+        max_age: Idade máxima do cookie em segundos
+        
+    Returns:
+        Callable: Função (request aiohttp) -> claims {'uid'} ou None
+    """
+    signer_app = Flask('streamhive-proxy')
+    signer_app.secret_key = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(signer_app)
+    
+    def authorize(request) -> Optional[dict]:
+        cookie = request.cookies.get(cookie_name)
+        if not cookie:
+            return None
+        try:
+            data = serializer.loads(cookie, max_age=max_age)
+        except BadSignature:
+            return None
+        return {'uid': str(data['user_id'])} if 'user_id' in data else None
+    
+    return authorize
+
+
+def main():
+    """
+    Executa o motor de proxy assíncrono como serviço próprio
+    
+    Só aceita tokens assinados emitidos pelo app (PROXY_TOKEN_SECRET ou
+    SECRET_KEY): não acessa banco nem sessão, então pode ser escalado e
+    implantado separadamente do servidor de sincronização.
+    """
+    load_dotenv()
+    configure_logging()
+    
+    from services.stream_proxy import PROXY_ENGINE_HOST, PROXY_ENGINE_PORT, run_proxy_engine, token_authorizer
+    from utils.proxy_tokens import proxy_token_secret
+    
+    parser = argparse.ArgumentParser(description='Streamhive - proxy de mídia')
+    parser.add_argument('--host', default=PROXY_ENGINE_HOST)
+    parser.add_argument('--port', type=int, default=PROXY_ENGINE_PORT)
+    args = parser.parse_args()
+    
+    if not proxy_token_secret():
+        raise ValueError("Nenhuma PROXY_TOKEN_SECRET ou SECRET_KEY definida para o proxy")
+    
+    run_proxy_engine(token_authorizer(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
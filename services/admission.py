@@ -0,0 +1,175 @@
+"""
+Streamhive Admission Control
+Limite de entradas em sala simultâneas, com fila curta e sugestão de espera ao cliente
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+
+# Entradas em sala (consulta ao banco + room_state) processadas ao mesmo tempo
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 8))
+
+# Entradas que podem aguardar por uma vaga; acima disso são adiadas na hora
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 64))
+
+# Tempo máximo de espera na fila antes de adiar a entrada (segundos)
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 2.0))
+
+# Limites da espera sugerida ao cliente (segundos)
+ADMISSION_MIN_RETRY_AFTER = float(os.environ.get('ADMISSION_MIN_RETRY_AFTER', 0.5))
+ADMISSION_MAX_RETRY_AFTER = float(os.environ.get('ADMISSION_MAX_RETRY_AFTER', 30))
+
+# Peso da última medição na média móvel do tempo de atendimento
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionController:
+    """
+    Controle de admissão para rajadas de reconexão
+
+    Após o reinício de um worker todos os clientes reconectam e pedem
+    `join_room` ao mesmo tempo. No máximo `max_concurrent` entradas são
+    atendidas em paralelo e até `max_queue` esperam por uma vaga; as
+    demais são recusadas com uma espera sugerida, calculada pelo tempo
+    estimado para esvaziar a fila. O cliente espera esse tempo com jitter,
+    espalhando a rajada em vez de repeti-la.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        """
+        Inicializa o controle
+
+        Args:
+            max_concurrent: Entradas atendidas em paralelo
+            max_queue: Entradas aguardando vaga
+            queue_timeout: Espera máxima na fila em segundos
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.service_time: Optional[float] = None  # média móvel do tempo de atendimento (segundos)
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self._next_slot = 0.0  # próximo horário livre reservado a um recusado
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Ocupa uma vaga, aguardando na fila se necessário
+
+        Args:
+            timeout: Espera máxima (padrão: queue_timeout)
+
+        Returns:
+            None se admitido (chamar `release` ao terminar), senão segundos sugeridos até tentar de novo
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        with self._cond:
+            if self.active < self.max_concurrent:
+                return self._admit()
+
+            if self.waiting >= self.max_queue:
+                return self._reject()
+
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._reject()
+                    self._cond.wait(remaining)
+                return self._admit()
+            finally:
+                self.waiting -= 1
+
+    def release(self, elapsed: Optional[float] = None):
+        """
+        Libera a vaga de uma entrada concluída
+
+        Args:
+            elapsed: Duração do atendimento em segundos (alimenta a espera sugerida)
+        """
+        with self._cond:
+            self.active -= 1
+            if elapsed is not None:
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            self._cond.notify()
+
+    def reject(self) -> float:
+        """
+        Recusa uma entrada sem passar pela fila (ex.: conexão durante a saturação)
+
+        Returns:
+            float: Segundos sugeridos até tentar de novo
+        """
+        with self._cond:
+            return self._reject()
+
+    def saturated(self) -> bool:
+        """Indica se a fila está cheia (novas entradas seriam recusadas)"""
+        return self.active >= self.max_concurrent and self.waiting >= self.max_queue
+
+    def retry_after(self) -> float:
+        """
+        Espera estimada para esvaziar as vagas e a fila atuais
+
+        Returns:
+            float: Segundos, entre ADMISSION_MIN_RETRY_AFTER e ADMISSION_MAX_RETRY_AFTER
+        """
+        with self._cond:
+            return self._clamp((self.active + self.waiting) * self._slot_interval())
+
+    def stats(self) -> Dict[str, Any]:
+        """Vagas ocupadas, fila e contadores"""
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted_total': self.admitted_total,
+            'rejected_total': self.rejected_total,
+            'service_time_ms': round((self.service_time or 0) * 1000, 2)
+        }
+
+    def _admit(self) -> None:
+        """Ocupa a vaga (chamado com o lock adquirido)"""
+        self.active += 1
+        self.admitted_total += 1
+        return None
+
+    def _reject(self) -> float:
+        """
+        Conta a recusa e reserva um horário de retorno (chamado com o lock adquirido)
+
+        Cada recusado recebe o próximo horário livre depois de quem já foi
+        mandado esperar, no ritmo em que as vagas se liberam. Assim uma
+        rajada de N clientes volta espalhada em vez de toda junta.
+        """
+        self.rejected_total += 1
+
+        now = time.monotonic()
+        interval = self._slot_interval()
+        slot = max(self._next_slot, now + (self.active + self.waiting) * interval)
+        self._next_slot = slot + interval
+        return self._clamp(slot - now)
+
+    def _slot_interval(self) -> float:
+        """Intervalo médio entre vagas liberadas"""
+        if self.service_time is None:
+            return 0.0
+        return self.service_time / self.max_concurrent
+
+    @staticmethod
+    def _clamp(seconds: float) -> float:
+        """Limita a espera sugerida"""
+        return round(min(ADMISSION_MAX_RETRY_AFTER, max(ADMISSION_MIN_RETRY_AFTER, seconds)), 3)
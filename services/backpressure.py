@@ -0,0 +1,140 @@
+"""
+Streamhive Back-pressure
+Monitoramento da fila de saída por conexão e tratamento de consumidores lentos
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+
+from flask_socketio import SocketIO
+
+from services.membership_index import MembershipIndex
+
+
+# Pacotes na fila de saída a partir dos quais a conexão é considerada lenta
+SOCKET_QUEUE_HIGH_WATER = int(os.environ.get('SOCKET_QUEUE_HIGH_WATER', 256))
+
+# Abaixo deste tamanho a conexão lenta volta a receber os eventos da sala
+SOCKET_QUEUE_LOW_WATER = int(os.environ.get('SOCKET_QUEUE_LOW_WATER', 16))
+
+# Intervalo entre verificações das filas (segundos)
+BACKPRESSURE_CHECK_INTERVAL = float(os.environ.get('BACKPRESSURE_CHECK_INTERVAL', 0.5))
+
+
+class BackpressureMonitor:
+    """
+    Acompanha a profundidade da fila de saída de cada conexão em sala
+
+    Uma conexão cuja fila passa de SOCKET_QUEUE_HIGH_WATER deixa de receber
+    o tráfego de difusão da sala (chat, presença, controles), que é o que
+    cresceria sem limite em memória. Ela continua na sala principal, que
+    carrega os eventos críticos (heartbeats, encerramento). Quando a fila
+    drena abaixo de SOCKET_QUEUE_LOW_WATER, a conexão volta ao tráfego e é
+    avisada para ressincronizar: tudo o que perdeu vira uma única
+    ressincronização incremental.
+    """
+
+    def __init__(self, socketio: SocketIO, memberships: MembershipIndex,
+                 broadcast_room: Callable[[str, str], Optional[str]]):
+        """
+        Inicializa o monitor
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            memberships: Índice de conexões por sala
+            broadcast_room: Função (sid, room_id) -> sala Socket.IO de difusão do sid
+        """
+        self.socketio = socketio
+        self.memberships = memberships
+        self.broadcast_room = broadcast_room
+        self.logger = logging.getLogger(__name__)
+        self._degraded: Dict[str, str] = {}  # sid -> sala de difusão removida
+        self._lock = threading.Lock()
+        self.max_depth = 0
+        self.degraded_total = 0
+
+        self.socketio.start_background_task(self._monitor_loop)
+
+    def queue_depth(self, sid: str) -> int:
+        """
+        Pacotes aguardando envio para uma conexão
+
+        Args:
+            sid: ID da conexão Socket.IO
+
+        Returns:
+            int: Tamanho da fila de saída do Engine.IO (0 se indisponível)
+        """
+        try:
+            server = self.socketio.server
+            eio_sid = server.manager.eio_sid_from_sid(sid, '/')
+            socket = server.eio.sockets.get(eio_sid)
+            return socket.queue.qsize() if socket is not None else 0
+        except Exception:
+            return 0
+
+    def is_degraded(self, sid: str) -> bool:
+        """Indica se a conexão está fora do tráfego de difusão"""
+        return sid in self._degraded
+
+    def check(self):
+        """Verifica todas as conexões em sala"""
+        max_depth = 0
+
+        for sid, room_id in self.memberships.sid_rooms():
+            depth = self.queue_depth(sid)
+            max_depth = max(max_depth, depth)
+
+            if sid not in self._degraded and depth >= SOCKET_QUEUE_HIGH_WATER:
+                self._degrade(sid, room_id, depth)
+            elif sid in self._degraded and depth <= SOCKET_QUEUE_LOW_WATER:
+                self._restore(sid, room_id)
+
+        self.max_depth = max_depth
+
+    def forget(self, sid: str):
+        """Remove o estado de uma conexão encerrada"""
+        with self._lock:
+            self._degraded.pop(sid, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Conexões lentas e maior fila observada"""
+        return {
+            'degraded_sids': len(self._degraded),
+            'degraded_total': self.degraded_total,
+            'max_queue_depth': self.max_depth
+        }
+
+    def _degrade(self, sid: str, room_id: str, depth: int):
+        """Retira a conexão do tráfego de difusão da sala"""
+        room = self.broadcast_room(sid, room_id)
+        if room is None:
+            return
+
+        self.socketio.server.leave_room(sid, room, namespace='/')
+        with self._lock:
+            self._degraded[sid] = room
+            self.degraded_total += 1
+        self.logger.warning(f"Conexão lenta {sid} na sala {room_id}: {depth} pacotes na fila")
+
+    def _restore(self, sid: str, room_id: str):
+        """Devolve a conexão ao tráfego e pede a ressincronização"""
+        with self._lock:
+            room = self._degraded.pop(sid, None)
+        if room is None:
+            return
+
+        self.socketio.server.enter_room(sid, room, namespace='/')
+        self.socketio.emit('resync_required', {'room_id': room_id}, to=sid)
+
+    def _monitor_loop(self):
+        """Verifica as filas periodicamente"""
+        while True:
+            self.socketio.sleep(BACKPRESSURE_CHECK_INTERVAL)
+
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Erro no monitor de back-pressure: {e}")
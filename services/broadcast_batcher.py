@@ -0,0 +1,149 @@
+"""
+Streamhive Broadcast Batcher
+Agrupamento de eventos de saída por sala em janelas curtas
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from flask_socketio import SocketIO
+
+from services.socket_metrics import SocketMetrics
+
+
+# Janela de agrupamento em milissegundos (0 desativa o agrupamento)
+BROADCAST_BATCH_WINDOW_MS = float(os.environ.get('BROADCAST_BATCH_WINDOW_MS', 40))
+
+# Uma sala com muitos eventos pendentes é enviada antes do fim da janela
+BROADCAST_BATCH_MAX_EVENTS = int(os.environ.get('BROADCAST_BATCH_MAX_EVENTS', 100))
+
+# Eventos sensíveis à latência que nunca esperam pela janela
+BATCH_BYPASS_EVENTS = {'video_sync'}
+
+# Locks de envio (cada sala usa um, pelo hash do nome)
+BROADCAST_SEND_LOCKS = 64
+
+
+class BroadcastBatcher:
+    """
+    Agrupa eventos destinados a uma mesma sala Socket.IO
+
+    Em vez de um envio por evento, os eventos acumulados durante a janela
+    são enviados como um único frame `batch` ([[evento, payload], ...]),
+    o que reduz escritas no socket para cada destinatário.
+    """
+
+    def __init__(self, socketio: SocketIO, window_ms: float = BROADCAST_BATCH_WINDOW_MS,
+                 metrics: Optional[SocketMetrics] = None):
+        """
+        Inicializa o agrupador
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            window_ms: Janela de agrupamento em milissegundos
+            metrics: Registro onde contabilizar os eventos emitidos
+        """
+        self.socketio = socketio
+        self.metrics = metrics
+        self.window = window_ms / 1000.0
+        self.logger = logging.getLogger(__name__)
+        self._pending: Dict[str, List[Tuple[str, Any]]] = {}
+        self._lock = threading.Lock()
+        # Serializam os envios de cada sala, para que um evento urgente nunca
+        # ultrapasse um lote mais antigo dela que já esteja sendo enviado; as
+        # demais salas não esperam por esse envio
+        self._send_locks = [threading.RLock() for _ in range(BROADCAST_SEND_LOCKS)]
+
+        if self.enabled:
+            self.socketio.start_background_task(self._flush_loop)
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o agrupamento está ativo"""
+        return self.window > 0
+
+    def emit(self, event: str, payload: Any, to: str):
+        """
+        Envia um evento para uma sala, agrupando-o quando possível
+
+        Eventos em BATCH_BYPASS_EVENTS são enviados imediatamente, mas antes
+        os pendentes da sala são descarregados para manter a ordem.
+
+        Args:
+            event: Nome do evento
+            payload: Dados já codificados para o formato da sala
+            to: Nome da sala Socket.IO
+        """
+        if not self.enabled:
+            self._send(to, [(event, payload)])
+            return
+
+        if event in BATCH_BYPASS_EVENTS:
+            with self._send_lock(to):
+                self.flush(to)
+                self._send(to, [(event, payload)])
+            return
+
+        with self._lock:
+            queue = self._pending.setdefault(to, [])
+            queue.append((event, payload))
+            full = len(queue) >= BROADCAST_BATCH_MAX_EVENTS
+
+        if full:
+            self.flush(to)
+
+    def flush(self, room: str):
+        """
+        Envia imediatamente os eventos pendentes de uma sala
+
+        Args:
+            room: Nome da sala Socket.IO
+        """
+        with self._send_lock(room):
+            with self._lock:
+                queue = self._pending.pop(room, None)
+
+            if queue:
+                self._send(room, queue)
+
+    def discard(self, room: str):
+        """Descarta eventos pendentes de uma sala encerrada"""
+        with self._lock:
+            self._pending.pop(room, None)
+
+    def _send_lock(self, room: str) -> threading.RLock:
+        """Lock de envio da sala"""
+        return self._send_locks[hash(room) % len(self._send_locks)]
+
+    def _send(self, room: str, queue: List[Tuple[str, Any]]):
+        """Envia um único evento como está ou vários como frame `batch`"""
+        if len(queue) == 1:
+            event, payload = queue[0]
+            self.socketio.emit(event, payload, to=room)
+        else:
+            self.socketio.emit('batch', [[event, payload] for event, payload in queue], to=room)
+
+        # Contabilizado por evento lógico, mesmo quando vai dentro de um lote
+        if self.metrics is not None:
+            for event, payload in queue:
+                self.metrics.record_emit(event, payload, room)
+
+    def _flush_loop(self):
+        """Descarrega todas as salas ao fim de cada janela"""
+        while True:
+            self.socketio.sleep(self.window)
+
+            if not self._pending:
+                continue
+
+            with self._lock:
+                rooms = list(self._pending)
+
+            # Cada sala é descarregada sob o próprio lock
+            for room in rooms:
+                try:
+                    self.flush(room)
+                except Exception as e:
+                    self.logger.error(f"Erro ao enviar lote para a sala {room}: {e}")
@@ -0,0 +1,151 @@
+"""
+Streamhive Chat History
+Histórico recente do chat em buffer circular com mensagens pré-serializadas
+"""
+
+import os
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from utils.wire_format import WIRE_JSON, WIRE_COMPACT, encode_payload
+
+
+# Mensagens mantidas em memória por sala
+CHAT_HISTORY_SIZE = int(os.environ.get('CHAT_HISTORY_SIZE', 100))
+
+# Mensagens enviadas a quem entra na sala
+CHAT_REPLAY_SIZE = int(os.environ.get('CHAT_REPLAY_SIZE', 50))
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    """Mesma serialização usada pelo python-socketio nos pacotes"""
+    return json.dumps(payload, separators=(',', ':'))
+
+
+class ChatRecord:
+    """
+    Mensagem do chat
+
+    Guarda os campos em slots em vez de um dicionário por mensagem e
+    serializa cada formato de fio no máximo uma vez.
+    """
+
+    __slots__ = ('id', 'user_id', 'username', 'message', 'timestamp', 'formatted_time', '_encoded')
+
+    def __init__(self, id: str, user_id: str, username: str, message: str,
+                 timestamp: float, formatted_time: Optional[str] = None):
+        self.id = id
+        self.user_id = user_id
+        self.username = username
+        self.message = message
+        self.timestamp = timestamp
+        self.formatted_time = formatted_time or datetime.fromtimestamp(timestamp).strftime('%H:%M')
+        self._encoded: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChatRecord':
+        """Reconstrói uma mensagem a partir do formato verboso"""
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            username=data['username'],
+            message=data['message'],
+            timestamp=float(data['timestamp']),
+            formatted_time=data.get('formatted_time')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Mensagem no formato verboso (payload do evento `new_message`)"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'username': self.username,
+            'message': self.message,
+            'timestamp': self.timestamp,
+            'formatted_time': self.formatted_time
+        }
+
+    def serialized(self, wire: str) -> bytes:
+        """
+        Mensagem já serializada em JSON (UTF-8) no formato de fio pedido
+
+        Args:
+            wire: 'json' ou 'compact'
+
+        Returns:
+            bytes: Objeto JSON da mensagem
+        """
+        encoded = self._encoded.get(wire)
+        if encoded is None:
+            payload = self.to_dict()
+            if wire == WIRE_COMPACT:
+                payload = encode_payload('new_message', payload)
+            encoded = _dumps(payload).encode('utf-8')
+            self._encoded[wire] = encoded
+        return encoded
+
+
+class ChatHistory:
+    """
+    Buffer circular das últimas mensagens de uma sala
+
+    O deque com maxlen descarta a mensagem mais antiga em O(1), sem copiar
+    a lista. O histórico enviado a quem entra é montado concatenando as
+    formas já serializadas das mensagens e vai como anexo binário do
+    Socket.IO, que não é reserializado nem escapado no pacote.
+    """
+
+    def __init__(self, capacity: int = CHAT_HISTORY_SIZE):
+        """
+        Inicializa o histórico vazio
+
+        Args:
+            capacity: Número máximo de mensagens mantidas
+        """
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, record: ChatRecord):
+        """Adiciona uma mensagem, descartando a mais antiga se estiver cheio"""
+        with self._lock:
+            self._records.append(record)
+
+    def extend(self, messages: List[Dict[str, Any]]):
+        """Adiciona mensagens no formato verboso (recarga do disco)"""
+        records = [ChatRecord.from_dict(message) for message in messages]
+        with self._lock:
+            self._records.extend(records)
+
+    def serialized(self, wire: str = WIRE_JSON, limit: int = CHAT_REPLAY_SIZE) -> bytes:
+        """
+        Últimas mensagens como um array JSON (UTF-8) já serializado
+
+        Args:
+            wire: 'json' ou 'compact'
+            limit: Número máximo de mensagens
+
+        Returns:
+            bytes: Array JSON com as mensagens mais recentes
+        """
+        if limit <= 0:
+            return b'[]'
+
+        with self._lock:
+            records = list(self._records)[-limit:]
+
+        return b'[' + b','.join(record.serialized(wire) for record in records) + b']'
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Todas as mensagens no formato verboso"""
+        with self._lock:
+            return [record.to_dict() for record in self._records]
+
+    def __iter__(self) -> Iterator[ChatRecord]:
+        with self._lock:
+            return iter(list(self._records))
+
+    def __len__(self) -> int:
+        return len(self._records)
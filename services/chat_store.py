@@ -0,0 +1,361 @@
+"""
+Streamhive Chat Store
+Persistência do chat com escrita em segundo plano (write-behind) e retenção por sala
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from flask_socketio import SocketIO
+
+from database.connection import DatabaseManager, get_db_manager
+from services.chat_history import ChatRecord
+
+
+# Intervalo máximo entre gravações em lote (milissegundos)
+CHAT_WRITE_INTERVAL_MS = int(os.environ.get('CHAT_WRITE_INTERVAL_MS', 500))
+
+# Mensagens por transação; a fila é gravada antes se atingir este tamanho
+CHAT_WRITE_BATCH_MAX = int(os.environ.get('CHAT_WRITE_BATCH_MAX', 200))
+
+# Tentativas do lote antes de gravar mensagem por mensagem (as que falham sozinhas são descartadas)
+CHAT_WRITE_MAX_ATTEMPTS = int(os.environ.get('CHAT_WRITE_MAX_ATTEMPTS', 3))
+
+# Retenção padrão (salas sem configuração própria)
+CHAT_RETENTION_MAX_MESSAGES = int(os.environ.get('CHAT_RETENTION_MAX_MESSAGES', 5000))
+CHAT_RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', 30))
+
+# Limpeza de mensagens antigas: intervalo (segundos) e linhas por DELETE
+CHAT_PRUNE_INTERVAL = float(os.environ.get('CHAT_PRUNE_INTERVAL', 600))
+CHAT_PRUNE_BATCH = int(os.environ.get('CHAT_PRUNE_BATCH', 500))
+
+# Página máxima do histórico paginado
+CHAT_PAGE_SIZE_MAX = int(os.environ.get('CHAT_PAGE_SIZE_MAX', 100))
+
+
+class ChatStore:
+    """
+    Armazenamento do chat no SQLite
+
+    Os handlers de socket apenas enfileiram mensagens em memória; uma tarefa
+    em segundo plano grava a fila em lote, em uma única transação. Os IDs
+    são atribuídos aqui, em ordem crescente, para que a mensagem tenha seu
+    ID definitivo antes de ser gravada e possa servir de cursor na paginação.
+    """
+
+    def __init__(self, socketio: SocketIO, db: Optional[DatabaseManager] = None):
+        """
+        Inicializa o armazenamento e inicia as tarefas de gravação e limpeza
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            db: Gerenciador do banco (padrão: instância global)
+        """
+        self.socketio = socketio
+        self.db = db or get_db_manager()
+        self.logger = logging.getLogger(__name__)
+
+        self._pending: List[Tuple[str, ChatRecord]] = []
+        self._inflight: List[Tuple[str, ChatRecord]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_id: Optional[int] = None
+        self._failures = 0  # falhas seguidas do lote na frente da fila
+        self.dropped = 0
+
+        # Maior ID já gravado, lido uma vez aqui e não na primeira mensagem
+        self._last_id = self._max_id()
+
+        self.socketio.start_background_task(self._write_loop)
+        self.socketio.start_background_task(self._prune_loop)
+        atexit.register(self.flush)
+
+    def next_id(self) -> int:
+        """
+        Próximo ID de mensagem
+
+        Returns:
+            int: ID maior que qualquer mensagem já gravada ou enfileirada
+        """
+        with self._lock:
+            if self._last_id is None:
+                # Banco indisponível na inicialização: tenta de novo agora
+                self._last_id = self._max_id() or 0
+            self._last_id += 1
+            return self._last_id
+
+    def _max_id(self) -> Optional[int]:
+        """Maior ID gravado (0 sem mensagens) ou None se a consulta falhar"""
+        rows = self.db.execute_query('SELECT MAX(id) AS last_id FROM chat_messages')
+        if rows is None:
+            return None
+        return (rows[0]['last_id'] if rows else None) or 0
+
+    def enqueue(self, room_id: str, record: ChatRecord):
+        """
+        Enfileira uma mensagem para gravação em segundo plano
+
+        Args:
+            room_id: ID da sala
+            record: Mensagem com ID obtido em next_id()
+        """
+        with self._lock:
+            self._pending.append((room_id, record))
+            full = len(self._pending) >= CHAT_WRITE_BATCH_MAX
+
+        if full:
+            self.socketio.start_background_task(self.flush)
+
+    def flush(self) -> int:
+        """
+        Grava todas as mensagens pendentes em uma transação
+
+        Se a transação falhar, as mensagens voltam para a frente da fila.
+        Depois de CHAT_WRITE_MAX_ATTEMPTS falhas seguidas, cada mensagem é
+        gravada sozinha: uma linha inválida não segura mais as outras, e as
+        que falham mesmo assim são descartadas (e registradas no log).
+
+        Returns:
+            int: Número de mensagens gravadas
+        """
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._inflight = pending
+
+            if not pending:
+                return 0
+
+            try:
+                written = self._write(pending)
+                self._failures = 0
+
+            except Exception as e:
+                self._failures += 1
+                self.logger.error(f"Erro ao gravar {len(pending)} mensagens do chat "
+                                  f"(tentativa {self._failures}): {e}")
+                if self._failures < CHAT_WRITE_MAX_ATTEMPTS:
+                    # Devolve à fila para a próxima tentativa, preservando a ordem
+                    with self._lock:
+                        self._pending[:0] = pending
+                    written = 0
+                else:
+                    written = self._write_each(pending)
+                    self._failures = 0
+
+            with self._lock:
+                self._inflight = []
+            return written
+
+    def _write(self, pending: List[Tuple[str, ChatRecord]]) -> int:
+        """Grava as mensagens em uma transação (exceção se qualquer uma falhar)"""
+        rows = [
+            (record.id, int(room_id), int(record.user_id), record.username,
+             record.message, record.timestamp)
+            for room_id, record in pending
+        ]
+
+        with self.db.get_connection() as conn:
+            conn.executemany(
+                '''
+                INSERT OR IGNORE INTO chat_messages (id, room_id, user_id, username, message, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                rows
+            )
+            conn.commit()
+        return len(rows)
+
+    def _write_each(self, pending: List[Tuple[str, ChatRecord]]) -> int:
+        """Grava mensagem por mensagem, descartando as que falham"""
+        written = 0
+        for item in pending:
+            try:
+                written += self._write([item])
+            except Exception as e:
+                room_id, record = item
+                self.dropped += 1
+                self.logger.error(f"Mensagem {record.id} do chat da sala {room_id} descartada: {e}")
+        return written
+
+    def get_messages(self, room_id: str, before: Optional[int] = None,
+                     limit: int = 50) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Página do histórico anterior a uma mensagem (paginação por cursor)
+
+        Args:
+            room_id: ID da sala
+            before: ID da mensagem mais antiga já carregada (None = mais recentes)
+            limit: Número máximo de mensagens
+
+        Returns:
+            Tuple (mensagens em ordem cronológica, há mais mensagens antigas)
+        """
+        limit = max(1, limit)
+        cursor = before if before is not None else 2 ** 63 - 1
+
+        # Mensagens ainda na fila (ou sendo gravadas) também fazem parte do histórico
+        with self._lock:
+            pending = [
+                record for pending_room, record in self._inflight + self._pending
+                if pending_room == room_id and record.id < cursor
+            ]
+
+        rows = self.db.execute_query(
+            '''
+            SELECT id, user_id, username, message, created_at
+            FROM chat_messages
+            WHERE room_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+            ''',
+            (int(room_id), cursor, limit + 1)
+        ) or []
+
+        pending_ids = {record.id for record in pending}
+        records = pending + [
+            ChatRecord(
+                id=row['id'],
+                user_id=str(row['user_id']),
+                username=row['username'],
+                message=row['message'],
+                timestamp=row['created_at']
+            )
+            for row in rows if row['id'] not in pending_ids
+        ]
+        records.sort(key=lambda record: record.id, reverse=True)
+
+        has_more = len(records) > limit
+        page = records[:limit]
+        page.reverse()
+        return [record.to_dict() for record in page], has_more
+
+    def pending_count(self) -> int:
+        """Mensagens ainda não gravadas (na fila ou em gravação)"""
+        with self._lock:
+            return len(self._pending) + len(self._inflight)
+
+    def get_retention(self, room_id: str) -> Dict[str, int]:
+        """
+        Retenção configurada para uma sala
+
+        Returns:
+            dict: max_messages e max_age_days
+        """
+        rows = self.db.execute_query(
+            'SELECT max_messages, max_age_days FROM chat_retention WHERE room_id = ?',
+            (int(room_id),)
+        )
+        if rows:
+            return {'max_messages': rows[0]['max_messages'], 'max_age_days': rows[0]['max_age_days']}
+        return {'max_messages': CHAT_RETENTION_MAX_MESSAGES, 'max_age_days': CHAT_RETENTION_DAYS}
+
+    def set_retention(self, room_id: str, max_messages: int, max_age_days: int) -> bool:
+        """
+        Define a retenção do chat de uma sala
+
+        Args:
+            room_id: ID da sala
+            max_messages: Número máximo de mensagens guardadas
+            max_age_days: Idade máxima das mensagens em dias
+
+        Returns:
+            bool: True se salvo com sucesso
+        """
+        return self.db.execute_update(
+            '''
+            INSERT INTO chat_retention (room_id, max_messages, max_age_days)
+            VALUES (?, ?, ?)
+            ON CONFLICT(room_id) DO UPDATE SET
+                max_messages = excluded.max_messages,
+                max_age_days = excluded.max_age_days
+            ''',
+            (int(room_id), max_messages, max_age_days)
+        )
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Remove mensagens fora da retenção de cada sala
+
+        A remoção é feita em lotes de CHAT_PRUNE_BATCH linhas por transação,
+        para não segurar o lock de escrita do SQLite por muito tempo.
+
+        Returns:
+            int: Número de mensagens removidas
+        """
+        now = time.time() if now is None else now
+        rooms = self.db.execute_query(
+            '''
+            SELECT m.room_id, r.max_messages, r.max_age_days
+            FROM (SELECT DISTINCT room_id FROM chat_messages) m
+            LEFT JOIN chat_retention r ON r.room_id = m.room_id
+            '''
+        ) or []
+
+        removed = 0
+        for row in rooms:
+            max_messages = row['max_messages'] if row['max_messages'] is not None else CHAT_RETENTION_MAX_MESSAGES
+            max_age_days = row['max_age_days'] if row['max_age_days'] is not None else CHAT_RETENTION_DAYS
+
+            # Mensagem mais antiga que ainda cabe no limite de quantidade
+            oldest_kept = self.db.execute_query(
+                'SELECT id FROM chat_messages WHERE room_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?',
+                (row['room_id'], max(max_messages - 1, 0))
+            )
+            min_id = oldest_kept[0]['id'] if oldest_kept else 0
+            min_created = now - max_age_days * 86400
+
+            removed += self._delete_batched(row['room_id'], min_id, min_created)
+
+        if removed:
+            self.logger.info(f"Retenção do chat: {removed} mensagens removidas")
+        return removed
+
+    def _delete_batched(self, room_id: int, min_id: int, min_created: float) -> int:
+        """Remove em lotes as mensagens com ID ou data abaixo dos limites"""
+        removed = 0
+        while True:
+            with self.db.get_connection() as conn:
+                cursor = conn.execute(
+                    '''
+                    DELETE FROM chat_messages WHERE id IN (
+                        SELECT id FROM chat_messages
+                        WHERE room_id = ? AND (id < ? OR created_at < ?)
+                        LIMIT ?
+                    )
+                    ''',
+                    (room_id, min_id, min_created, CHAT_PRUNE_BATCH)
+                )
+                conn.commit()
+                deleted = cursor.rowcount
+
+            removed += deleted
+            if deleted < CHAT_PRUNE_BATCH:
+                return removed
+
+            # Cede a vez a outras escritas entre os lotes
+            self.socketio.sleep(0)
+
+    def _write_loop(self):
+        """Grava a fila periodicamente"""
+        while True:
+            self.socketio.sleep(CHAT_WRITE_INTERVAL_MS / 1000)
+
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Erro no write-behind do chat: {e}")
+
+    def _prune_loop(self):
+        """Aplica a retenção periodicamente"""
+        while True:
+            self.socketio.sleep(CHAT_PRUNE_INTERVAL)
+
+            try:
+                self.prune()
+            except Exception as e:
+                self.logger.error(f"Erro na limpeza do chat: {e}")
@@ -0,0 +1,446 @@
+"""
+Streamhive Disk Cache
+Cache em disco (arquivos esparsos + bitmap de blocos) para downloads progressivos grandes
+"""
+
+import os
+import mmap
+import time
+import shutil
+import atexit
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Mapping, Optional, Tuple
+
+from services.segment_cache import parse_range
+
+
+# Diretório do cache (cada processo usa um subdiretório próprio, limpo ao iniciar)
+PROXY_DISK_CACHE_DIR = os.environ.get(
+    'PROXY_DISK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'streamhive-proxy-cache')
+)
+
+# Cota de disco (bytes de blocos presentes); 0 desativa o cache em disco
+PROXY_DISK_CACHE_MAX_BYTES = int(os.environ.get('PROXY_DISK_CACHE_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+
+# Granularidade do bitmap: um bloco só é marcado presente quando escrito por inteiro
+PROXY_DISK_CACHE_BLOCK_SIZE = int(os.environ.get('PROXY_DISK_CACHE_BLOCK_SIZE', 1024 * 1024))
+
+# Cabeçalhos do upstream guardados com o arquivo
+DISK_CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def response_extent(status: int, headers: Mapping[str, str]) -> Optional[Tuple[int, int]]:
+    """
+    Posição e tamanho total do corpo de uma resposta do upstream
+
+    Args:
+        status: Status da resposta (200 ou 206)
+        headers: Cabeçalhos da resposta
+
+    Returns:
+        tuple: (offset do primeiro byte, tamanho total do arquivo) ou None se desconhecido
+    """
+    try:
+        if status == 200:
+            return 0, int(headers.get('Content-Length', ''))
+        if status == 206:
+            # bytes <início>-<fim>/<total>
+            unit, _, spec = (headers.get('Content-Range') or '').partition(' ')
+            span, _, total = spec.partition('/')
+            if unit.lower() != 'bytes' or total == '*':
+                return None
+            return int(span.partition('-')[0]), int(total)
+    except ValueError:
+        return None
+    return None
+
+
+class DiskEntry:
+    """
+    Arquivo esparso com o conteúdo (parcial) de uma URL
+
+    O arquivo tem o tamanho total do recurso desde a criação; só os blocos
+    marcados no bitmap contêm dados válidos.
+    """
+
+    def __init__(self, url: str, path: str, size: int, block_size: int, headers: Dict[str, str]):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.block_size = block_size
+        self.blocks = (size + block_size - 1) // block_size
+        self.bitmap = bytearray((self.blocks + 7) // 8)
+        self.present_bytes = 0
+        self.headers = headers
+        self.last_access = time.monotonic()
+        self._map: Optional[mmap.mmap] = None
+        self._map_lock = threading.Lock()
+        self._readers = 0       # respostas usando o mapeamento
+        self._closed = False    # removido do cache; o mapeamento fecha com o último leitor
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)  # esparso: não ocupa disco até ser escrito
+        finally:
+            os.close(fd)
+
+    def has_block(self, index: int) -> bool:
+        return bool(self.bitmap[index >> 3] & (1 << (index & 7)))
+
+    def mark_block(self, index: int) -> int:
+        """Marca o bloco como presente; devolve os bytes acrescentados (0 se já estava)"""
+        if self.has_block(index):
+            return 0
+        self.bitmap[index >> 3] |= 1 << (index & 7)
+        added = min(self.block_size, self.size - index * self.block_size)
+        self.present_bytes += added
+        return added
+
+    def available_until(self, start: int, end: int) -> int:
+        """Primeiro byte ausente em [start, end], ou end + 1 se o intervalo está completo"""
+        index = start // self.block_size
+        while index * self.block_size <= end:
+            if not self.has_block(index):
+                return max(start, index * self.block_size)
+            index += 1
+        return end + 1
+
+    @contextmanager
+    def mapped(self) -> Iterator[mmap.mmap]:
+        """
+        Mapeamento do arquivo para uma resposta inteira
+
+        O mapeamento é criado uma vez e compartilhado; se o arquivo sair do
+        cache no meio de uma resposta, ele só é fechado quando o último
+        leitor terminar.
+
+        Raises:
+            OSError: Arquivo já removido do cache
+        """
+        with self._map_lock:
+            if self._closed:
+                raise OSError(f'Arquivo removido do cache: {self.url}')
+            if self._map is None:
+                fd = os.open(self.path, os.O_RDONLY)
+                try:
+                    self._map = mmap.mmap(fd, self.size, access=mmap.ACCESS_READ)
+                finally:
+                    os.close(fd)
+            self._readers += 1
+            view = self._map
+
+        try:
+            yield view
+        finally:
+            with self._map_lock:
+                self._readers -= 1
+                if self._closed and not self._readers:
+                    self._release_map()
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Lê bytes presentes pelo mapeamento do arquivo"""
+        with self.mapped() as view:
+            return view[offset:offset + length]
+
+    def response_headers(self, status: int, start: int, end: int) -> Dict[str, str]:
+        """Cabeçalhos de uma resposta servida deste arquivo"""
+        headers = dict(self.headers)
+        headers['Accept-Ranges'] = 'bytes'
+        headers['Content-Length'] = str(end - start + 1)
+        if status == 206:
+            headers['Content-Range'] = f'bytes {start}-{end}/{self.size}'
+        return headers
+
+    def plan(self, range_header: Optional[str]) -> Optional[Tuple[int, int, int]]:
+        """
+        Status e intervalo da resposta ao pedido do cliente
+
+        Returns:
+            tuple: (status, início, fim inclusivo) ou None se o Range for inválido ou múltiplo
+        """
+        if not range_header:
+            return 200, 0, self.size - 1
+        bounds = parse_range(range_header, self.size)
+        if bounds is None:
+            return None
+        return 206, bounds[0], bounds[1]
+
+    def close(self):
+        """Arquivo saiu do cache: fecha o mapeamento agora ou ao fim do último leitor"""
+        with self._map_lock:
+            self._closed = True
+            if not self._readers:
+                self._release_map()
+
+    def _release_map(self):
+        """Fecha o mapeamento (chamado com _map_lock)"""
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+
+
+class BlockWriter:
+    """
+    Grava no arquivo esparso os bytes de uma resposta que está sendo repassada
+
+    Os blocos são marcados à medida que ficam completos; blocos cortados no
+    início ou no fim do intervalo continuam ausentes até outra resposta
+    cobri-los por inteiro. Cada gravador tem o próprio descritor: se o
+    arquivo for removido no meio, as gravações restantes vão para o inode
+    já desligado e são descartadas com ele.
+    """
+
+    def __init__(self, cache: 'DiskCache', entry: DiskEntry, offset: int):
+        self.cache = cache
+        self.entry = entry
+        self.position = offset
+        self.next_block = (offset + entry.block_size - 1) // entry.block_size  # primeiro bloco inteiro
+        self.enabled = True
+        self._fd: Optional[int] = None
+
+    def write(self, chunk: bytes):
+        """Grava o próximo trecho do corpo (na ordem em que chega)"""
+        if not self.enabled or not chunk:
+            return
+
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.entry.path, os.O_WRONLY)
+            os.pwrite(self._fd, chunk, self.position)
+        except OSError as e:
+            self.cache.logger.error(f"Erro ao gravar no cache em disco: {e}")
+            self.close()
+            return
+
+        self.position += len(chunk)
+
+        # Blocos que ficaram completos com este trecho (o último pode ser menor)
+        complete = self.entry.blocks if self.position >= self.entry.size else self.position // self.entry.block_size
+        if complete > self.next_block:
+            if not self.cache.commit(self.entry, self.next_block, complete):
+                self.close()
+            self.next_block = complete
+
+    def close(self):
+        """Encerra a gravação"""
+        self.enabled = False
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class DiskCache:
+    """
+    Cache em disco por URL, endereçado por blocos, com cota global
+
+    Cada URL vira um arquivo esparso do tamanho do recurso; um bitmap em
+    memória registra os blocos presentes. Pedidos cobertos pelo bitmap são
+    servidos do arquivo (sendfile quando o servidor permite); lacunas são
+    buscadas no upstream e gravadas enquanto passam. Acima da cota, os
+    arquivos assistidos há mais tempo são removidos.
+    """
+
+    def __init__(self, directory: str = PROXY_DISK_CACHE_DIR,
+                 max_bytes: int = PROXY_DISK_CACHE_MAX_BYTES,
+                 block_size: int = PROXY_DISK_CACHE_BLOCK_SIZE):
+        """
+        Inicializa o cache
+
+        Args:
+            directory: Diretório base
+            max_bytes: Cota de disco
+            block_size: Tamanho do bloco do bitmap
+        """
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.logger = logging.getLogger(__name__)
+        self._entries: 'OrderedDict[str, DiskEntry]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._ready = False
+        self.present_bytes = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, url: str) -> Optional[DiskEntry]:
+        """Arquivo da URL, marcado como assistido agora"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                entry.last_access = time.monotonic()
+                self._entries.move_to_end(url, last=True)
+            return entry
+
+    def record(self, entry: DiskEntry, start: int, end: int) -> int:
+        """
+        Contabiliza um pedido servido a partir do arquivo
+
+        Returns:
+            int: Primeiro byte ausente em [start, end] (end + 1 se completo)
+        """
+        with self._lock:
+            available = entry.available_until(start, end)
+            if available > end:
+                self.hits += 1
+            elif available > start:
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+            return available
+
+    def open(self, url: str, size: int, headers: Mapping[str, str]) -> Optional[DiskEntry]:
+        """
+        Arquivo da URL para gravação, criado se preciso
+
+        Um arquivo existente com outro tamanho ou ETag é descartado (o
+        recurso mudou no upstream).
+
+        Args:
+            url: URL do upstream
+            size: Tamanho total do recurso
+            headers: Cabeçalhos do upstream
+
+        Returns:
+            DiskEntry: Arquivo ou None se o cache estiver desativado ou o recurso não couber
+        """
+        if not self.enabled or size <= 0 or size > self.max_bytes:
+            return None
+
+        kept = {name: headers[name] for name in DISK_CACHED_HEADERS if headers.get(name)}
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                if entry.size == size and entry.headers.get('ETag') == kept.get('ETag'):
+                    return entry
+                self._remove(url)
+
+            try:
+                self._prepare_directory()
+                path = os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+                entry = DiskEntry(url, path, size, self.block_size, kept)
+            except OSError as e:
+                self.logger.error(f"Erro ao criar arquivo do cache em disco: {e}")
+                return None
+
+            self._entries[url] = entry
+            self.misses += 1
+            return entry
+
+    def writer(self, entry: DiskEntry, offset: int) -> BlockWriter:
+        """Gravador para uma resposta que começa em `offset`"""
+        return BlockWriter(self, entry, offset)
+
+    def writer_for(self, url: str, status: int, headers: Mapping[str, str],
+                   min_size: int = 0) -> Optional[BlockWriter]:
+        """
+        Gravador para uma resposta do upstream, se ela deve ir para o disco
+
+        Só recursos acima de `min_size` e com suporte a Range no upstream
+        (sem ele as lacunas não poderiam ser preenchidas depois).
+
+        Args:
+            url: URL do upstream
+            status: Status da resposta
+            headers: Cabeçalhos da resposta
+            min_size: Tamanho mínimo do recurso
+
+        Returns:
+            BlockWriter: Gravador ou None
+        """
+        if not self.enabled:
+            return None
+
+        extent = response_extent(status, headers)
+        if extent is None or extent[1] <= min_size:
+            return None
+        if status == 200 and (headers.get('Accept-Ranges') or '').lower() != 'bytes':
+            return None
+
+        entry = self.open(url, extent[1], headers)
+        return self.writer(entry, extent[0]) if entry is not None else None
+
+    def commit(self, entry: DiskEntry, first: int, last: int) -> bool:
+        """
+        Marca como presentes os blocos [first, last) já gravados
+
+        Returns:
+            bool: False se o arquivo saiu do cache (removido ou acima da cota)
+        """
+        with self._lock:
+            if self._entries.get(entry.url) is not entry:
+                return False
+
+            added = 0
+            for index in range(first, last):
+                added += entry.mark_block(index)
+            self.present_bytes += added
+
+            while self.present_bytes > self.max_bytes:
+                victim = next(iter(self._entries))
+                if victim == entry.url:
+                    # Só o próprio arquivo excede a cota: para de gravar
+                    return False
+                self._remove(victim)
+                self.evictions += 1
+
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação e acertos"""
+        with self._lock:
+            lookups = self.hits + self.partial_hits + self.misses
+            return {
+                'files': len(self._entries),
+                'present_bytes': self.present_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'partial_hits': self.partial_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def clear(self):
+        """Remove todos os arquivos do processo"""
+        with self._lock:
+            for url in list(self._entries):
+                self._remove(url)
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._ready = False
+
+    def _prepare_directory(self):
+        """Cria o diretório do processo, descartando sobras de uma execução anterior"""
+        if self._ready:
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._ready = True
+
+    def _remove(self, url: str):
+        """Remove um arquivo do cache (chamado com o lock)"""
+        entry = self._entries.pop(url)
+        self.present_bytes -= entry.present_bytes
+        entry.close()
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+# Cache do processo, compartilhado pelo proxy do Flask e pelo motor assíncrono
+disk_cache = DiskCache()
+atexit.register(disk_cache.clear)
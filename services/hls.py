@@ -0,0 +1,123 @@
+"""
+Streamhive HLS
+Leitura e reescrita de playlists HLS (.m3u8) para que variantes e segmentos passem pelo proxy
+"""
+
+import re
+import time
+from typing import Dict, Any, Callable, List, Optional
+from urllib.parse import urljoin, urlparse, quote
+
+from utils.proxy_tokens import issue_proxy_token, proxy_token_secret
+
+
+# Content-Types de playlist HLS
+HLS_CONTENT_TYPES = (
+    'application/vnd.apple.mpegurl', 'application/x-mpegurl',
+    'audio/mpegurl', 'audio/x-mpegurl'
+)
+
+# Tamanho máximo de uma playlist lida para reescrita
+HLS_PLAYLIST_MAX_BYTES = 4 * 1024 * 1024
+
+# Atributo URI="..." de tags como EXT-X-KEY, EXT-X-MAP, EXT-X-MEDIA e EXT-X-I-FRAME-STREAM-INF
+URI_ATTRIBUTE = re.compile(r'URI="([^"]*)"')
+
+
+def is_playlist(url: str, content_type: Optional[str]) -> bool:
+    """
+    Indica se a resposta é uma playlist HLS
+
+    Args:
+        url: URL pedida
+        content_type: Content-Type do upstream
+    """
+    media_type = (content_type or '').split(';', 1)[0].strip().lower()
+    if media_type in HLS_CONTENT_TYPES:
+        return True
+    return urlparse(url).path.lower().endswith('.m3u8')
+
+
+class Playlist:
+    """Resultado da reescrita de uma playlist"""
+
+    __slots__ = ('text', 'is_master', 'segments', 'ended')
+
+    def __init__(self, text: str, is_master: bool, segments: List[str], ended: bool):
+        self.text = text
+        self.is_master = is_master
+        self.segments = segments  # URLs absolutas dos segmentos de mídia, em ordem
+        self.ended = ended        # EXT-X-ENDLIST (VOD) ou playlist ao vivo
+
+
+def rewrite_playlist(text: str, base_url: str, proxied: Callable[[str], str]) -> Playlist:
+    """
+    Reescreve as URIs de uma playlist master ou de mídia
+
+    URIs relativas são resolvidas contra a URL da playlist e todas passam
+    a apontar para o proxy, inclusive as de atributos (chaves, init
+    segments, renditions alternativas).
+
+    Args:
+        text: Conteúdo da playlist
+        base_url: URL final da playlist no upstream (após redirects)
+        proxied: Função URL absoluta -> URL do proxy
+
+    Returns:
+        Playlist: Texto reescrito e segmentos de mídia
+    """
+    lines = text.splitlines()
+    is_master = any(line.startswith('#EXT-X-STREAM-INF') for line in lines)
+    ended = any(line.strip() == '#EXT-X-ENDLIST' for line in lines)
+    segments: List[str] = []
+    output: List[str] = []
+
+    for line in lines:
+        stripped = line.strip()
+
+        if not stripped:
+            output.append(line)
+        elif stripped.startswith('#'):
+            if 'URI="' in stripped:
+                stripped = URI_ATTRIBUTE.sub(
+                    lambda match: f'URI="{proxied(urljoin(base_url, match.group(1)))}"', stripped
+                )
+            output.append(stripped)
+        else:
+            absolute = urljoin(base_url, stripped)
+            if not is_master:
+                segments.append(absolute)
+            output.append(proxied(absolute))
+
+    return Playlist('\n'.join(output) + '\n', is_master, segments, ended)
+
+
+def proxied_url_builder(claims: Optional[Dict[str, Any]], base: str = '',
+                        secret: Optional[str] = None) -> Callable[[str], str]:
+    """
+    Monta a função que gera as URLs do proxy para as URIs de uma playlist
+
+    Cada URI recebe um token próprio com o mesmo usuário, sala e validade
+    do token da playlist; sem chave ou claims de sala (acesso por sessão),
+    as URLs seguem sem token.
+
+    Args:
+        claims: Claims do acesso à playlist
+        base: Prefixo das URLs (vazio = mesma origem da playlist)
+        secret: Chave de assinatura
+
+    Returns:
+        Callable: URL absoluta -> URL do proxy
+    """
+    secret = secret or proxy_token_secret()
+    can_sign = bool(secret and claims and claims.get('rid') and claims.get('exp'))
+
+    def proxied(url: str) -> str:
+        result = f'{base}/proxy/stream?url={quote(url, safe="")}'
+        if can_sign:
+            ttl = max(0, int(claims['exp'] - time.time()))
+            token = issue_proxy_token(url, claims.get('uid'), claims['rid'], ttl=ttl, secret=secret)
+            result += f'&token={token}'
+        return result
+
+    return proxied
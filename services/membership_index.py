@@ -0,0 +1,168 @@
+"""
+Streamhive Membership Index
+Índice bidirecional de participação em salas por sid e por usuário
+"""
+
+import threading
+from typing import Dict, Optional, List, Set, Tuple
+
+
+class MembershipIndex:
+    """
+    Índice de quais conexões (sids) estão em quais salas
+
+    Mantém os dois sentidos (sid -> sala e sala -> sids) e o agrupamento por
+    usuário, para que várias abas ou dispositivos do mesmo usuário coexistam
+    e para que expulsões, saídas e encerramentos custem O(tamanho da sala).
+    """
+
+    def __init__(self):
+        """Inicializa o índice vazio"""
+        self._sid_room: Dict[str, str] = {}
+        self._sid_user: Dict[str, str] = {}
+        self._room_sids: Dict[str, Set[str]] = {}
+        self._room_user_sids: Dict[Tuple[str, str], Set[str]] = {}
+        self._room_users: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def join(self, sid: str, user_id: str, room_id: str) -> bool:
+        """
+        Registra um sid em uma sala
+
+        Args:
+            sid: ID da conexão Socket.IO
+            user_id: ID do usuário dono da conexão
+            room_id: ID da sala
+
+        Returns:
+            bool: True se for a primeira conexão do usuário nesta sala
+        """
+        with self._lock:
+            self._sid_room[sid] = room_id
+            self._sid_user[sid] = user_id
+            self._room_sids.setdefault(room_id, set()).add(sid)
+
+            user_sids = self._room_user_sids.setdefault((room_id, user_id), set())
+            first = not user_sids
+            user_sids.add(sid)
+            if first:
+                self._room_users.setdefault(room_id, set()).add(user_id)
+            return first
+
+    def leave(self, sid: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """
+        Remove um sid da sala em que estiver
+
+        Args:
+            sid: ID da conexão Socket.IO
+
+        Returns:
+            Tuple (room_id, user_id, última conexão do usuário na sala)
+        """
+        with self._lock:
+            room_id = self._sid_room.pop(sid, None)
+            user_id = self._sid_user.pop(sid, None)
+            if room_id is None:
+                return None, None, False
+
+            room_sids = self._room_sids.get(room_id)
+            if room_sids is not None:
+                room_sids.discard(sid)
+                if not room_sids:
+                    del self._room_sids[room_id]
+
+            key = (room_id, user_id)
+            user_sids = self._room_user_sids.get(key)
+            last = True
+            if user_sids is not None:
+                user_sids.discard(sid)
+                last = not user_sids
+                if last:
+                    del self._room_user_sids[key]
+            if last:
+                self._discard_user(room_id, user_id)
+
+            return room_id, user_id, last
+
+    def remove_user(self, room_id: str, user_id: str) -> List[str]:
+        """
+        Remove todas as conexões de um usuário de uma sala
+
+        Args:
+            room_id: ID da sala
+            user_id: ID do usuário
+
+        Returns:
+            Lista de sids removidos
+        """
+        with self._lock:
+            sids = self._room_user_sids.pop((room_id, user_id), set())
+            room_sids = self._room_sids.get(room_id)
+
+            for sid in sids:
+                self._sid_room.pop(sid, None)
+                self._sid_user.pop(sid, None)
+                if room_sids is not None:
+                    room_sids.discard(sid)
+
+            if room_sids is not None and not room_sids:
+                del self._room_sids[room_id]
+            self._discard_user(room_id, user_id)
+
+            return list(sids)
+
+    def remove_room(self, room_id: str) -> List[str]:
+        """
+        Remove todas as conexões de uma sala
+
+        Args:
+            room_id: ID da sala
+
+        Returns:
+            Lista de sids removidos
+        """
+        with self._lock:
+            sids = self._room_sids.pop(room_id, set())
+            self._room_users.pop(room_id, None)
+
+            for sid in sids:
+                self._sid_room.pop(sid, None)
+                user_id = self._sid_user.pop(sid, None)
+                self._room_user_sids.pop((room_id, user_id), None)
+
+            return list(sids)
+
+    def room_of(self, sid: str) -> Optional[str]:
+        """Sala em que o sid está, ou None"""
+        return self._sid_room.get(sid)
+
+    def sids_in_room(self, room_id: str) -> List[str]:
+        """Conexões presentes em uma sala"""
+        with self._lock:
+            return list(self._room_sids.get(room_id, ()))
+
+    def users_in_room(self, room_id: str) -> Set[str]:
+        """Usuários com pelo menos uma conexão na sala"""
+        with self._lock:
+            return set(self._room_users.get(room_id, ()))
+
+    def _discard_user(self, room_id: str, user_id: str):
+        """Tira o usuário do conjunto da sala (chamado com o lock)"""
+        users = self._room_users.get(room_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._room_users[room_id]
+
+    def sid_rooms(self) -> List[Tuple[str, str]]:
+        """Pares (sid, room_id) de todas as conexões em sala"""
+        with self._lock:
+            return list(self._sid_room.items())
+
+    def room_count(self) -> int:
+        """Número de salas com pelo menos uma conexão"""
+        return len(self._room_sids)
+
+    def sid_count(self) -> int:
+        """Número de conexões em alguma sala"""
+        return len(self._sid_room)
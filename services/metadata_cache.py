@@ -0,0 +1,168 @@
+"""
+Streamhive Metadata Cache
+Cache das informações de vídeo (HEAD no upstream) com TTL e revalidação em segundo plano
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+
+# Informações consideradas atuais (segundos)
+VIDEO_INFO_TTL = float(os.environ.get('VIDEO_INFO_TTL', 300))
+
+# Depois do TTL, por quanto tempo a informação antiga ainda é servida enquanto é revalidada
+VIDEO_INFO_STALE_TTL = float(os.environ.get('VIDEO_INFO_STALE_TTL', 3600))
+
+# Falhas (upstream fora, 4xx/5xx) lembradas para não repetir o HEAD a cada pedido
+VIDEO_INFO_NEGATIVE_TTL = float(os.environ.get('VIDEO_INFO_NEGATIVE_TTL', 30))
+
+# URLs mantidas (as consultadas há mais tempo são esquecidas)
+VIDEO_INFO_CACHE_SIZE = 1024
+
+
+class _Entry:
+    """Resultado de uma sondagem; info None é uma falha"""
+
+    __slots__ = ('info', 'fetched_at', 'revalidating', 'retry_at')
+
+    def __init__(self, info: Optional[Dict[str, Any]], fetched_at: float):
+        self.info = info
+        self.fetched_at = fetched_at
+        self.revalidating = False
+        self.retry_at = 0.0  # revalidação falhou: não tentar de novo antes disso
+
+
+class MetadataCache:
+    """
+    Informações de vídeo por URL, servidas sem esperar o upstream
+
+    A primeira consulta de uma URL espera a sondagem; as seguintes, dentro
+    do TTL, saem da memória. Passado o TTL, a informação antiga continua
+    sendo servida na hora enquanto uma thread de fundo sonda de novo
+    (stale-while-revalidate); se essa sondagem falhar, a antiga segue valendo
+    até o fim da janela. Falhas da primeira sondagem ficam em cache por
+    pouco tempo (cache negativo).
+    """
+
+    def __init__(self, probe: Callable[[str], Optional[Dict[str, Any]]],
+                 ttl: float = VIDEO_INFO_TTL,
+                 stale_ttl: float = VIDEO_INFO_STALE_TTL,
+                 negative_ttl: float = VIDEO_INFO_NEGATIVE_TTL,
+                 max_entries: int = VIDEO_INFO_CACHE_SIZE):
+        """
+        Inicializa o cache
+
+        Args:
+            probe: Consulta o upstream e devolve as informações ou None em falha
+            ttl: Validade das informações
+            stale_ttl: Janela em que as informações vencidas ainda são servidas
+            negative_ttl: Validade de uma falha
+            max_entries: URLs mantidas
+        """
+        self.probe = probe
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(__name__)
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Informações do vídeo
+
+        Args:
+            url: URL do vídeo
+
+        Returns:
+            dict: Informações (cópia) ou None se a sondagem falhou
+        """
+        now = time.monotonic()
+        stale = None
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url, last=True)
+                age = now - entry.fetched_at
+
+                if entry.info is None:
+                    if age < self.negative_ttl:
+                        self.negative_hits += 1
+                        return None
+                elif age < self.ttl:
+                    self.hits += 1
+                    return dict(entry.info)
+                elif age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    stale = dict(entry.info)
+                    if entry.revalidating or now < entry.retry_at:
+                        return stale
+                    entry.revalidating = True
+                    self.revalidations += 1
+
+            if stale is None:
+                self.misses += 1
+
+        if stale is not None:
+            threading.Thread(target=self._revalidate, args=(url,), name='video-info-revalidate',
+                             daemon=True).start()
+            return stale
+
+        info = self.probe(url)
+        self._store(url, info)
+        return dict(info) if info is not None else None
+
+    def invalidate(self, url: str):
+        """Esquece a URL (a próxima consulta sonda o upstream)"""
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Acertos (atuais, vencidos e negativos) e revalidações"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+            served = self.hits + self.stale_hits + self.negative_hits
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_ratio': round(served / lookups, 4) if lookups else 0.0,
+                'revalidations': self.revalidations
+            }
+
+    def _revalidate(self, url: str):
+        """Sonda de novo uma URL vencida; em falha, a informação antiga continua valendo"""
+        info = None
+        try:
+            info = self.probe(url)
+        except Exception as e:
+            self.logger.error(f"Erro ao revalidar info do vídeo {url}: {e}")
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return
+            entry.revalidating = False
+            if info is None:
+                entry.retry_at = time.monotonic() + self.negative_ttl
+                return
+        self._store(url, info)
+
+    def _store(self, url: str, info: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = _Entry(dict(info) if info is not None else None, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
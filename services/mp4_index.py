@@ -0,0 +1,366 @@
+"""
+Streamhive MP4 Index
+Leitura do box moov de arquivos MP4 progressivos: tempo de mídia -> offset em bytes
+"""
+
+import os
+import sys
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Maior box moov aceito (bytes); acima disso o arquivo não é indexado
+MP4_MOOV_MAX_BYTES = int(os.environ.get('MP4_MOOV_MAX_BYTES', 32 * 1024 * 1024))
+
+# Bytes lidos do início do arquivo na primeira requisição (faststart: moov já vem aqui)
+MP4_PROBE_BYTES = 256 * 1024
+
+# Boxes de topo percorridos à procura do moov
+MP4_MAX_TOP_LEVEL_BOXES = 64
+
+# Intervalos de trilhas diferentes mais próximos que isso viram um só
+MP4_RANGE_MERGE_GAP = 1024 * 1024
+
+# (dados, tamanho total do recurso) de um intervalo do upstream
+RangeFetch = Callable[[int, int], Optional[Tuple[bytes, int]]]
+
+
+class Mp4Error(ValueError):
+    """Box MP4 malformado ou sem tabela de amostras utilizável"""
+
+
+def iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Boxes filhos em data[start:end]
+
+    Returns:
+        Iterator: (tipo, início do conteúdo, fim do box)
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4Error('cabeçalho de box truncado')
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise Mp4Error(f'box {kind!r} fora dos limites')
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _find(data: bytes, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child, body, box_end in iter_boxes(data, start, end):
+        if child == kind:
+            return body, box_end
+    return None
+
+
+def _table(data: bytes, body: int) -> Tuple[int, int]:
+    """(número de entradas, início da tabela) de um full box com contador"""
+    count = struct.unpack_from('>I', data, body + 4)[0]
+    return count, body + 8
+
+
+def _unpack_array(typecode: str, data: bytes, offset: int, count: int, width: int) -> array:
+    """Inteiros big-endian consecutivos como array"""
+    values = array(typecode, data[offset:offset + count * width])
+    if len(values) != count:
+        raise Mp4Error('tabela truncada')
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+class TrackIndex:
+    """
+    Tabela de amostras de uma trilha, reduzida ao nível de chunk
+
+    Guarda o tempo de cada trecho da tabela stts, as amostras de sincronia
+    (stss) e, por chunk, o offset no arquivo, a primeira amostra e o tamanho
+    em bytes. É o suficiente para achar os bytes de um intervalo de tempo
+    sem manter o tamanho de cada amostra.
+    """
+
+    def __init__(self, kind: str, timescale: int, duration: int, sample_count: int,
+                 run_samples: array, run_times: array, run_deltas: array,
+                 sync_samples: Optional[array], chunk_offsets: array,
+                 chunk_first_sample: array, chunk_sizes: array):
+        self.kind = kind
+        self.timescale = timescale
+        self.duration = duration
+        self.sample_count = sample_count
+        self.run_samples = run_samples        # primeira amostra de cada trecho do stts
+        self.run_times = run_times            # tempo da primeira amostra do trecho
+        self.run_deltas = run_deltas          # duração das amostras do trecho
+        self.sync_samples = sync_samples      # None: todas as amostras são de sincronia
+        self.chunk_offsets = chunk_offsets
+        self.chunk_first_sample = chunk_first_sample
+        self.chunk_sizes = chunk_sizes
+
+    def sample_at(self, seconds: float) -> int:
+        """Amostra tocada em `seconds` (a última, se além do fim)"""
+        units = max(0, int(seconds * self.timescale))
+        run = max(0, bisect_right(self.run_times, units) - 1)
+        index = self.run_samples[run] + (units - self.run_times[run]) // max(1, self.run_deltas[run])
+        return min(index, self.sample_count - 1)
+
+    def sync_before(self, sample: int) -> int:
+        """Amostra de sincronia (quadro-chave) onde a decodificação de `sample` começa"""
+        if self.sync_samples is None or not self.sync_samples:
+            return sample
+        position = bisect_right(self.sync_samples, sample) - 1
+        return self.sync_samples[max(0, position)]
+
+    def chunk_of(self, sample: int) -> int:
+        return max(0, bisect_right(self.chunk_first_sample, sample) - 1)
+
+    def byte_range(self, seconds: float, window: float) -> Tuple[int, int]:
+        """
+        Bytes necessários para tocar [seconds, seconds + window]
+
+        Returns:
+            tuple: (início, fim inclusivo) no arquivo
+        """
+        first = self.chunk_of(self.sync_before(self.sample_at(seconds)))
+        last = self.chunk_of(self.sample_at(seconds + window))
+        chunks = range(first, max(first, last) + 1)
+        start = min(self.chunk_offsets[chunk] for chunk in chunks)
+        end = max(self.chunk_offsets[chunk] + self.chunk_sizes[chunk] for chunk in chunks)
+        return start, end - 1
+
+
+class Mp4Index:
+    """Trilhas de áudio e vídeo de um MP4 e o tamanho do arquivo indexado"""
+
+    def __init__(self, tracks: List[TrackIndex], size: int):
+        self.tracks = tracks
+        self.size = size
+
+    @property
+    def duration(self) -> float:
+        return max((track.duration / track.timescale for track in self.tracks), default=0.0)
+
+    def byte_ranges(self, seconds: float, window: float) -> List[Tuple[int, int]]:
+        """
+        Intervalos do arquivo que cobrem [seconds, seconds + window] em todas as trilhas
+
+        Em arquivos intercalados as trilhas caem no mesmo trecho e viram um
+        intervalo só; trilhas gravadas em blocos separados dão um intervalo
+        cada. Edit lists (elst) não são aplicadas: o deslocamento que elas
+        causam é pequeno perto da janela.
+
+        Returns:
+            list: (início, fim inclusivo), ordenados
+        """
+        ranges = sorted(track.byte_range(seconds, window) for track in self.tracks)
+        merged: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            end = min(end, self.size - 1)
+            if merged and start <= merged[-1][1] + MP4_RANGE_MERGE_GAP:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            elif start <= end:
+                merged.append((start, end))
+        return merged
+
+
+def parse_moov(data: bytes, size: int) -> Mp4Index:
+    """
+    Índice a partir do conteúdo de um box moov (com o cabeçalho)
+
+    Args:
+        data: Bytes do box moov
+        size: Tamanho total do arquivo
+
+    Returns:
+        Mp4Index: Índice das trilhas de áudio e vídeo
+
+    Raises:
+        Mp4Error: Box malformado, MP4 fragmentado ou sem trilhas de mídia
+    """
+    moov = _find(data, 0, len(data), b'moov')
+    if moov is None:
+        raise Mp4Error('moov ausente')
+
+    tracks = []
+    for kind, body, end in iter_boxes(data, *moov):
+        if kind == b'mvex':
+            raise Mp4Error('MP4 fragmentado (amostras nos moof)')
+        if kind == b'trak':
+            track = _parse_trak(data, body, end)
+            if track is not None:
+                tracks.append(track)
+
+    if not tracks:
+        raise Mp4Error('nenhuma trilha de áudio ou vídeo')
+    return Mp4Index(tracks, size)
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> Optional[TrackIndex]:
+    """Tabela de amostras de uma trilha de áudio ou vídeo (None para as demais)"""
+    mdia = _find(data, start, end, b'mdia')
+    if mdia is None:
+        return None
+
+    hdlr = _find(data, *mdia, b'hdlr')
+    handler = data[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b''
+    if handler not in (b'vide', b'soun'):
+        return None
+
+    mdhd = _find(data, *mdia, b'mdhd')
+    if mdhd is None:
+        raise Mp4Error('mdhd ausente')
+    if data[mdhd[0]] == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, mdhd[0] + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, mdhd[0] + 12)
+    if not timescale:
+        raise Mp4Error('timescale zero')
+
+    minf = _find(data, *mdia, b'minf')
+    stbl = _find(data, *minf, b'stbl') if minf else None
+    if stbl is None:
+        raise Mp4Error('stbl ausente')
+    boxes: Dict[bytes, Tuple[int, int]] = {kind: (body, box_end) for kind, body, box_end in iter_boxes(data, *stbl)}
+
+    # stts: (quantidade, duração) por trecho
+    if b'stts' not in boxes:
+        raise Mp4Error('stts ausente')
+    count, table = _table(data, boxes[b'stts'][0])
+    pairs = _unpack_array('I', data, table, count * 2, 4)
+    run_samples, run_times, run_deltas = array('Q'), array('Q'), array('Q')
+    sample = elapsed = 0
+    for run in range(count):
+        run_count, delta = pairs[2 * run], pairs[2 * run + 1]
+        run_samples.append(sample)
+        run_times.append(elapsed)
+        run_deltas.append(delta)
+        sample += run_count
+        elapsed += run_count * delta
+    total_samples = sample
+
+    # stss: amostras de sincronia (numeradas a partir de 1); ausente = todas
+    sync_samples = None
+    if b'stss' in boxes:
+        count, table = _table(data, boxes[b'stss'][0])
+        sync_samples = array('Q', (number - 1 for number in _unpack_array('I', data, table, count, 4)))
+
+    # stco/co64: offset de cada chunk
+    if b'stco' in boxes:
+        count, table = _table(data, boxes[b'stco'][0])
+        chunk_offsets = array('Q', _unpack_array('I', data, table, count, 4))
+    elif b'co64' in boxes:
+        count, table = _table(data, boxes[b'co64'][0])
+        chunk_offsets = _unpack_array('Q', data, table, count, 8)
+    else:
+        raise Mp4Error('stco/co64 ausente')
+    chunks = len(chunk_offsets)
+
+    # stsc: (primeiro chunk, amostras por chunk) por trecho -> primeira amostra de cada chunk
+    if b'stsc' not in boxes:
+        raise Mp4Error('stsc ausente')
+    count, table = _table(data, boxes[b'stsc'][0])
+    entries = _unpack_array('I', data, table, count * 3, 4)
+    chunk_first_sample = array('Q')
+    samples_per_chunk = array('Q')
+    sample = 0
+    for entry in range(count):
+        first_chunk = entries[3 * entry] - 1
+        per_chunk = entries[3 * entry + 1]
+        next_chunk = entries[3 * (entry + 1)] - 1 if entry + 1 < count else chunks
+        for _ in range(max(0, min(next_chunk, chunks) - first_chunk)):
+            chunk_first_sample.append(sample)
+            samples_per_chunk.append(per_chunk)
+            sample += per_chunk
+    if len(chunk_first_sample) != chunks:
+        raise Mp4Error('stsc não cobre todos os chunks')
+
+    # stsz: tamanho das amostras (único ou por amostra) -> bytes de cada chunk
+    if b'stsz' not in boxes:
+        raise Mp4Error('stsz ausente')
+    body = boxes[b'stsz'][0]
+    uniform, count = struct.unpack_from('>II', data, body + 4)
+    if uniform:
+        chunk_sizes = array('Q', (uniform * per_chunk for per_chunk in samples_per_chunk))
+    else:
+        sizes = _unpack_array('I', data, body + 12, count, 4)
+        chunk_sizes = array('Q')
+        for first, per_chunk in zip(chunk_first_sample, samples_per_chunk):
+            chunk_sizes.append(sum(sizes[first:first + per_chunk]))
+
+    if not chunks or not total_samples:
+        return None
+    return TrackIndex('video' if handler == b'vide' else 'audio', timescale, duration,
+                      min(total_samples, sample), run_samples, run_times, run_deltas,
+                      sync_samples, chunk_offsets, chunk_first_sample, chunk_sizes)
+
+
+def load_index(fetch: RangeFetch) -> Optional[Mp4Index]:
+    """
+    Localiza e lê o moov de um MP4 remoto por requisições de intervalo
+
+    Com faststart o moov vem na primeira leitura; caso contrário os boxes
+    de topo são percorridos pelos cabeçalhos (um pedido pequeno por box,
+    pulando o mdat) até o moov, que é lido inteiro.
+
+    Args:
+        fetch: Busca (início, fim inclusivo) e devolve (dados, tamanho total) ou None
+
+    Returns:
+        Mp4Index: Índice ou None se o recurso não for um MP4 indexável
+    """
+    head = fetch(0, MP4_PROBE_BYTES - 1)
+    if head is None:
+        return None
+    data, size = head
+    if data[4:8] != b'ftyp':
+        return None
+
+    offset = 0
+    for _ in range(MP4_MAX_TOP_LEVEL_BOXES):
+        if offset + 8 > size:
+            return None
+
+        if offset + 16 <= len(data):
+            header = data[offset:offset + 16]
+        else:
+            part = fetch(offset, min(offset + 15, size - 1))
+            if part is None:
+                return None
+            header = part[0]
+        if len(header) < 8:
+            return None
+
+        box_size, kind = struct.unpack_from('>I4s', header)
+        if box_size == 1:
+            if len(header) < 16:
+                return None
+            box_size = struct.unpack_from('>Q', header, 8)[0]
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < 8:
+            return None
+
+        if kind == b'moov':
+            if box_size > MP4_MOOV_MAX_BYTES:
+                return None
+            if offset + box_size <= len(data):
+                moov = data[offset:offset + box_size]
+            else:
+                part = fetch(offset, offset + box_size - 1)
+                if part is None:
+                    return None
+                moov = part[0]
+            return parse_moov(moov, size)
+        if kind == b'moof':
+            return None  # fragmentado: sem tabela de amostras no moov
+
+        offset += box_size
+    return None
@@ -0,0 +1,159 @@
+"""
+Streamhive Netflix Sync
+Validação e agregação das atualizações de navegação do Netflix por sala
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from flask_socketio import SocketIO
+
+
+# Intervalo mínimo entre retransmissões de navegação de uma sala (milissegundos)
+NETFLIX_SYNC_WINDOW_MS = float(os.environ.get('NETFLIX_SYNC_WINDOW_MS', 250))
+
+# Tamanho máximo aceito para a URL enviada pelo cliente
+NETFLIX_URL_MAX_LENGTH = 2048
+
+NETFLIX_HOSTS = ('netflix.com', 'www.netflix.com')
+
+# Parâmetros de query relevantes para quem assiste (o resto é rastreamento)
+NETFLIX_KEPT_QUERY_PARAMS = ('t', 'jbv', 'q')
+
+
+def normalize_netflix_url(url: Any) -> Optional[str]:
+    """
+    Valida e reduz uma URL de navegação do Netflix
+
+    Aceita apenas URLs https do domínio netflix.com e descarta fragmento e
+    parâmetros de rastreamento (trackId, tctx, ...).
+
+    Args:
+        url: URL recebida do cliente
+
+    Returns:
+        str: URL normalizada ou None se inválida
+    """
+    if not isinstance(url, str) or not url or len(url) > NETFLIX_URL_MAX_LENGTH:
+        return None
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    if parts.scheme != 'https' or (parts.hostname or '').lower() not in NETFLIX_HOSTS:
+        return None
+
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key in NETFLIX_KEPT_QUERY_PARAMS]
+    normalized = f'https://www.netflix.com{parts.path or "/"}'
+    if query:
+        normalized += '?' + urlencode(query)
+    return normalized
+
+
+class NetflixSyncCoalescer:
+    """
+    Mantém apenas o estado de navegação mais recente de cada sala
+
+    A primeira atualização após um período ocioso é retransmitida na hora;
+    as seguintes, dentro da janela, substituem umas às outras e só a última
+    é retransmitida quando a janela termina. Assim, uma rajada de
+    navegações do dono custa no máximo uma retransmissão por janela.
+    """
+
+    def __init__(self, socketio: SocketIO, relay: Callable[[str, Dict[str, Any]], None],
+                 window_ms: float = NETFLIX_SYNC_WINDOW_MS):
+        """
+        Inicializa o agregador
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            relay: Função chamada com (room_id, estado) para retransmitir
+            window_ms: Janela mínima entre retransmissões em milissegundos
+        """
+        self.socketio = socketio
+        self.relay = relay
+        self.window = window_ms / 1000.0
+        self.logger = logging.getLogger(__name__)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._last_url: Dict[str, str] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.coalesced_total = 0
+
+        self.socketio.start_background_task(self._flush_loop)
+
+    def submit(self, room_id: str, state: Dict[str, Any], now: Optional[float] = None):
+        """
+        Registra o estado de navegação mais recente de uma sala
+
+        Args:
+            room_id: ID da sala
+            state: Estado já validado ({'url', 'timestamp'})
+            now: Timestamp atual
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            if self._last_url.get(room_id) == state['url'] and room_id not in self._pending:
+                return
+
+            if room_id not in self._pending and now - self._last_sent.get(room_id, 0) >= self.window:
+                self._mark_sent(room_id, state, now)
+                send = True
+            else:
+                if room_id in self._pending:
+                    self.coalesced_total += 1
+                self._pending[room_id] = state
+                send = False
+
+        if send:
+            self.relay(room_id, state)
+
+    def discard(self, room_id: str):
+        """Descarta o estado de uma sala encerrada"""
+        with self._lock:
+            self._pending.pop(room_id, None)
+            self._last_url.pop(room_id, None)
+            self._last_sent.pop(room_id, None)
+
+    def flush_due(self, now: Optional[float] = None):
+        """Retransmite os estados pendentes cuja janela terminou"""
+        now = time.time() if now is None else now
+
+        with self._lock:
+            due = []
+            for room_id, state in list(self._pending.items()):
+                if now - self._last_sent.get(room_id, 0) < self.window:
+                    continue
+
+                del self._pending[room_id]
+                if self._last_url.get(room_id) != state['url']:
+                    self._mark_sent(room_id, state, now)
+                    due.append((room_id, state))
+
+        for room_id, state in due:
+            try:
+                self.relay(room_id, state)
+            except Exception as e:
+                self.logger.error(f"Erro ao retransmitir navegação Netflix da sala {room_id}: {e}")
+
+    def _mark_sent(self, room_id: str, state: Dict[str, Any], now: float):
+        """Registra a retransmissão (chamado com o lock adquirido)"""
+        self._last_url[room_id] = state['url']
+        self._last_sent[room_id] = now
+
+    def _flush_loop(self):
+        """Verifica as salas pendentes a cada janela"""
+        while True:
+            self.socketio.sleep(self.window)
+
+            if not self._pending:
+                continue
+
+            self.flush_due()
@@ -0,0 +1,119 @@
+"""
+Streamhive Playback Clock
+Relógio de reprodução autoritativo do servidor para cada sala
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+
+# Intervalo entre heartbeats de salas em reprodução (segundos)
+SYNC_HEARTBEAT_INTERVAL = float(os.environ.get('SYNC_HEARTBEAT_INTERVAL', 2.0))
+
+# Salas pausadas não derivam, então recebem heartbeats bem mais espaçados
+SYNC_PAUSED_HEARTBEAT_INTERVAL = float(os.environ.get('SYNC_PAUSED_HEARTBEAT_INTERVAL', 15.0))
+
+# Diferença máxima tolerada entre o player do cliente e o relógio (segundos)
+SYNC_TOLERANCE = float(os.environ.get('SYNC_TOLERANCE', 0.1))
+
+# Acima desta diferença o cliente faz seek em vez de ajustar a velocidade
+SYNC_HARD_SEEK_THRESHOLD = float(os.environ.get('SYNC_HARD_SEEK_THRESHOLD', 2.0))
+
+
+@dataclass
+class PlaybackClock:
+    """
+    Relógio de reprodução de uma sala
+
+    A posição é guardada como um par (position, anchor): o vídeo estava em
+    `position` segundos no instante `anchor` do servidor. Enquanto está em
+    reprodução, a posição atual é extrapolada a partir desse par.
+    """
+    position: float = 0.0
+    anchor: float = field(default_factory=time.time)
+    is_playing: bool = False
+    rate: float = 1.0
+    last_heartbeat: float = 0.0
+
+    def current_time(self, now: Optional[float] = None) -> float:
+        """
+        Calcula a posição atual do vídeo
+
+        Args:
+            now: Timestamp do servidor (padrão: agora)
+
+        Returns:
+            float: Posição do vídeo em segundos
+        """
+        if not self.is_playing:
+            return self.position
+
+        now = time.time() if now is None else now
+        return self.position + max(0.0, now - self.anchor) * self.rate
+
+    def play(self, now: Optional[float] = None):
+        """Inicia a reprodução a partir da posição atual"""
+        now = time.time() if now is None else now
+        self.position = self.current_time(now)
+        self.anchor = now
+        self.is_playing = True
+
+    def pause(self, now: Optional[float] = None):
+        """Pausa a reprodução congelando a posição atual"""
+        now = time.time() if now is None else now
+        self.position = self.current_time(now)
+        self.anchor = now
+        self.is_playing = False
+
+    def seek(self, position: float, now: Optional[float] = None):
+        """Move a reprodução para uma nova posição"""
+        self.position = max(0.0, float(position))
+        self.anchor = time.time() if now is None else now
+
+    def heartbeat_due(self, now: float) -> bool:
+        """
+        Verifica se a sala deve receber um heartbeat agora
+
+        Args:
+            now: Timestamp do servidor
+
+        Returns:
+            bool: True se o intervalo do estado atual já passou
+        """
+        interval = SYNC_HEARTBEAT_INTERVAL if self.is_playing else SYNC_PAUSED_HEARTBEAT_INTERVAL
+        # Margem para o jitter do loop não pular um ciclo inteiro
+        return now - self.last_heartbeat >= interval * 0.9
+
+    def heartbeat(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Monta o payload compacto de heartbeat
+
+        Args:
+            now: Timestamp do servidor (padrão: agora)
+
+        Returns:
+            dict: {'t': posição, 's': timestamp do servidor, 'p': 1 se tocando}
+        """
+        now = time.time() if now is None else now
+        self.last_heartbeat = now
+        return {
+            't': round(self.current_time(now), 3),
+            's': round(now, 3),
+            'p': 1 if self.is_playing else 0
+        }
+
+
+def get_sync_config() -> Dict[str, float]:
+    """
+    Retorna a configuração de sincronização enviada aos clientes
+
+    Returns:
+        dict: Tolerância, limite de seek e intervalo de heartbeat
+    """
+    return {
+        'tolerance': SYNC_TOLERANCE,
+        'hard_seek_threshold': SYNC_HARD_SEEK_THRESHOLD,
+        'heartbeat_interval': SYNC_HEARTBEAT_INTERVAL
+    }
@@ -0,0 +1,195 @@
+"""
+Streamhive Presence Roster
+Lista de presença versionada por sala com difusão de diferenças agregadas
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+
+# Intervalo mínimo entre diffs de presença de uma sala (milissegundos)
+ROSTER_DIFF_INTERVAL_MS = float(os.environ.get('ROSTER_DIFF_INTERVAL_MS', 500))
+
+# Acima deste tamanho, salas recebem apenas a contagem de participantes
+ROSTER_FULL_THRESHOLD = int(os.environ.get('ROSTER_FULL_THRESHOLD', 25))
+
+# Tamanho máximo de uma página do roster pedida pelo cliente
+ROSTER_PAGE_SIZE_MAX = int(os.environ.get('ROSTER_PAGE_SIZE_MAX', 100))
+
+
+class PresenceRoster:
+    """
+    Roster de participantes de uma sala
+
+    Entradas e saídas não são transmitidas individualmente: as mudanças são
+    acumuladas e `take_diff` calcula a diferença líquida em relação ao
+    último estado publicado. Assim, um usuário que sai e volta dentro da
+    mesma janela (reconexão) não gera tráfego algum.
+    """
+
+    def __init__(self):
+        """Inicializa o roster vazio"""
+        self.members: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._published: Dict[str, Tuple[str, str]] = {}
+        self._changed: Set[str] = set()
+        self._kicked: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.members
+
+    @property
+    def is_full_mode(self) -> bool:
+        """Indica se a sala é pequena o bastante para difundir o roster completo"""
+        return len(self.members) <= ROSTER_FULL_THRESHOLD
+
+    @property
+    def has_changes(self) -> bool:
+        """Indica se há mudanças ainda não publicadas"""
+        return bool(self._changed)
+
+    def add(self, user_id: str, username: str, role: str):
+        """
+        Adiciona (ou atualiza) um participante
+
+        Args:
+            user_id: ID do usuário
+            username: Nome do usuário
+            role: Papel do usuário na sala
+        """
+        with self._lock:
+            previous = self.members.get(user_id)
+            self.members[user_id] = {
+                'username': username,
+                'role': role,
+                'joined_at': previous['joined_at'] if previous else time.time()
+            }
+            self._changed.add(user_id)
+            self._kicked.discard(user_id)
+
+    def remove(self, user_id: str, kicked: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Remove um participante
+
+        Args:
+            user_id: ID do usuário
+            kicked: True se o usuário foi expulso pelo dono
+
+        Returns:
+            Dados do participante removido ou None
+        """
+        with self._lock:
+            member = self.members.pop(user_id, None)
+            if member is not None:
+                self._changed.add(user_id)
+                if kicked:
+                    self._kicked.add(user_id)
+            return member
+
+    def restore(self, members: List[Dict[str, Any]], version: int):
+        """
+        Restaura um roster salvo, já considerado publicado
+
+        Participantes que reconectam não geram diff; os que não voltarem
+        são removidos depois pelo reaper.
+
+        Args:
+            members: Participantes no formato de `page`
+            version: Versão do roster salvo
+        """
+        with self._lock:
+            self.members = {
+                member['user_id']: {
+                    'username': member['username'],
+                    'role': member['role'],
+                    'joined_at': member['joined_at']
+                }
+                for member in members
+            }
+            self._published = {
+                user_id: (member['username'], member['role'])
+                for user_id, member in self.members.items()
+            }
+            self._changed.clear()
+            self._kicked.clear()
+            self.version = version
+
+    def take_diff(self) -> Optional[Dict[str, Any]]:
+        """
+        Calcula e consome a diferença líquida desde a última publicação
+
+        Returns:
+            dict com 'added', 'removed', 'kicked', 'count' e 'roster_version',
+            ou None se as mudanças se anularam
+        """
+        with self._lock:
+            added = []
+            removed = []
+
+            for user_id in self._changed:
+                member = self.members.get(user_id)
+                published = self._published.get(user_id)
+
+                if member is not None:
+                    current = (member['username'], member['role'])
+                    if current != published:
+                        added.append(self._member_entry(user_id, member))
+                        self._published[user_id] = current
+                elif published is not None:
+                    removed.append(user_id)
+                    del self._published[user_id]
+
+            kicked = [user_id for user_id in self._kicked if user_id in removed]
+            self._changed.clear()
+            self._kicked.clear()
+
+            if not added and not removed:
+                return None
+
+            self.version += 1
+            return {
+                'added': added,
+                'removed': removed,
+                'kicked': kicked,
+                'count': len(self.members),
+                'roster_version': self.version
+            }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Cópia do mapa de participantes (user_id -> dados)"""
+        with self._lock:
+            return {user_id: dict(member) for user_id, member in self.members.items()}
+
+    def page(self, offset: int = 0, limit: int = ROSTER_PAGE_SIZE_MAX) -> List[Dict[str, Any]]:
+        """
+        Retorna uma página do roster em ordem de entrada
+
+        Args:
+            offset: Posição inicial
+            limit: Quantidade máxima de participantes
+
+        Returns:
+            Lista de participantes
+        """
+        offset = max(0, offset)
+        limit = max(1, min(limit, ROSTER_PAGE_SIZE_MAX))
+
+        with self._lock:
+            items = list(self.members.items())[offset:offset + limit]
+            return [self._member_entry(user_id, member) for user_id, member in items]
+
+    @staticmethod
+    def _member_entry(user_id: str, member: Dict[str, Any]) -> Dict[str, Any]:
+        """Formata um participante para envio"""
+        return {
+            'user_id': user_id,
+            'username': member['username'],
+            'role': member['role'],
+            'joined_at': member['joined_at']
+        }
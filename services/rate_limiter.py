@@ -0,0 +1,225 @@
+"""
+Streamhive Rate Limiter
+Limite de taxa por conexão e por usuário para eventos Socket.IO (token bucket)
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from flask_socketio import SocketIO
+
+
+# Liga/desliga o limite de taxa dos eventos de socket
+SOCKET_RATE_LIMIT_ENABLED = os.environ.get('SOCKET_RATE_LIMIT_ENABLED', '1') != '0'
+
+# Limites padrão por conexão: evento -> (tokens por segundo, rajada)
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    'chat_message': (1.0, 5),
+    'video_action': (5.0, 10),
+    'netflix_sync': (10.0, 20),
+    'join_room': (1.0, 5),
+    'get_roster': (2.0, 5),
+    'clock_ping': (2.0, 10)
+}
+
+# O limite por usuário (todas as abas somadas) é o da conexão multiplicado por este fator
+SOCKET_USER_RATE_MULTIPLIER = float(os.environ.get('SOCKET_USER_RATE_MULTIPLIER', 2))
+
+# Intervalo mínimo entre avisos de limite enviados a uma mesma conexão (segundos)
+RATE_LIMIT_NOTICE_INTERVAL = 1.0
+
+# Intervalo entre limpezas dos baldes de usuário ociosos (segundos)
+RATE_LIMIT_PRUNE_INTERVAL = 60
+
+
+def parse_rate_limits(spec: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    Lê limites no formato 'evento=taxa:rajada,evento=taxa:rajada'
+
+    Args:
+        spec: Texto da variável SOCKET_RATE_LIMITS
+
+    Returns:
+        dict: Limites padrão com as substituições informadas
+    """
+    limits = dict(DEFAULT_RATE_LIMITS)
+    if not spec:
+        return limits
+
+    for item in spec.split(','):
+        try:
+            event, values = item.strip().split('=', 1)
+            rate, burst = values.split(':', 1)
+            limits[event.strip()] = (float(rate), float(burst))
+        except ValueError:
+            logging.getLogger(__name__).warning(f"Limite de taxa inválido ignorado: {item!r}")
+
+    return limits
+
+
+SOCKET_RATE_LIMITS = parse_rate_limits(os.environ.get('SOCKET_RATE_LIMITS'))
+
+
+class TokenBucket:
+    """Balde de tokens reabastecido continuamente"""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """
+        Tenta consumir um token
+
+        Returns:
+            float: 0 se consumido, senão segundos até haver um token
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate if rate > 0 else float('inf')
+
+
+class SocketRateLimiter:
+    """
+    Limites de taxa por conexão (sid) e por usuário
+
+    A checagem custa alguns acessos a dicionário e acontece antes de
+    qualquer trabalho do handler. Um evento só é aceito se houver token
+    nos dois baldes, para que várias abas do mesmo usuário não multipliquem
+    o limite.
+    """
+
+    def __init__(self, socketio: Optional[SocketIO] = None,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 user_multiplier: float = SOCKET_USER_RATE_MULTIPLIER):
+        """
+        Inicializa o limitador
+
+        Args:
+            socketio: Instância do Flask-SocketIO (inicia a limpeza periódica)
+            limits: evento -> (tokens por segundo, rajada) por conexão
+            user_multiplier: Fator aplicado aos limites por usuário
+        """
+        self.limits = limits if limits is not None else SOCKET_RATE_LIMITS
+        self.user_multiplier = user_multiplier
+        # sid -> evento -> balde (removidos juntos na desconexão)
+        self._sid_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._user_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._last_notice: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.rejected_total: Dict[str, int] = {}
+
+        self.socketio = socketio
+        if socketio is not None:
+            socketio.start_background_task(self._prune_loop)
+
+    def check(self, event: str, sid: str, user_id: Optional[Any] = None,
+              now: Optional[float] = None) -> Optional[float]:
+        """
+        Consome um token para o evento
+
+        Args:
+            event: Nome do evento
+            sid: ID da conexão
+            user_id: ID do usuário (None se não autenticado)
+            now: Timestamp atual
+
+        Returns:
+            None se permitido, senão segundos sugeridos até tentar de novo
+        """
+        limit = self.limits.get(event)
+        if not SOCKET_RATE_LIMIT_ENABLED or limit is None:
+            return None
+
+        rate, burst = limit
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            sid_buckets = self._sid_buckets.setdefault(sid, {})
+            wait = self._take(sid_buckets, event, rate, burst, now)
+
+            if not wait and user_id is not None:
+                user_rate, user_burst = rate * self.user_multiplier, burst * self.user_multiplier
+                wait = self._take(self._user_buckets, (str(user_id), event), user_rate, user_burst, now)
+                if wait:
+                    # Devolve o token da conexão: o evento não foi aceito
+                    sid_buckets[event].tokens += 1
+
+            if wait:
+                self.rejected_total[event] = self.rejected_total.get(event, 0) + 1
+                return wait
+
+        return None
+
+    def should_notify(self, sid: str, now: Optional[float] = None) -> bool:
+        """Indica se a conexão deve receber um aviso de limite (no máximo 1 por segundo)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._last_notice.get(sid, float('-inf')) < RATE_LIMIT_NOTICE_INTERVAL:
+                return False
+            self._last_notice[sid] = now
+            return True
+
+    def forget_sid(self, sid: str):
+        """Remove os baldes de uma conexão encerrada"""
+        with self._lock:
+            self._sid_buckets.pop(sid, None)
+            self._last_notice.pop(sid, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Remove baldes de usuário já cheios (ociosos)
+
+        Returns:
+            int: Número de baldes removidos
+        """
+        now = time.monotonic() if now is None else now
+        removed = 0
+
+        with self._lock:
+            for key, bucket in list(self._user_buckets.items()):
+                rate, burst = self.limits.get(key[1], (1.0, 1.0))
+                rate *= self.user_multiplier
+                burst *= self.user_multiplier
+                if rate > 0 and bucket.tokens + (now - bucket.updated) * rate >= burst:
+                    del self._user_buckets[key]
+                    removed += 1
+
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de rejeição e baldes ativos"""
+        with self._lock:
+            return {
+                'rejected_total': dict(self.rejected_total),
+                'sid_buckets': len(self._sid_buckets),
+                'user_buckets': len(self._user_buckets)
+            }
+
+    def _prune_loop(self):
+        """Remove baldes de usuário ociosos periodicamente"""
+        while True:
+            self.socketio.sleep(RATE_LIMIT_PRUNE_INTERVAL)
+
+            try:
+                self.prune()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Erro na limpeza dos limites de taxa: {e}")
+
+    @staticmethod
+    def _take(buckets: Dict[Any, TokenBucket], key: Any,
+              rate: float, burst: float, now: float) -> float:
+        """Consome um token do balde, criando-o cheio se necessário"""
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(burst, now)
+        return bucket.take(rate, burst, now)
@@ -0,0 +1,107 @@
+"""
+Streamhive Room Events
+Log versionado de eventos por sala para ressincronização incremental
+"""
+
+import os
+import secrets
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+
+# Quantidade de eventos mantidos por sala para reconexões
+ROOM_EVENT_LOG_SIZE = int(os.environ.get('ROOM_EVENT_LOG_SIZE', 256))
+
+# Acima deste número de eventos perdidos, o snapshot completo é mais barato
+ROOM_RESYNC_MAX_EVENTS = int(os.environ.get('ROOM_RESYNC_MAX_EVENTS', 128))
+
+# Eventos substituídos pelo estado atual de reprodução enviado na ressincronização
+RESYNC_SKIPPED_EVENTS = {'video_sync', 'netflix_sync'}
+
+
+class RoomEventLog:
+    """
+    Log circular de eventos de uma sala
+
+    Cada evento transmitido recebe uma versão monotonicamente crescente.
+    O `epoch` identifica esta instância do log: se a sala for recriada
+    (por exemplo, após reiniciar o servidor), versões antigas do cliente
+    deixam de ser válidas e ele recebe o snapshot completo.
+    """
+
+    def __init__(self, maxlen: int = ROOM_EVENT_LOG_SIZE):
+        """
+        Inicializa o log de eventos
+
+        Args:
+            maxlen: Número máximo de eventos mantidos
+        """
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Registra um evento e atribui sua versão
+
+        Args:
+            event: Nome do evento Socket.IO
+            payload: Dados do evento
+
+        Returns:
+            dict: Cópia do payload com a chave 'v' (versão)
+        """
+        with self._lock:
+            self.version += 1
+            versioned = dict(payload, v=self.version)
+            self.entries.append((self.version, event, versioned))
+            return versioned
+
+    def restore(self, epoch: str, version: int):
+        """
+        Retoma a numeração de um log anterior (reinício do servidor)
+
+        Os eventos em si não são restaurados: clientes que já viram a última
+        versão ressincronizam sem eventos e os demais recebem o snapshot.
+
+        Args:
+            epoch: Epoch do log salvo
+            version: Última versão do log salvo
+        """
+        with self._lock:
+            self.epoch = epoch
+            self.version = version
+            self.entries.clear()
+
+    def since(self, version: int, epoch: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retorna os eventos posteriores a uma versão
+
+        Args:
+            version: Última versão vista pelo cliente
+            epoch: Epoch do log visto pelo cliente
+
+        Returns:
+            Lista de eventos {'v', 'e', 'd'} ou None se for preciso snapshot
+        """
+        with self._lock:
+            if epoch != self.epoch or version < 0 or version > self.version:
+                return None
+
+            if version == self.version:
+                return []
+
+            # Eventos necessários já saíram do buffer circular
+            if not self.entries or self.entries[0][0] > version + 1:
+                return None
+
+            if self.version - version > ROOM_RESYNC_MAX_EVENTS:
+                return None
+
+            return [
+                {'v': v, 'e': event, 'd': payload}
+                for v, event, payload in self.entries
+                if v > version and event not in RESYNC_SKIPPED_EVENTS
+            ]
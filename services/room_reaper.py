@@ -0,0 +1,177 @@
+"""
+Streamhive Room Reaper
+Despejo de salas ociosas e orçamento global de memória para room_states
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+from flask_socketio import SocketIO
+
+from services.membership_index import MembershipIndex
+from services.room_store import RoomStateStore, estimate_room_bytes, serialize_room_state
+
+
+# Tempo que uma sala sem conexões permanece em memória (segundos)
+ROOM_IDLE_GRACE_SECONDS = float(os.environ.get('ROOM_IDLE_GRACE_SECONDS', 300))
+
+# Intervalo entre varreduras do reaper (segundos)
+ROOM_REAPER_INTERVAL = float(os.environ.get('ROOM_REAPER_INTERVAL', 30))
+
+# Orçamento global estimado para room_states (bytes)
+ROOM_STATE_MEMORY_BUDGET = int(os.environ.get('ROOM_STATE_MEMORY_BUDGET', 64 * 1024 * 1024))
+
+# Guardar em disco o estado das salas despejadas para recarga rápida
+ROOM_REAPER_PERSIST = os.environ.get('ROOM_REAPER_PERSIST', '1') != '0'
+
+# Tempo para participantes de uma sala restaurada reconectarem (segundos)
+ROOM_RESTORE_GRACE_SECONDS = float(os.environ.get('ROOM_RESTORE_GRACE_SECONDS', 60))
+
+
+class RoomReaper:
+    """
+    Remove da memória salas sem conexões ativas
+
+    Uma sala é despejada quando fica ociosa por mais de
+    ROOM_IDLE_GRACE_SECONDS, ou antes disso, em ordem LRU, quando o total
+    estimado ultrapassa ROOM_STATE_MEMORY_BUDGET. Salas com conexões ativas
+    nunca são despejadas.
+    """
+
+    def __init__(self, socketio: SocketIO, room_states: Dict[str, Dict[str, Any]],
+                 memberships: MembershipIndex, lock: threading.RLock,
+                 store: Optional[RoomStateStore] = None):
+        """
+        Inicializa o reaper
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            room_states: Estado das salas em memória
+            memberships: Índice de conexões por sala
+            lock: Lock que protege criação e remoção de salas
+            store: Armazenamento em disco das salas
+        """
+        self.socketio = socketio
+        self.room_states = room_states
+        self.memberships = memberships
+        self.lock = lock
+        self.store = store if store is not None else RoomStateStore()
+        self.logger = logging.getLogger(__name__)
+        self.evicted_total = 0
+
+        self.socketio.start_background_task(self._reaper_loop)
+
+    def touch(self, state: Dict[str, Any], now: Optional[float] = None):
+        """Marca a sala como usada recentemente (ordem LRU)"""
+        state['last_active'] = time.time() if now is None else now
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """
+        Executa uma varredura completa
+
+        Args:
+            now: Timestamp atual
+
+        Returns:
+            Lista de IDs das salas despejadas
+        """
+        now = time.time() if now is None else now
+        evicted = []
+
+        with self.lock:
+            idle = []
+            total_bytes = 0
+
+            for room_id, state in list(self.room_states.items()):
+                total_bytes += estimate_room_bytes(state)
+
+                restored_at = state.get('restored_at')
+                if restored_at is not None and now - restored_at >= ROOM_RESTORE_GRACE_SECONDS:
+                    self._drop_absent_members(room_id, state)
+
+                if self.memberships.sids_in_room(room_id):
+                    state.pop('idle_since', None)
+                    continue
+
+                idle_since = state.setdefault('idle_since', now)
+                if now - idle_since >= ROOM_IDLE_GRACE_SECONDS:
+                    total_bytes -= self._evict(room_id, state, now)
+                    evicted.append(room_id)
+                else:
+                    idle.append((state.get('last_active', 0), room_id))
+
+            # Acima do orçamento: despejar as ociosas menos usadas primeiro
+            for _, room_id in sorted(idle):
+                if total_bytes <= ROOM_STATE_MEMORY_BUDGET:
+                    break
+                total_bytes -= self._evict(room_id, self.room_states[room_id], now)
+                evicted.append(room_id)
+
+            if total_bytes > ROOM_STATE_MEMORY_BUDGET:
+                self.logger.warning(
+                    f"Salas ativas excedem o orçamento de memória: {total_bytes} bytes estimados"
+                )
+
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas das salas em memória
+
+        Returns:
+            dict: Salas em memória, salas com conexões e bytes estimados
+        """
+        with self.lock:
+            states = list(self.room_states.values())
+
+        return {
+            'rooms_in_memory': len(states),
+            'live_rooms': self.memberships.room_count(),
+            'estimated_bytes': sum(estimate_room_bytes(state) for state in states),
+            'memory_budget_bytes': ROOM_STATE_MEMORY_BUDGET,
+            'evicted_total': self.evicted_total
+        }
+
+    def _evict(self, room_id: str, state: Dict[str, Any], now: float) -> int:
+        """Remove uma sala da memória, guardando-a em disco se configurado"""
+        size = estimate_room_bytes(state)
+
+        if ROOM_REAPER_PERSIST:
+            # Retoma pausado na posição em que a sala ficou vazia
+            idle_since = state.get('idle_since', now)
+            state['clock'].pause(idle_since)
+            self.store.save(room_id, serialize_room_state(state, idle_since))
+        else:
+            # Descarta o snapshot da sala ativa para ela não voltar no reinício
+            self.store.delete(room_id)
+
+        del self.room_states[room_id]
+        self.evicted_total += 1
+        self.logger.info(f"Sala {room_id} despejada da memória ({size} bytes estimados)")
+        return size
+
+    def _drop_absent_members(self, room_id: str, state: Dict[str, Any]):
+        """Remove do roster restaurado quem não reconectou dentro do prazo"""
+        state.pop('restored_at', None)
+        connected = self.memberships.users_in_room(room_id)
+        roster = state['roster']
+
+        absent = [user_id for user_id in roster.snapshot() if user_id not in connected]
+        for user_id in absent:
+            roster.remove(user_id)
+
+        if absent:
+            self.logger.info(f"Sala {room_id}: {len(absent)} participantes não reconectaram após o reinício")
+
+    def _reaper_loop(self):
+        """Varre as salas periodicamente"""
+        while True:
+            self.socketio.sleep(ROOM_REAPER_INTERVAL)
+
+            try:
+                self.sweep()
+            except Exception as e:
+                self.logger.error(f"Erro no reaper de salas: {e}")
@@ -0,0 +1,103 @@
+"""
+Streamhive Room Snapshotter
+Snapshots periódicos das salas ativas para reinícios sem perda de estado
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from flask_socketio import SocketIO
+
+from services.room_store import RoomStateStore, serialize_room_state, snapshot_mark
+
+
+# Intervalo entre snapshots das salas alteradas (segundos)
+ROOM_SNAPSHOT_INTERVAL = float(os.environ.get('ROOM_SNAPSHOT_INTERVAL', 5))
+
+# Permite desligar os snapshots (reinícios voltam a começar do zero)
+ROOM_SNAPSHOT_ENABLED = os.environ.get('ROOM_SNAPSHOT_ENABLED', '1') != '0'
+
+
+class RoomSnapshotter:
+    """
+    Grava periodicamente o estado das salas ativas
+
+    Os snapshots são incrementais: só salas cujo log de eventos ou roster
+    mudou desde o último snapshot são regravadas. Cada sala é gravada de
+    forma atômica no mesmo arquivo usado pelo reaper ao despejá-la.
+    """
+
+    def __init__(self, socketio: SocketIO, room_states: Dict[str, Dict[str, Any]],
+                 lock: threading.RLock, store: RoomStateStore):
+        """
+        Inicializa o snapshotter
+
+        Args:
+            socketio: Instância do Flask-SocketIO
+            room_states: Estado das salas em memória
+            lock: Lock que protege criação e remoção de salas
+            store: Armazenamento em disco das salas
+        """
+        self.socketio = socketio
+        self.room_states = room_states
+        self.lock = lock
+        self.store = store
+        self.logger = logging.getLogger(__name__)
+        self.snapshots_total = 0
+
+    def start(self):
+        """Inicia a gravação periódica e o snapshot final na saída"""
+        if not ROOM_SNAPSHOT_ENABLED:
+            return
+
+        self.socketio.start_background_task(self._snapshot_loop)
+        atexit.register(self.snapshot, force=True)
+
+    def snapshot(self, force: bool = False, now: Optional[float] = None) -> int:
+        """
+        Grava as salas alteradas desde o último snapshot
+
+        Args:
+            force: Grava todas as salas, alteradas ou não
+            now: Timestamp atual
+
+        Returns:
+            int: Número de salas gravadas
+        """
+        now = time.time() if now is None else now
+
+        # Serializa sob o lock das salas; a gravação em disco acontece fora dele
+        with self.lock:
+            dirty = []
+            for room_id, state in self.room_states.items():
+                mark = snapshot_mark(state)
+                if force or state.get('snapshot_mark') != mark:
+                    dirty.append((room_id, state, mark, serialize_room_state(state, now, live=True)))
+
+        written = 0
+        for room_id, state, mark, data in dirty:
+            with self.store.lock:
+                # Sala despejada ou encerrada enquanto isso: não ressuscitar o arquivo
+                if self.room_states.get(room_id) is not state:
+                    continue
+
+                if self.store.save(room_id, data):
+                    state['snapshot_mark'] = mark
+                    written += 1
+
+        self.snapshots_total += written
+        return written
+
+    def _snapshot_loop(self):
+        """Grava snapshots periodicamente"""
+        while True:
+            self.socketio.sleep(ROOM_SNAPSHOT_INTERVAL)
+
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.logger.error(f"Erro ao gravar snapshots das salas: {e}")
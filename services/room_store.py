@@ -0,0 +1,273 @@
+"""
+Streamhive Room Store
+Serialização, estimativa de memória e persistência do estado das salas
+"""
+
+import os
+import json
+import tempfile
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from services.playback_clock import PlaybackClock
+
+
+# Diretório onde salas despejadas são guardadas para recarga rápida
+# (relativo à raiz da aplicação, não ao diretório de trabalho do processo)
+ROOM_STATE_DIR = os.environ.get(
+    'ROOM_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'room_state_cache')
+)
+
+# Estimativas de custo em memória (CPython) usadas no orçamento global
+ROOM_BASE_BYTES = 4096
+CHAT_MESSAGE_OVERHEAD_BYTES = 600
+EVENT_ENTRY_OVERHEAD_BYTES = 400
+ROSTER_MEMBER_OVERHEAD_BYTES = 500
+
+
+def estimate_room_bytes(state: Dict[str, Any]) -> int:
+    """
+    Estima quantos bytes o estado de uma sala ocupa em memória
+
+    É uma aproximação barata (sem percorrer objetos com sys.getsizeof):
+    um custo fixo por estrutura mais o tamanho dos textos guardados.
+
+    Args:
+        state: Estado da sala em room_states
+
+    Returns:
+        int: Tamanho estimado em bytes
+    """
+    size = ROOM_BASE_BYTES + len(state.get('video_url') or '')
+
+    for record in state.get('chat_history', ()):
+        size += CHAT_MESSAGE_OVERHEAD_BYTES + len(record.message) + len(record.username)
+
+    events = state.get('events')
+    if events is not None:
+        size += len(events.entries) * EVENT_ENTRY_OVERHEAD_BYTES
+
+    roster = state.get('roster')
+    if roster is not None:
+        size += len(roster) * ROSTER_MEMBER_OVERHEAD_BYTES
+
+    return size
+
+
+def serialize_room_state(state: Dict[str, Any], now: Optional[float] = None,
+                         live: bool = False) -> Dict[str, Any]:
+    """
+    Converte o estado da sala em um dicionário compacto serializável em JSON
+
+    Salas despejadas (live=False) não guardam roster nem log de eventos:
+    ambos descrevem conexões que deixaram de existir, e o novo epoch força
+    os clientes a um snapshot. Snapshots de salas ativas (live=True) guardam
+    o roster e a numeração do log para que um reinício do servidor passe
+    despercebido por quem reconecta.
+
+    Args:
+        state: Estado da sala
+        now: Timestamp usado para congelar a posição do relógio
+        live: True para snapshot de sala ativa
+
+    Returns:
+        dict: Estado serializável
+    """
+    clock = state['clock']
+    now = time.time() if now is None else now
+
+    data = {
+        'video_url': state['video_url'],
+        'clock': {
+            'position': round(clock.current_time(now), 3),
+            'is_playing': clock.is_playing,
+            'rate': clock.rate,
+            'anchor': round(now, 3)
+        },
+        'chat_messages': state['chat_history'].to_list() if 'chat_history' in state else []
+    }
+
+    if live:
+        events = state['events']
+        roster = state['roster']
+        data['live'] = True
+        data['netflix'] = state.get('netflix')
+        data['events'] = {'epoch': events.epoch, 'version': events.version}
+        data['roster'] = {
+            'version': roster.version,
+            'members': [dict(member, user_id=user_id) for user_id, member in roster.snapshot().items()]
+        }
+
+    return data
+
+
+def snapshot_mark(state: Dict[str, Any]) -> tuple:
+    """
+    Marca de alteração de uma sala
+
+    Toda mudança relevante (controle de vídeo, chat, roster) passa pelo log
+    de eventos ou pelo roster versionados, então a sala só precisa de um
+    novo snapshot quando uma das versões muda.
+    """
+    return state['events'].version, state['roster'].version
+
+
+def restore_clock(data: Dict[str, Any]) -> PlaybackClock:
+    """
+    Reconstrói o relógio de reprodução a partir do formato serializado
+
+    Args:
+        data: Dicionário 'clock' gerado por serialize_room_state
+
+    Returns:
+        PlaybackClock: Relógio restaurado
+    """
+    return PlaybackClock(
+        position=float(data.get('position', 0.0)),
+        anchor=float(data.get('anchor', time.time())),
+        is_playing=bool(data.get('is_playing', False)),
+        rate=float(data.get('rate', 1.0))
+    )
+
+
+class RoomStateStore:
+    """
+    Armazenamento em disco do estado das salas
+
+    Cada sala tem um único arquivo: o snapshot periódico enquanto está
+    ativa ou o estado final quando é despejada da memória. `lock` serializa
+    as gravações de quem precisa checar o estado da sala antes de gravar.
+    """
+
+    def __init__(self, directory: str = ROOM_STATE_DIR):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            directory: Diretório dos arquivos de estado
+        """
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.RLock()
+
+    def _path(self, room_id: str) -> str:
+        """Caminho do arquivo de estado de uma sala"""
+        return os.path.join(self.directory, f'room_{int(room_id)}.json')
+
+    def save(self, room_id: str, data: Dict[str, Any]) -> bool:
+        """
+        Grava o estado de uma sala de forma atômica
+
+        Args:
+            room_id: ID da sala
+            data: Estado serializado
+
+        Returns:
+            bool: True se gravado com sucesso
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # Escreve em arquivo temporário e troca com os.replace (atômico);
+            # o fsync antes da troca evita que uma queda deixe o nome final
+            # apontando para um arquivo vazio ou truncado
+            with self.lock:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(data, f, separators=(',', ':'))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self._path(room_id))
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+
+                self._fsync_directory()
+
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar estado da sala {room_id}: {e}")
+            return False
+
+    def _fsync_directory(self):
+        """Persiste a entrada de diretório criada pelo os.replace"""
+        try:
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            # Alguns sistemas (ex.: Windows) não permitem fsync de diretório
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def load(self, room_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lê e remove o estado guardado de uma sala
+
+        Args:
+            room_id: ID da sala
+
+        Returns:
+            Estado serializado ou None se não existir
+        """
+        path = self._path(room_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.remove(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Erro ao carregar estado da sala {room_id}: {e}")
+            return None
+
+    def load_live(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Lê os snapshots de salas que estavam ativas (sem removê-los)
+
+        Returns:
+            dict: room_id -> estado serializado
+        """
+        snapshots = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return snapshots
+
+        for name in names:
+            if not (name.startswith('room_') and name.endswith('.json')):
+                continue
+
+            room_id = name[len('room_'):-len('.json')]
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                self.logger.error(f"Snapshot da sala {room_id} ilegível: {e}")
+                continue
+
+            if data.get('live'):
+                snapshots[room_id] = data
+
+        return snapshots
+
+    def delete(self, room_id: str):
+        """Remove o estado guardado de uma sala encerrada"""
+        try:
+            with self.lock:
+                os.remove(self._path(room_id))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Erro ao remover estado da sala {room_id}: {e}")
@@ -0,0 +1,219 @@
+"""
+Streamhive Segment Cache
+Cache em memória de respostas de mídia do proxy, compartilhado pelos participantes de uma sala
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+# Memória total ocupada pelas respostas em cache (bytes)
+PROXY_CACHE_MAX_BYTES = int(os.environ.get('PROXY_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Maior resposta guardada; acima disso o corpo só é repassado
+PROXY_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('PROXY_CACHE_MAX_ENTRY_BYTES', 16 * 1024 * 1024))
+
+# Cabeçalhos do upstream guardados junto com o corpo
+CACHED_HEADERS = ('Content-Type', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified')
+
+# (url, range normalizado); range vazio = corpo completo
+CacheKey = Tuple[str, str]
+
+
+def normalize_range(range_header: Optional[str]) -> str:
+    """Cabeçalho Range sem espaços e em minúsculas ('' quando ausente)"""
+    return ''.join((range_header or '').split()).lower()
+
+
+def parse_range(range_header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervalo único de um cabeçalho Range, resolvido para um corpo de `total` bytes
+
+    Args:
+        range_header: Valor do cabeçalho (ex.: 'bytes=0-1023', 'bytes=500-', 'bytes=-200')
+        total: Tamanho do corpo completo
+
+    Returns:
+        tuple: (início, fim inclusivo) ou None se inválido, múltiplo ou fora do corpo
+    """
+    value = normalize_range(range_header)
+    if not value.startswith('bytes=') or ',' in value:
+        return None
+
+    start, _, end = value[len('bytes='):].partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(0, total - length), total - 1
+        first = int(start)
+        last = min(int(end), total - 1) if end else total - 1
+    except ValueError:
+        return None
+
+    if first >= total or last < first:
+        return None
+    return first, last
+
+
+class CachedResponse:
+    """Resposta do upstream guardada em memória"""
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def response_headers(self) -> Dict[str, str]:
+        """Cabeçalhos a enviar ao cliente (com o Content-Length do corpo)"""
+        headers = dict(self.headers)
+        headers['Content-Length'] = str(len(self.body))
+        return headers
+
+
+class SegmentCache:
+    """
+    Cache LRU limitado por bytes, chaveado por URL e intervalo
+
+    Todos os participantes de uma sala pedem os mesmos bytes da mesma
+    `stream_url` quase ao mesmo tempo; com o cache, o primeiro pedido vai ao
+    upstream e os demais são atendidos da memória. Um pedido de intervalo é
+    atendido também a partir do corpo completo, quando ele está em cache.
+    Seguro para uso entre threads (workers do Flask e loop do motor).
+    """
+
+    def __init__(self, max_bytes: int = PROXY_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = PROXY_CACHE_MAX_ENTRY_BYTES):
+        """
+        Inicializa o cache
+
+        Args:
+            max_bytes: Orçamento total de memória
+            max_entry_bytes: Maior corpo aceito
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries: 'OrderedDict[CacheKey, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_bytes = 0
+
+    def admits(self, status: int, content_length: Optional[int]) -> bool:
+        """Indica se uma resposta do upstream pode ser guardada (decidido antes de ler o corpo)"""
+        return (
+            status in (200, 206)
+            and content_length is not None
+            and 0 < content_length <= self.max_entry_bytes
+        )
+
+    def contains(self, url: str, range_header: Optional[str] = None) -> bool:
+        """Indica se a chave está em cache (sem contar acerto nem mudar a ordem)"""
+        with self._lock:
+            return (url, normalize_range(range_header)) in self._entries
+
+    def get(self, url: str, range_header: Optional[str] = None) -> Optional[CachedResponse]:
+        """
+        Resposta em cache para a URL e o intervalo pedidos
+
+        Args:
+            url: URL do upstream
+            range_header: Cabeçalho Range do cliente
+
+        Returns:
+            CachedResponse: Resposta pronta para o cliente ou None
+        """
+        key = (url, normalize_range(range_header))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and key[1]:
+                entry = self._slice_full(url, range_header)
+            else:
+                self._touch(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.hit_bytes += len(entry.body)
+            return entry
+
+    def put(self, url: str, range_header: Optional[str], status: int,
+            headers: Dict[str, str], body: bytes):
+        """
+        Guarda uma resposta completa do upstream
+
+        Args:
+            url: URL do upstream
+            range_header: Cabeçalho Range enviado ao upstream
+            status: Status da resposta (200 ou 206)
+            headers: Cabeçalhos do upstream
+            body: Corpo completo
+        """
+        if status not in (200, 206) or not body or len(body) > self.max_entry_bytes:
+            return
+
+        kept = {name: headers[name] for name in CACHED_HEADERS if headers.get(name)}
+        entry = CachedResponse(status, kept, bytes(body))
+        key = (url, '' if status == 200 else normalize_range(range_header))
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.resident_bytes -= len(previous.body)
+
+            self._entries[key] = entry
+            self.resident_bytes += len(entry.body)
+
+            while self.resident_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.resident_bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Taxa de acerto e ocupação"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'hit_bytes': self.hit_bytes,
+                'evictions': self.evictions
+            }
+
+    def _touch(self, key: CacheKey):
+        if key in self._entries:
+            self._entries.move_to_end(key, last=True)
+
+    def _slice_full(self, url: str, range_header: str) -> Optional[CachedResponse]:
+        """Intervalo recortado do corpo completo em cache (chamado com o lock)"""
+        full = self._entries.get((url, ''))
+        if full is None:
+            return None
+
+        total = len(full.body)
+        bounds = parse_range(range_header, total)
+        if bounds is None:
+            return None
+
+        self._touch((url, ''))
+        first, last = bounds
+        headers = dict(full.headers)
+        headers['Content-Range'] = f'bytes {first}-{last}/{total}'
+        return CachedResponse(206, headers, full.body[first:last + 1])
+
+
+# Cache do processo, compartilhado pelo proxy do Flask e pelo motor assíncrono
+segment_cache = SegmentCache()
@@ -0,0 +1,244 @@
+"""
+Streamhive Segment Prefetch
+Pré-busca dos próximos segmentos HLS das playlists em reprodução
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+from services.hls import Playlist
+from services.segment_cache import SegmentCache, CachedResponse
+
+
+# Segmentos buscados à frente do último pedido por um participante
+HLS_PREFETCH_SEGMENTS = int(os.environ.get('HLS_PREFETCH_SEGMENTS', 3))
+
+# Pré-buscas simultâneas (todas as salas)
+HLS_PREFETCH_CONCURRENCY = int(os.environ.get('HLS_PREFETCH_CONCURRENCY', 8))
+
+# Playlists de mídia acompanhadas (as menos recentes são esquecidas)
+HLS_TRACKED_PLAYLISTS = 256
+
+# Espera máxima por uma pré-busca em andamento antes de ir ao upstream (segundos)
+HLS_PREFETCH_WAIT = 10.0
+
+# (corpo, content-type) de um segmento
+Segment = Tuple[bytes, str]
+
+
+class _SegmentTracker(ABC):
+    """
+    Posição de cada segmento nas playlists de mídia em reprodução
+
+    Decide o que pré-buscar; a busca em si fica com as subclasses (tarefas
+    no loop do motor assíncrono ou threads no proxy síncrono).
+    """
+
+    def __init__(self, cache: SegmentCache, ahead: int = HLS_PREFETCH_SEGMENTS):
+        self.cache = cache
+        self.ahead = ahead
+        self.logger = logging.getLogger(__name__)
+        self._playlists: 'OrderedDict[str, List[str]]' = OrderedDict()
+        self._position: Dict[str, Tuple[str, int]] = {}  # segmento -> (playlist, índice)
+        self._tracking_lock = threading.Lock()
+        self._inflight: Dict[str, Any] = {}
+        self.prefetched = 0
+        self.waited = 0
+
+    def track(self, playlist_url: str, playlist: Playlist):
+        """
+        Registra (ou atualiza) uma playlist de mídia e pré-busca o ponto de início
+
+        VOD começa do primeiro segmento; ao vivo, perto do fim da janela.
+        """
+        with self._tracking_lock:
+            old = self._playlists.pop(playlist_url, None)
+            if old:
+                for segment in old:
+                    self._position.pop(segment, None)
+
+            self._playlists[playlist_url] = playlist.segments
+            for index, segment in enumerate(playlist.segments):
+                self._position[segment] = (playlist_url, index)
+
+            while len(self._playlists) > HLS_TRACKED_PLAYLISTS:
+                _, segments = self._playlists.popitem(last=False)
+                for segment in segments:
+                    self._position.pop(segment, None)
+
+        if old is None and playlist.segments:
+            start = playlist.segments[:self.ahead] if playlist.ended else playlist.segments[-self.ahead:]
+            self._schedule(start)
+
+    def on_request(self, url: str):
+        """Um participante pediu `url`: pré-buscar os segmentos seguintes"""
+        with self._tracking_lock:
+            position = self._position.get(url)
+            if position is None:
+                return
+
+            playlist_url, index = position
+            segments = self._playlists.get(playlist_url, [])[index + 1:index + 1 + self.ahead]
+        self._schedule(segments)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pré-buscas realizadas e em andamento"""
+        return {
+            'prefetched': self.prefetched,
+            'inflight': len(self._inflight),
+            'waited': self.waited,
+            'tracked_playlists': len(self._playlists)
+        }
+
+    @abstractmethod
+    def _schedule(self, urls: List[str]):
+        """Dispara a pré-busca dos segmentos ainda não disponíveis"""
+
+
+class SegmentPrefetcher(_SegmentTracker):
+    """
+    Coloca no cache os próximos segmentos de cada playlist em reprodução
+
+    Quando um participante pede o segmento k de uma playlist, os segmentos
+    k+1..k+N são buscados em segundo plano. Os demais participantes da sala
+    (e o próprio, no segmento seguinte) são atendidos do cache; quem pede
+    um segmento cuja pré-busca ainda está em andamento aguarda por ela em
+    vez de abrir outra requisição ao upstream.
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Optional[Segment]]],
+                 cache: SegmentCache, ahead: int = HLS_PREFETCH_SEGMENTS):
+        """
+        Inicializa o prefetcher
+
+        Args:
+            fetch: Corrotina que busca um segmento inteiro no upstream
+            cache: Cache onde os segmentos são guardados
+            ahead: Segmentos buscados à frente
+        """
+        super().__init__(cache, ahead)
+        self.fetch = fetch
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(HLS_PREFETCH_CONCURRENCY)
+
+    async def wait(self, url: str) -> Optional[CachedResponse]:
+        """
+        Aguarda a pré-busca de `url`, se estiver em andamento
+
+        Returns:
+            CachedResponse: Segmento do cache ou None se não houver pré-busca
+        """
+        future = self._inflight.get(url)
+        if future is None:
+            return None
+
+        self.waited += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), HLS_PREFETCH_WAIT)
+        except asyncio.TimeoutError:
+            return None
+        return self.cache.get(url)
+
+    def _schedule(self, urls: List[str]):
+        """Dispara a pré-busca dos segmentos ainda não disponíveis"""
+        loop = asyncio.get_running_loop()
+        for url in urls:
+            if url in self._inflight or self.cache.contains(url):
+                continue
+            self._inflight[url] = loop.create_future()
+            loop.create_task(self._prefetch(url))
+
+    async def _prefetch(self, url: str):
+        """Busca um segmento e o guarda no cache"""
+        future = self._inflight[url]
+        segment = None
+        try:
+            async with self._semaphore:
+                segment = await self.fetch(url)
+            if segment is not None:
+                body, content_type = segment
+                self.cache.put(url, None, 200, {'Content-Type': content_type}, body)
+                self.prefetched += 1
+        except Exception as e:
+            self.logger.error(f"Erro na pré-busca do segmento {url}: {e}")
+        finally:
+            self._inflight.pop(url, None)
+            if not future.done():
+                future.set_result(segment)
+
+
+class ThreadedSegmentPrefetcher(_SegmentTracker):
+    """
+    Pré-busca de segmentos HLS para o proxy síncrono (Flask)
+
+    Mesma política do SegmentPrefetcher, com uma thread por segmento em
+    vez de tarefas no loop; no máximo HLS_PREFETCH_CONCURRENCY buscam ao
+    mesmo tempo e as demais aguardam a vez.
+    """
+
+    def __init__(self, fetch: Callable[[str], Optional[Segment]],
+                 cache: SegmentCache, ahead: int = HLS_PREFETCH_SEGMENTS):
+        """
+        Inicializa o prefetcher
+
+        Args:
+            fetch: Função que busca um segmento inteiro no upstream
+            cache: Cache onde os segmentos são guardados
+            ahead: Segmentos buscados à frente
+        """
+        super().__init__(cache, ahead)
+        self.fetch = fetch
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(HLS_PREFETCH_CONCURRENCY)
+
+    def wait(self, url: str) -> Optional[CachedResponse]:
+        """
+        Aguarda a pré-busca de `url`, se estiver em andamento
+
+        A pré-busca pode terminar entre a falta no cache e esta chamada:
+        sem nada em andamento, o segmento ainda é procurado no cache.
+
+        Returns:
+            CachedResponse: Segmento do cache ou None se não houver pré-busca
+        """
+        with self._lock:
+            done = self._inflight.get(url)
+            if done is None:
+                return self.cache.get(url) if self.cache.contains(url) else None
+            self.waited += 1
+
+        if not done.wait(HLS_PREFETCH_WAIT):
+            return None
+        return self.cache.get(url)
+
+    def _schedule(self, urls: List[str]):
+        """Dispara a pré-busca dos segmentos ainda não disponíveis"""
+        for url in urls:
+            with self._lock:
+                if url in self._inflight or self.cache.contains(url):
+                    continue
+                self._inflight[url] = threading.Event()
+            threading.Thread(target=self._prefetch, args=(url,), name='hls-prefetch', daemon=True).start()
+
+    def _prefetch(self, url: str):
+        """Busca um segmento e o guarda no cache"""
+        try:
+            with self._slots:
+                segment = self.fetch(url)
+            if segment is not None:
+                body, content_type = segment
+                self.cache.put(url, None, 200, {'Content-Type': content_type}, body)
+                with self._lock:
+                    self.prefetched += 1
+        except Exception as e:
+            self.logger.error(f"Erro na pré-busca do segmento {url}: {e}")
+        finally:
+            with self._lock:
+                done = self._inflight.pop(url)
+            done.set()
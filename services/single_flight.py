@@ -0,0 +1,387 @@
+"""
+Streamhive Single Flight
+Coalescência de requisições idênticas ao upstream: uma busca em andamento, vários interessados
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Callable, Hashable, Iterator, List, Optional, Tuple
+
+
+# Bytes retidos para o cliente mais lento de um fan-out; com o buffer cheio
+# a leitura do upstream espera por ele
+PROXY_TEE_CLIENT_BUFFER = int(os.environ.get('PROXY_TEE_CLIENT_BUFFER', 4 * 1024 * 1024))
+
+# Tempo que o fan-out espera um cliente parado com o buffer cheio antes de
+# desligá-lo (ele segue com uma conexão própria ao upstream)
+PROXY_TEE_STALL_TIMEOUT = float(os.environ.get('PROXY_TEE_STALL_TIMEOUT', 2.0))
+
+# Espera máxima pelos cabeçalhos do upstream aberto por outro cliente (segundos)
+PROXY_TEE_JOIN_TIMEOUT = float(os.environ.get('PROXY_TEE_JOIN_TIMEOUT', 15))
+
+# Intervalo de verificação enquanto aguarda dados (segundos)
+TEE_WAIT_INTERVAL = 1.0
+
+
+class _Call:
+    """Execução em andamento de SingleFlight.do"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Chamadas simultâneas com a mesma chave compartilham uma única execução
+
+    A primeira chamada executa a função; as que chegam enquanto ela está
+    em andamento aguardam e recebem o mesmo resultado (ou a mesma exceção).
+    Nada é guardado depois: é coalescência, não cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Executa `fn` ou aguarda a execução já em andamento para `key`
+
+        Args:
+            key: Chave da chamada (ex.: URL)
+            fn: Função sem argumentos
+
+        Returns:
+            Any: Resultado de `fn`
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+class TeeSubscriber:
+    """Leitor de um StreamTee (um cliente)"""
+
+    __slots__ = ('tee', 'offset', 'detached', 'closed')
+
+    def __init__(self, tee: 'StreamTee'):
+        self.tee = tee
+        self.offset = 0         # bytes do corpo já entregues a este cliente
+        self.detached = False   # ficou para trás e saiu do fan-out
+        self.closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.tee.next_chunk(self)
+            if not chunk:
+                return
+            yield chunk
+
+    def wait_ready(self, timeout: float = PROXY_TEE_JOIN_TIMEOUT) -> bool:
+        """Aguarda o líder abrir o upstream; False se ele desistiu ou demorou demais"""
+        return self.tee.wait_ready(timeout)
+
+    def close(self):
+        self.tee.unsubscribe(self)
+
+
+class StreamTee:
+    """
+    Uma resposta do upstream repassada a vários clientes
+
+    Não há thread própria: o cliente que precisa do próximo trecho e
+    encontra o buffer vazio lê o upstream para todos. O buffer guarda os
+    trechos que algum cliente ainda não leu, até `client_buffer` bytes à
+    frente do mais lento; cheio, a leitura espera. Um cliente que segura o
+    buffer cheio por mais de `stall_timeout` é desligado (`detached`) e
+    continua por conta própria, sem segurar os outros.
+    """
+
+    def __init__(self, client_buffer: int = PROXY_TEE_CLIENT_BUFFER,
+                 stall_timeout: float = PROXY_TEE_STALL_TIMEOUT):
+        """
+        Inicializa o tee (ainda sem upstream)
+
+        Args:
+            client_buffer: Bytes retidos para o cliente mais lento
+            stall_timeout: Espera por um cliente parado antes de desligá-lo
+        """
+        self.client_buffer = client_buffer
+        self.stall_timeout = stall_timeout
+        self._stalled_since: Optional[float] = None
+        self.status: Optional[int] = None
+        self.headers: Dict[str, str] = {}
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._close: Optional[Callable[[], None]] = None
+        self._sink: Optional[Callable[[bytes], None]] = None
+        self._on_done: Optional[Callable[[bool], None]] = None
+        self._buffer: List[Tuple[int, bytes]] = []  # (offset, trecho)
+        self._base = 0        # offset do primeiro byte ainda no buffer
+        self._produced = 0    # bytes lidos do upstream
+        self._subscribers: List[TeeSubscriber] = []
+        self._cond = threading.Condition()
+        self._ready = threading.Event()
+        self._abandoned = False
+        self._pumping = False
+        self._done = False
+        self._finalized = False
+
+    def subscribe(self) -> Optional[TeeSubscriber]:
+        """Novo cliente, ou None se o início do corpo já saiu do buffer"""
+        with self._cond:
+            if self._abandoned or self._done or self._base > 0:
+                return None
+            subscriber = TeeSubscriber(self)
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def start(self, status: int, headers: Dict[str, str], chunks: Iterator[bytes],
+              close: Callable[[], None], sink: Optional[Callable[[bytes], None]] = None,
+              on_done: Optional[Callable[[bool], None]] = None):
+        """
+        Liga o tee à resposta do upstream aberta pelo líder
+
+        Args:
+            status: Status repassado a todos os clientes
+            headers: Cabeçalhos repassados a todos os clientes
+            chunks: Iterador do corpo do upstream
+            close: Fecha a conexão com o upstream
+            sink: Recebe cada trecho lido (caches)
+            on_done: Chamado uma vez ao final, com True se o corpo veio inteiro
+        """
+        with self._cond:
+            self.status = status
+            self.headers = headers
+            self._chunks = chunks
+            self._close = close
+            self._sink = sink
+            self._on_done = on_done
+        self._ready.set()
+
+    def abandon(self):
+        """O líder não vai repassar a resposta (erro, playlist etc.): os seguidores seguem sozinhos"""
+        with self._cond:
+            self._abandoned = True
+            self._cond.notify_all()
+        self._ready.set()
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout) and not self._abandoned
+
+    def next_chunk(self, subscriber: TeeSubscriber) -> Optional[bytes]:
+        """
+        Próximo trecho para o cliente
+
+        Returns:
+            bytes: Trecho, ou None no fim do corpo, em erro ou se o cliente foi desligado
+        """
+        while True:
+            with self._cond:
+                while True:
+                    if subscriber.detached or subscriber.closed:
+                        return None
+                    if subscriber.offset < self._produced:
+                        chunk = self._read_from_buffer(subscriber.offset)
+                        subscriber.offset += len(chunk)
+                        if self._trim():
+                            self._cond.notify_all()  # espaço livre para a leitura
+                        return chunk
+                    if self._done:
+                        return None
+
+                    wait = TEE_WAIT_INTERVAL
+                    if not self._pumping:
+                        if self._produced - self._floor() < self.client_buffer:
+                            self._stalled_since = None
+                            self._pumping = True
+                            break
+
+                        # Buffer cheio: espera o mais lento, até desistir dele
+                        now = time.monotonic()
+                        if self._stalled_since is None:
+                            self._stalled_since = now
+                        elif now - self._stalled_since >= self.stall_timeout:
+                            self._detach_laggards()
+                            self._stalled_since = None
+                            continue
+                        wait = min(wait, self._stalled_since + self.stall_timeout - now)
+                    self._cond.wait(wait)
+
+            # Este cliente lê o upstream para todos (fora do lock)
+            try:
+                chunk = next(self._chunks, b'')
+                failed = False
+            except Exception:
+                chunk, failed = b'', True
+
+            if chunk and self._sink is not None:
+                self._sink(chunk)
+
+            with self._cond:
+                self._pumping = False
+                if chunk:
+                    self._buffer.append((self._produced, chunk))
+                    self._produced += len(chunk)
+                finish = (not chunk or not self._subscribers) and self._mark_finished()
+                self._cond.notify_all()
+
+            if finish:
+                # Fim do corpo, erro, ou todos saíram durante a leitura
+                self._finish(complete=not chunk and not failed)
+
+    def unsubscribe(self, subscriber: TeeSubscriber):
+        """Cliente desconectou ou terminou; o último a sair fecha o upstream"""
+        with self._cond:
+            if subscriber.closed:
+                return
+            subscriber.closed = True
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            self._trim()
+            # Com uma leitura em andamento, quem lê encerra (o sink pode estar gravando)
+            finish = not self._subscribers and self._ready.is_set() and not self._pumping \
+                and self._mark_finished()
+            self._cond.notify_all()
+
+        if finish:
+            self._finish(complete=False)
+
+    def _read_from_buffer(self, offset: int) -> bytes:
+        """Trecho que contém `offset` (a partir dele)"""
+        for start, chunk in self._buffer:
+            if start <= offset < start + len(chunk):
+                return chunk[offset - start:]
+        return b''
+
+    def _detach_laggards(self):
+        """Desliga os clientes que seguram o buffer cheio"""
+        for subscriber in list(self._subscribers):
+            if self._produced - subscriber.offset >= self.client_buffer:
+                subscriber.detached = True
+                self._subscribers.remove(subscriber)
+        self._trim()
+        self._cond.notify_all()
+
+    def _floor(self) -> int:
+        """Offset do cliente mais lento ainda ligado"""
+        if not self._subscribers:
+            return self._produced
+        return min(subscriber.offset for subscriber in self._subscribers)
+
+    def _trim(self) -> bool:
+        """
+        Descarta os trechos que todos os clientes ligados já leram
+
+        Enquanto o corpo lido cabe na janela de um cliente, o início é
+        mantido para que quem chega logo depois (o play dispara todos os
+        players quase juntos) ainda entre no mesmo fan-out.
+        """
+        if self._subscribers and self._produced <= self.client_buffer:
+            return False
+
+        floor = self._floor()
+        trimmed = False
+        while self._buffer and self._buffer[0][0] + len(self._buffer[0][1]) <= floor:
+            start, chunk = self._buffer.pop(0)
+            self._base = start + len(chunk)
+            trimmed = True
+        return trimmed
+
+    def _mark_finished(self) -> bool:
+        """Encerra o tee (chamado com o lock); True para quem deve chamar _finish"""
+        self._done = True
+        if self._finalized:
+            return False
+        self._finalized = True
+        return True
+
+    def _finish(self, complete: bool):
+        """
+        Fecha o upstream e avisa o fim
+
+        Chamado uma única vez, sem o lock: o aviso grava caches e tira o tee
+        do registro, que tem o próprio lock e chama subscribe() com ele.
+        """
+        if self._close is not None:
+            self._close()
+        if self._on_done is not None:
+            self._on_done(complete)
+
+
+class TeeRegistry:
+    """
+    Tees em andamento por chave (URL + intervalo)
+
+    O primeiro pedido de uma chave vira líder e abre o upstream; os que
+    chegam enquanto o início do corpo ainda está no buffer entram como
+    seguidores. O líder tira o tee do registro ao terminar ou desistir.
+    """
+
+    def __init__(self):
+        self._tees: Dict[Hashable, StreamTee] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def acquire(self, key: Hashable) -> Tuple[StreamTee, Optional[TeeSubscriber], bool]:
+        """
+        Entra no tee da chave ou cria um novo
+
+        Returns:
+            tuple: (tee, assinante, é_líder)
+        """
+        with self._lock:
+            tee = self._tees.get(key)
+            if tee is not None:
+                subscriber = tee.subscribe()
+                if subscriber is not None:
+                    self.followers += 1
+                    return tee, subscriber, False
+
+            tee = self._tees[key] = StreamTee()
+            self.leaders += 1
+            return tee, tee.subscribe(), True
+
+    def release(self, key: Hashable, tee: StreamTee):
+        """Tira o tee do registro (não aceita mais seguidores)"""
+        with self._lock:
+            if self._tees.get(key) is tee:
+                del self._tees[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'leaders': self.leaders, 'followers': self.followers, 'open': len(self._tees)}
@@ -0,0 +1,207 @@
+"""
+Streamhive Socket Metrics
+Métricas de latência, erros e fan-out dos eventos Socket.IO em formato de texto Prometheus
+"""
+
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
+
+from flask_socketio import SocketIO
+
+
+# Limites superiores dos buckets de latência (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Medir bytes emitidos exige serializar o payload mais uma vez; pode ser desligado
+SOCKET_METRICS_BYTES = os.environ.get('SOCKET_METRICS_BYTES', '1') != '0'
+
+
+def payload_size(payload: Any) -> int:
+    """
+    Tamanho aproximado de um payload no fio
+
+    Anexos binários (bytes) contam pelo seu tamanho; o resto pelo JSON
+    compacto, como o python-socketio serializa os pacotes.
+    """
+    attachments = 0
+
+    def _default(value):
+        nonlocal attachments
+        if isinstance(value, (bytes, bytearray)):
+            attachments += len(value)
+            return None
+        return str(value)
+
+    return len(json.dumps(payload, separators=(',', ':'), default=_default)) + attachments
+
+
+class _Histogram:
+    """Histograma cumulativo com buckets fixos"""
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class SocketMetrics:
+    """
+    Registro das métricas dos handlers e das emissões
+
+    Contadores e histogramas ficam em dicionários simples protegidos por
+    um lock; `render` gera o formato de exposição em texto do Prometheus.
+    """
+
+    def __init__(self, socketio: Optional[SocketIO] = None):
+        """
+        Inicializa o registro
+
+        Args:
+            socketio: Instância do Flask-SocketIO (usada para contar destinatários)
+        """
+        self.socketio = socketio
+        self._latency: Dict[str, _Histogram] = {}
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._emitted: Dict[str, int] = {}
+        self._emitted_bytes: Dict[str, int] = {}
+        self._recipients: Dict[str, int] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def instrument(self, event: str) -> Callable:
+        """
+        Decorator que mede a latência e conta chamadas e erros de um handler
+
+        Args:
+            event: Nome do evento
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                self._local.failed = False
+                start = time.perf_counter()
+                try:
+                    return handler(*args, **kwargs)
+                except Exception:
+                    self._local.failed = True
+                    raise
+                finally:
+                    self._observe(event, time.perf_counter() - start, self._local.failed)
+            return wrapper
+        return decorator
+
+    def handler_failed(self):
+        """Marca como erro o handler em execução (para exceções tratadas no próprio handler)"""
+        self._local.failed = True
+
+    def record_emit(self, event: str, payload: Any, room: Optional[str] = None):
+        """
+        Contabiliza uma emissão
+
+        Args:
+            event: Nome do evento
+            payload: Payload enviado
+            room: Sala Socket.IO de destino (None = conexão única)
+        """
+        recipients = self._room_size(room) if room is not None else 1
+        size = payload_size(payload) if SOCKET_METRICS_BYTES else 0
+
+        with self._lock:
+            self._emitted[event] = self._emitted.get(event, 0) + 1
+            self._recipients[event] = self._recipients.get(event, 0) + recipients
+            self._emitted_bytes[event] = self._emitted_bytes.get(event, 0) + size * recipients
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None,
+               totals: Optional[Dict[str, Tuple[str, Union[float, Dict[str, float]]]]] = None) -> str:
+        """
+        Gera as métricas no formato de texto do Prometheus
+
+        Args:
+            gauges: nome -> (descrição, valor) de medidores instantâneos
+            totals: nome -> (descrição, valor ou {evento: valor}) de contadores
+                monotônicos de outros componentes; o nome termina em `_total`
+
+        Returns:
+            str: Texto de exposição
+        """
+        for name in totals or {}:
+            if not name.endswith('_total'):
+                raise ValueError(f"Contador sem sufixo _total: {name}")
+
+        with self._lock:
+            latency = {event: (list(h.counts), h.total, h.count) for event, h in self._latency.items()}
+            counters = [
+                ('streamhive_socket_handler_calls_total', 'Chamadas de handlers por evento', dict(self._calls)),
+                ('streamhive_socket_handler_errors_total', 'Handlers que terminaram em erro', dict(self._errors)),
+                ('streamhive_socket_emitted_total', 'Eventos emitidos por evento', dict(self._emitted)),
+                ('streamhive_socket_emitted_bytes_total', 'Bytes emitidos (payload x destinatários)', dict(self._emitted_bytes)),
+                ('streamhive_socket_recipients_total', 'Destinatários alcançados (fan-out)', dict(self._recipients)),
+            ]
+
+        lines: List[str] = []
+
+        name = 'streamhive_socket_handler_duration_seconds'
+        lines.append(f'# HELP {name} Latência dos handlers de eventos Socket.IO')
+        lines.append(f'# TYPE {name} histogram')
+        for event, (counts, total, count) in sorted(latency.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{event="{event}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{event="{event}"}} {total:.6f}')
+            lines.append(f'{name}_count{{event="{event}"}} {count}')
+
+        for name, description, values in counters:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for event, value in sorted(values.items()):
+                lines.append(f'{name}{{event="{event}"}} {value}')
+
+        for name, (description, value) in sorted((totals or {}).items()):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            if isinstance(value, dict):
+                for event, event_value in sorted(value.items()):
+                    lines.append(f'{name}{{event="{event}"}} {event_value}')
+            else:
+                lines.append(f'{name} {value}')
+
+        for name, (description, value) in sorted((gauges or {}).items()):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _observe(self, event: str, seconds: float, failed: bool):
+        """Registra a duração de uma chamada de handler"""
+        with self._lock:
+            histogram = self._latency.get(event)
+            if histogram is None:
+                histogram = self._latency[event] = _Histogram()
+            histogram.observe(seconds)
+            self._calls[event] = self._calls.get(event, 0) + 1
+            if failed:
+                self._errors[event] = self._errors.get(event, 0) + 1
+
+    def _room_size(self, room: str) -> int:
+        """Número de conexões em uma sala Socket.IO (0 se indisponível)"""
+        try:
+            return len(self.socketio.server.manager.rooms['/'].get(room) or ())
+        except Exception:
+            return 0
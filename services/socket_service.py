@@ -3,23 +3,50 @@ Streamhive Socket Service
 Gerenciamento de WebSockets e sincronização de salas
 """
 
-from asyncio.log import logger
 from flask import session, request
-from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
+from flask_socketio import SocketIO, ConnectionRefusedError, emit, join_room, leave_room, close_room, disconnect
 from typing import Dict, Any, Optional, List
+import functools
 import logging
+import threading
 import time
 import json
 from datetime import datetime
 
 from database.connection import get_db_manager
-from services import room_service
 from services.room_service import get_room_service
 from services.auth_service import get_auth_service
+from services.playback_clock import PlaybackClock, SYNC_HEARTBEAT_INTERVAL, get_sync_config
+from services.room_events import RoomEventLog
+from services.broadcast_batcher import BroadcastBatcher
+from services.membership_index import MembershipIndex
+from services.presence_roster import PresenceRoster, ROSTER_DIFF_INTERVAL_MS, ROSTER_PAGE_SIZE_MAX
+from services.room_reaper import RoomReaper
+from services.room_store import restore_clock, snapshot_mark
+from services.room_snapshotter import RoomSnapshotter
+from services.netflix_sync import NetflixSyncCoalescer, normalize_netflix_url
+from services.chat_history import ChatHistory, ChatRecord, CHAT_HISTORY_SIZE
+from services.chat_store import ChatStore
+from services.rate_limiter import SocketRateLimiter
+from services.backpressure import BackpressureMonitor
+from services.socket_metrics import SocketMetrics
+from services.admission import AdmissionController
+from services.segment_cache import segment_cache
+from services.disk_cache import disk_cache
+from proxy_server import get_proxy_server
+from utils.logging_config import get_logging_stats
+from utils.wire_format import WIRE_JSON, WIRE_COMPACT, negotiate_wire_format, encode_payload
 
 # Estrutura global para armazenar estado das salas
 room_states: Dict[str, Dict[str, Any]] = {}
-user_rooms: Dict[str, str] = {}  # user_id -> room_id
+room_states_lock = threading.RLock()  # criação e despejo de salas
+memberships = MembershipIndex()  # sid <-> room_id, agrupado por usuário
+client_wire: Dict[str, str] = {}  # sid -> formato de fio negociado
+
+
+def wire_room(room_id: str, wire: str) -> str:
+    """Nome da sub-sala Socket.IO que agrupa os clientes de um formato de fio"""
+    return f'{room_id}:{wire}'
 
 
 class SocketService:
@@ -37,16 +64,126 @@ class SocketService:
         self.room_service = get_room_service()
         self.auth_service = get_auth_service()
         self.logger = logging.getLogger(__name__)
+        # Logs por evento de alto volume (chat, controles), amostrados em LOG_SAMPLE_RATES
+        self.event_logger = logging.getLogger(f'{__name__}.events')
+        self.metrics = SocketMetrics(socketio)
+        self.batcher = BroadcastBatcher(socketio, metrics=self.metrics)
+        self.reaper = RoomReaper(socketio, room_states, memberships, room_states_lock)
+        self.chat_store = ChatStore(socketio)
+        self.netflix = NetflixSyncCoalescer(socketio, self._relay_netflix_state)
+        self.rate_limiter = SocketRateLimiter(socketio)
+        self.admission = AdmissionController()
+        self.backpressure = BackpressureMonitor(
+            socketio, memberships,
+            lambda sid, room_id: wire_room(room_id, client_wire.get(sid, WIRE_JSON))
+        )
+        self.snapshotter = RoomSnapshotter(socketio, room_states, room_states_lock, self.reaper.store)
+        
+        # Restaurar salas ativas antes de aceitar conexões
+        self.restore_room_states()
+        self.snapshotter.start()
         
         # Registrar event handlers
         self.register_handlers()
+        
+        # Heartbeats do relógio de reprodução
+        self.socketio.start_background_task(self._heartbeat_loop)
+        
+        # Diffs agregados de presença
+        self.socketio.start_background_task(self._roster_loop)
+    
+    def on(self, event: str):
+        """
+        Registra um handler de evento com medição de latência e erros
+        
+        Args:
+            event: Nome do evento Socket.IO
+        """
+        def decorator(handler):
+            return self.socketio.on(event)(self.metrics.instrument(event)(handler))
+        return decorator
+    
+    def _handler_error(self, message: str, error: Exception):
+        """
+        Registra um erro tratado dentro de um handler
+        
+        O handler segue respondendo ao cliente, mas a chamada conta como
+        erro nas métricas do evento.
+        
+        Args:
+            message: Descrição do erro no log
+            error: Exceção capturada
+        """
+        self.metrics.handler_failed()
+        self.logger.error(f"{message}: {error}")
+    
+    def rate_limited(self, event: str):
+        """
+        Decorator que aplica o limite de taxa antes de qualquer trabalho do handler
+        
+        Eventos acima do limite são descartados; a conexão recebe no máximo
+        um aviso `rate_limited` por segundo com o tempo sugerido de espera.
+        
+        Args:
+            event: Nome do evento em SOCKET_RATE_LIMITS
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                sid = request.sid
+                retry_after = self.rate_limiter.check(event, sid, session.get('user_id'))
+                if retry_after is None:
+                    return handler(*args, **kwargs)
+                
+                if self.rate_limiter.should_notify(sid):
+                    emit('rate_limited', {'event': event, 'retry_after': round(retry_after, 3)})
+            return wrapper
+        return decorator
+    
+    def admission_controlled(self, event: str):
+        """
+        Decorator que limita quantas execuções do handler acontecem ao mesmo tempo
+        
+        Acima do limite a chamada espera numa fila curta; com a fila cheia
+        ela é descartada e o cliente recebe `join_deferred` com a espera
+        sugerida antes de tentar de novo.
+        
+        Args:
+            event: Nome do evento (informado no aviso ao cliente)
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(data, *args, **kwargs):
+                retry_after = self.admission.acquire()
+                if retry_after is not None:
+                    emit('join_deferred', {
+                        'event': event,
+                        'room_id': data.get('room_id') if isinstance(data, dict) else None,
+                        'retry_after': retry_after
+                    })
+                    return
+                
+                started = time.monotonic()
+                try:
+                    return handler(data, *args, **kwargs)
+                finally:
+                    self.admission.release(time.monotonic() - started)
+            return wrapper
+        return decorator
     
     def register_handlers(self):
         """Registra todos os event handlers do socket"""
         
-        @self.socketio.on('connect')
+        @self.on('connect')
         def handle_connect(auth):
             """Conexão do cliente"""
+            # Rajada de reconexões com a fila de entradas cheia: recusar com espera sugerida
+            if self.admission.saturated():
+                raise ConnectionRefusedError({
+                    'message': 'Servidor ocupado, tente novamente',
+                    'retry_after': self.admission.reject()
+                })
+            
             try:
                 # Verificar autenticação
                 if 'user_id' not in session:
@@ -57,65 +194,89 @@ class SocketService:
                 user_id = str(session['user_id'])
                 username = session.get('username', 'Usuário')
                 
+                # Formato de fio opcional negociado pelo cliente
+                wire = negotiate_wire_format(auth)
+                client_wire[request.sid] = wire
+                
                 self.logger.info(f"Usuário {username} conectado via Socket.IO")
                 
                 emit('connected', {
                     'status': 'success',
                     'message': f'Conectado como {username}',
                     'user_id': user_id,
-                    'username': username
+                    'username': username,
+                    'sync': get_sync_config(),
+                    'wire': wire
                 })
                 
                 return True
                 
             except Exception as e:
-                self.logger.error(f"Erro na conexão: {e}")
+                self._handler_error("Erro na conexão", e)
                 disconnect()
                 return False
             
 
-        @self.socketio.on('netflix_sync')
+        @self.on('clock_ping')
+        @self.rate_limited('clock_ping')
+        def handle_clock_ping(data):
+            """Responde ao ping de estimativa de offset de relógio (estilo NTP)"""
+            emit('clock_pong', {
+                'c': (data or {}).get('c'),
+                's': time.time()
+            })
+
+        @self.on('netflix_sync')
+        @self.rate_limited('netflix_sync')
         def handle_netflix_sync(data):
-                """Sincronizar navegação do Netflix entre usuários"""
-                try:
-                    room_id = data.get('room_id')
-                    user_id = session.get('user_id')
-                    
-                    if not room_id or not user_id:
-                        return
-                    
-                    # Verificar se usuário é owner da sala
-                    room = room_service.get_room_by_id(room_id)
-                    if not room or room['owner_id'] != user_id:
-                        return
-                    
-                    # Retransmitir para outros usuários da sala
-                    emit('netflix_sync', data, room=f'room_{room_id}', include_self=False)
-                    
-                    logger.info(f"Netflix sync enviado na sala {room_id} por usuário {user_id}")
-                    
-                except Exception as e:
-                    logger.error(f"Erro no Netflix sync: {e}")
+            """Sincronizar navegação do Netflix entre usuários"""
+            try:
+                if 'user_id' not in session or not isinstance(data, dict):
+                    return
+                
+                user_id = str(session['user_id'])
+                room_id = str(data.get('room_id'))
+                
+                # Participação e papel vêm da memória, sem consulta ao banco
+                state = room_states.get(room_id)
+                if memberships.room_of(request.sid) != room_id or state is None:
+                    return
+                
+                member = state['roster'].members.get(user_id)
+                if not member or member['role'] != 'owner':
+                    return
+                
+                url = normalize_netflix_url(data.get('url'))
+                if url is None:
+                    return
+                
+                # Rajadas do dono viram no máximo uma retransmissão por janela
+                self.netflix.submit(room_id, {'url': url, 'timestamp': time.time()})
+                
+            except Exception as e:
+                self._handler_error("Erro no Netflix sync", e)
         
-        @self.socketio.on('disconnect')
-        def handle_disconnect():
+        @self.on('disconnect')
+        def handle_disconnect(reason=None):
             """Desconexão do cliente"""
             try:
                 if 'user_id' in session:
                     user_id = str(session['user_id'])
                     username = session.get('username', 'Usuário')
                     
-                    # Remover usuário de qualquer sala
-                    if user_id in user_rooms:
-                        room_id = user_rooms[user_id]
-                        self.handle_leave_room_internal(user_id, room_id)
-                    
                     self.logger.info(f"Usuário {username} desconectado")
+                
+                # Remover esta conexão de qualquer sala
+                self.handle_leave_room_internal(request.sid)
+                client_wire.pop(request.sid, None)
+                self.rate_limiter.forget_sid(request.sid)
                     
             except Exception as e:
-                self.logger.error(f"Erro na desconexão: {e}")
+                self._handler_error("Erro na desconexão", e)
         
-        @self.socketio.on('join_room')
+        @self.on('join_room')
+        @self.rate_limited('join_room')
+        @self.admission_controlled('join_room')
         def handle_join_room(data):
             """Usuário entra em uma sala"""
             try:
@@ -146,72 +307,105 @@ class SocketService:
                 user_role = participant_query[0]['role']
                 
                 # Sair de sala anterior se estiver em alguma
-                if user_id in user_rooms:
-                    old_room_id = user_rooms[user_id]
-                    if old_room_id != room_id:
-                        self.handle_leave_room_internal(user_id, old_room_id)
+                old_room_id = memberships.room_of(request.sid)
+                if old_room_id is not None and old_room_id != room_id:
+                    self.handle_leave_room_internal(request.sid)
                 
                 # Entrar na nova sala
                 join_room(room_id)
-                user_rooms[user_id] = room_id
-                
-                # Inicializar estado da sala se não existir
-                if room_id not in room_states:
-                    room_states[room_id] = {
-                        'video_url': room_data['stream_url'],
-                        'current_time': 0,
-                        'is_playing': False,
-                        'last_update': time.time(),
-                        'participants': {},
-                        'chat_messages': []
-                    }
-                
-                # Adicionar usuário aos participantes
-                room_states[room_id]['participants'][user_id] = {
-                    'username': username,
-                    'role': user_role,
-                    'joined_at': time.time()
-                }
-                
-                # Notificar entrada do usuário
-                emit('user_joined', {
-                    'user_id': user_id,
-                    'username': username,
-                    'role': user_role,
-                    'participants_count': len(room_states[room_id]['participants'])
-                }, room=room_id)
-
-
-                current_video_time = room_states[room_id]['current_time']
-
-                if room_states[room_id]['is_playing']:
-                    elapsed_time = time.time() - room_states[room_id]['last_update']
-                    current_video_time += elapsed_time
-                    
-                    # Atualizar o estado da sala com o tempo atual
-                    room_states[room_id]['current_time'] = current_video_time
-                    room_states[room_id]['last_update'] = time.time()
-                
-                emit('room_state', {
-                    'video_url': room_states[room_id]['video_url'],
-                    'current_time': current_video_time,
-                    'is_playing': room_states[room_id]['is_playing'],
-                    'participants': room_states[room_id]['participants'],
-                    'chat_messages': room_states[room_id]['chat_messages'][-50:],
-                    'user_role': user_role,
-                    'room_owner_id': room_data['owner_id'],
-                    'timestamp': time.time()  # Adicionar timestamp para compensar latência
-                })
+                join_room(wire_room(room_id, client_wire.get(request.sid, WIRE_JSON)))
+                self.backpressure.forget(request.sid)
+                
+                # Sala fria: o histórico (disco ou banco) é lido fora do lock
+                # global, que todas as salas usam
+                state = room_states.get(room_id)
+                if state is None:
+                    state = self.load_room_state(room_id, room_data)
+                
+                # Estado e participação são instalados juntos para o reaper não
+                # despejar a sala entre um e outro; outra entrada pode ter
+                # criado a sala enquanto esta carregava
+                with room_states_lock:
+                    state = room_states.setdefault(room_id, state)
+                    memberships.join(request.sid, user_id, room_id)
+                    self.reaper.touch(state)
+                
+                # Adicionar usuário aos participantes (difundido no próximo diff)
+                roster = state['roster']
+                roster.add(user_id, username, user_role)
+                
+                clock = state['clock']
+                events = state['events']
+                now = time.time()
+                
+                # Cliente reconectando informa a última versão vista
+                missed_events = None
+                try:
+                    since_version = data.get('since_version')
+                    if since_version is not None:
+                        missed_events = events.since(int(since_version), data.get('epoch'))
+                except (ValueError, TypeError):
+                    missed_events = None
+                
+                if missed_events is not None:
+                    # Apenas os eventos perdidos e a posição atual do relógio
+                    self.emit_to_client('room_resync', {
+                        'events': missed_events,
+                        'version': events.version,
+                        'epoch': events.epoch,
+                        'current_time': clock.current_time(now),
+                        'is_playing': clock.is_playing,
+                        'netflix': state.get('netflix'),
+                        'user_role': user_role,
+                        'room_owner_id': room_data['owner_id'],
+                        'timestamp': now
+                    })
+                else:
+                    self.emit_to_client('room_state', {
+                        'video_url': state['video_url'],
+                        'current_time': clock.current_time(now),
+                        'is_playing': clock.is_playing,
+                        'netflix': state.get('netflix'),
+                        # Salas grandes recebem só a contagem; o roster é paginado sob demanda
+                        'participants': roster.snapshot() if roster.is_full_mode else None,
+                        'participants_count': len(roster),
+                        'roster_version': roster.version,
+                        # Array JSON pré-serializado, enviado como anexo binário
+                        'chat_messages': state['chat_history'].serialized(
+                            client_wire.get(request.sid, WIRE_JSON)
+                        ),
+                        'user_role': user_role,
+                        'room_owner_id': room_data['owner_id'],
+                        'version': events.version,
+                        'epoch': events.epoch,
+                        'timestamp': now  # Adicionar timestamp para compensar latência
+                    })
                 
                 self.logger.info(f"Usuário {username} entrou na sala {room_id}")
                 
             except Exception as e:
-                self.logger.error(f"Erro ao entrar na sala: {e}")
+                self._handler_error("Erro ao entrar na sala", e)
                 emit('error', {'message': 'Erro interno do servidor'})
         
-        @self.socketio.on('leave_room')
+        @self.on('leave_room')
         def handle_leave_room(data):
             """Usuário sai de uma sala"""
+            try:
+                if 'user_id' not in session:
+                    return
+                
+                room_id = str(data.get('room_id'))
+                
+                if memberships.room_of(request.sid) == room_id:
+                    self.handle_leave_room_internal(request.sid)
+                
+            except Exception as e:
+                self._handler_error("Erro ao sair da sala", e)
+        
+        @self.on('get_roster')
+        @self.rate_limited('get_roster')
+        def handle_get_roster(data):
+            """Página do roster completo, pedida pelo cliente sob demanda"""
             try:
                 if 'user_id' not in session:
                     return
@@ -219,12 +413,29 @@ class SocketService:
                 user_id = str(session['user_id'])
                 room_id = str(data.get('room_id'))
                 
-                self.handle_leave_room_internal(user_id, room_id)
+                if memberships.room_of(request.sid) != room_id or room_id not in room_states:
+                    emit('error', {'message': 'Você não está nesta sala'})
+                    return
+                
+                try:
+                    offset = int(data.get('offset', 0))
+                    limit = int(data.get('limit', ROSTER_PAGE_SIZE_MAX))
+                except (ValueError, TypeError):
+                    offset, limit = 0, ROSTER_PAGE_SIZE_MAX
+                
+                roster = room_states[room_id]['roster']
+                self.emit_to_client('roster_page', {
+                    'members': roster.page(offset, limit),
+                    'offset': offset,
+                    'total': len(roster),
+                    'roster_version': roster.version
+                })
                 
             except Exception as e:
-                self.logger.error(f"Erro ao sair da sala: {e}")
+                self._handler_error("Erro ao paginar roster", e)
         
-        @self.socketio.on('video_action')
+        @self.on('video_action')
+        @self.rate_limited('video_action')
         def handle_video_action(data):
             """Controles de vídeo (play, pause, seek)"""
             try:
@@ -237,7 +448,7 @@ class SocketService:
                 action = data.get('action')  # 'play', 'pause', 'seek'
                 
                 # Verificar se usuário está na sala
-                if user_id not in user_rooms or user_rooms[user_id] != room_id:
+                if memberships.room_of(request.sid) != room_id:
                     emit('error', {'message': 'Você não está nesta sala'})
                     return
                 
@@ -250,41 +461,41 @@ class SocketService:
                 # Aplicar ação
                 if room_id in room_states:
                     current_time = time.time()
+                    clock = room_states[room_id]['clock']
                     
                     if action == 'play':
-                        room_states[room_id]['is_playing'] = True
-                        room_states[room_id]['last_update'] = current_time
+                        clock.play(current_time)
                         
                     elif action == 'pause':
-                        # Atualizar tempo atual baseado no tempo decorrido
-                        if room_states[room_id]['is_playing']:
-                            elapsed = current_time - room_states[room_id]['last_update']
-                            room_states[room_id]['current_time'] += elapsed
-                        
-                        room_states[room_id]['is_playing'] = False
-                        room_states[room_id]['last_update'] = current_time
+                        clock.pause(current_time)
                         
                     elif action == 'seek':
-                        seek_time = data.get('time', 0)
-                        room_states[room_id]['current_time'] = seek_time
-                        room_states[room_id]['last_update'] = current_time
+                        clock.seek(data.get('time', 0) or 0, current_time)
+                        self._prefetch_seek(room_states[room_id]['video_url'], clock.current_time(current_time))
                     
                     # Transmitir ação para todos na sala
-                    emit('video_sync', {
+                    self.broadcast_room_event(room_id, 'video_sync', {
                         'action': action,
-                        'current_time': room_states[room_id]['current_time'],
-                        'is_playing': room_states[room_id]['is_playing'],
+                        'current_time': clock.current_time(current_time),
+                        'is_playing': clock.is_playing,
                         'time': data.get('time') if action == 'seek' else None,
                         'timestamp': current_time
-                    }, room=room_id)
+                    })
+                    
+                    # A ação já ressincroniza a sala; adiar o próximo heartbeat
+                    clock.last_heartbeat = current_time
                     
-                    self.logger.info(f"Ação de vídeo '{action}' na sala {room_id} por usuário {user_id}")
+                    self.event_logger.info(
+                        f"Ação de vídeo '{action}' na sala {room_id} por usuário {user_id}",
+                        extra={'event': 'video_action', 'room_id': room_id, 'user_id': user_id}
+                    )
                 
             except Exception as e:
-                self.logger.error(f"Erro na ação de vídeo: {e}")
+                self._handler_error("Erro na ação de vídeo", e)
                 emit('error', {'message': 'Erro interno do servidor'})
         
-        @self.socketio.on('chat_message')
+        @self.on('chat_message')
+        @self.rate_limited('chat_message')
         def handle_chat_message(data):
             """Mensagem do chat"""
             try:
@@ -303,38 +514,40 @@ class SocketService:
                     return
                 
                 # Verificar se usuário está na sala
-                if user_id not in user_rooms or user_rooms[user_id] != room_id:
+                if memberships.room_of(request.sid) != room_id:
                     emit('error', {'message': 'Você não está nesta sala'})
                     return
                 
                 # Criar mensagem
-                chat_message = {
-                    'id': f"{user_id}_{int(time.time() * 1000)}",
-                    'user_id': user_id,
-                    'username': username,
-                    'message': message,
-                    'timestamp': time.time(),
-                    'formatted_time': datetime.now().strftime('%H:%M')
-                }
+                now = time.time()
+                record = ChatRecord(
+                    id=self.chat_store.next_id(),
+                    user_id=user_id,
+                    username=username,
+                    message=message,
+                    timestamp=now
+                )
                 
-                # Adicionar à sala
+                # Adicionar à sala (buffer circular descarta as mais antigas)
                 if room_id in room_states:
-                    room_states[room_id]['chat_messages'].append(chat_message)
-                    
-                    # Manter apenas últimas 100 mensagens
-                    if len(room_states[room_id]['chat_messages']) > 100:
-                        room_states[room_id]['chat_messages'] = room_states[room_id]['chat_messages'][-100:]
+                    room_states[room_id]['chat_history'].append(record)
+                
+                # Gravação no banco em segundo plano
+                self.chat_store.enqueue(room_id, record)
                 
                 # Transmitir mensagem
-                emit('new_message', chat_message, room=room_id)
+                self.broadcast_room_event(room_id, 'new_message', record.to_dict())
                 
-                self.logger.info(f"Mensagem de chat na sala {room_id} por {username}")
+                self.event_logger.info(
+                    f"Mensagem de chat na sala {room_id} por {username}",
+                    extra={'event': 'chat_message', 'room_id': room_id, 'user_id': user_id}
+                )
                 
             except Exception as e:
-                self.logger.error(f"Erro na mensagem de chat: {e}")
+                self._handler_error("Erro na mensagem de chat", e)
                 emit('error', {'message': 'Erro interno do servidor'})
         
-        @self.socketio.on('kick_user')
+        @self.on('kick_user')
         def handle_kick_user(data):
             """Owner expulsa usuário da sala"""
             try:
@@ -363,29 +576,25 @@ class SocketService:
                     (int(room_id), int(target_user_id))
                 )
                 
-                # Remover do estado da sala
-                if room_id in room_states and target_user_id in room_states[room_id]['participants']:
-                    username = room_states[room_id]['participants'][target_user_id]['username']
-                    del room_states[room_id]['participants'][target_user_id]
-                    
-                    # Notificar expulsão
-                    emit('user_kicked', {
-                        'user_id': target_user_id,
-                        'username': username,
-                        'message': f'{username} foi removido da sala'
-                    }, room=room_id)
-                    
-                    # Desconectar usuário da sala
-                    if target_user_id in user_rooms:
-                        del user_rooms[target_user_id]
+                # Remover do estado da sala (a expulsão segue no próximo diff de presença)
+                if room_id in room_states:
+                    room_states[room_id]['roster'].remove(target_user_id, kicked=True)
+                
+                # Desconectar todas as abas do usuário expulso da sala
+                for sid in memberships.remove_user(room_id, target_user_id):
+                    emit('kicked', {
+                        'message': 'Você foi removido da sala pelo proprietário',
+                        'redirect': '/dashboard'
+                    }, to=sid)
+                    self._detach_sid(sid, room_id)
                 
                 self.logger.info(f"Usuário {target_user_id} expulso da sala {room_id} por {owner_id}")
                 
             except Exception as e:
-                self.logger.error(f"Erro ao expulsar usuário: {e}")
+                self._handler_error("Erro ao expulsar usuário", e)
                 emit('error', {'message': 'Erro interno do servidor'})
         
-        @self.socketio.on('delete_room')
+        @self.on('delete_room')
         def handle_delete_room(data):
             """Owner deleta a sala"""
             try:
@@ -421,45 +630,339 @@ class SocketService:
                 }, room=room_id)
                 
                 # Limpar estado da sala
-                if room_id in room_states:
-                    del room_states[room_id]
-                
-                # Remover usuários do mapeamento
-                users_to_remove = [uid for uid, rid in user_rooms.items() if rid == room_id]
-                for user_id in users_to_remove:
-                    del user_rooms[user_id]
+                with room_states_lock:
+                    room_states.pop(room_id, None)
+                self.reaper.store.delete(room_id)
+                self.netflix.discard(room_id)
+                
+                # Esvaziar as salas Socket.IO e o índice em O(participantes)
+                memberships.remove_room(room_id)
+                close_room(room_id)
+                for wire in (WIRE_JSON, WIRE_COMPACT):
+                    self.batcher.discard(wire_room(room_id, wire))
+                    close_room(wire_room(room_id, wire))
                 
                 self.logger.info(f"Sala {room_id} deletada por {owner_id}")
                 
             except Exception as e:
-                self.logger.error(f"Erro ao deletar sala: {e}")
+                self._handler_error("Erro ao deletar sala", e)
                 emit('error', {'message': 'Erro interno do servidor'})
     
-    def handle_leave_room_internal(self, user_id: str, room_id: str):
-        """Lógica interna para usuário sair da sala"""
-        try:
-            if room_id in room_states and user_id in room_states[room_id]['participants']:
-                username = room_states[room_id]['participants'][user_id]['username']
-                del room_states[room_id]['participants'][user_id]
+    def load_room_state(self, room_id: str, room_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Monta o estado de uma sala que não está em memória
+        
+        Salas despejadas pelo reaper são recarregadas do disco (posição do
+        vídeo e chat recente), desde que o vídeo da sala não tenha mudado.
+        Sem estado em disco, o chat recente vem do banco. Não registra a
+        sala em room_states: deve ser chamado sem room_states_lock.
+        
+        Args:
+            room_id: ID da sala
+            room_data: Dados da sala vindos do banco
+            
+        Returns:
+            dict: Estado da sala
+        """
+        state = self._new_room_state(room_data)
+        
+        warm = self.reaper.store.load(room_id)
+        if warm and warm.get('video_url') == room_data['stream_url']:
+            state['clock'] = restore_clock(warm.get('clock', {}))
+            state['chat_history'].extend(warm.get('chat_messages', []))
+            self.logger.info(f"Estado da sala {room_id} recarregado do disco")
+        else:
+            messages, _ = self.chat_store.get_messages(room_id, limit=CHAT_HISTORY_SIZE)
+            state['chat_history'].extend(messages)
+        
+        return state
+    
+    def restore_room_states(self) -> int:
+        """
+        Restaura as salas ativas a partir dos snapshots em disco
+        
+        Chamado na inicialização, antes de registrar os handlers. Relógio,
+        chat, roster e numeração do log voltam como estavam, então clientes
+        que reconectam recebem uma ressincronização vazia em vez do estado
+        completo. Participantes que não reconectarem são removidos pelo
+        reaper após ROOM_RESTORE_GRACE_SECONDS.
+        
+        Returns:
+            int: Número de salas restauradas
+        """
+        store = self.reaper.store
+        now = time.time()
+        restored = 0
+        
+        for room_id, data in store.load_live().items():
+            try:
+                room_data = self.room_service.get_room_by_id(int(room_id))
+                if not room_data or room_data['stream_url'] != data.get('video_url'):
+                    store.delete(room_id)
+                    continue
                 
-                # Notificar saída
-                emit('user_left', {
-                    'user_id': user_id,
-                    'username': username,
-                    'participants_count': len(room_states[room_id]['participants'])
-                }, room=room_id)
+                state = self._new_room_state(room_data)
+                state['clock'] = restore_clock(data.get('clock', {}))
+                state['chat_history'].extend(data.get('chat_messages', []))
+                
+                events = data.get('events') or {}
+                if events.get('epoch'):
+                    state['events'].restore(events['epoch'], int(events.get('version', 0)))
+                
+                roster = data.get('roster') or {}
+                state['roster'].restore(roster.get('members', []), int(roster.get('version', 0)))
+                
+                if data.get('netflix'):
+                    state['netflix'] = data['netflix']
+                
+                state['restored_at'] = now
+                state['snapshot_mark'] = snapshot_mark(state)
+                self.reaper.touch(state, now)
+                
+                with room_states_lock:
+                    room_states[room_id] = state
+                restored += 1
+                
+            except Exception as e:
+                self.logger.error(f"Erro ao restaurar a sala {room_id}: {e}")
+        
+        if restored:
+            self.logger.info(f"{restored} salas restauradas do snapshot")
+        return restored
+    
+    def _new_room_state(self, room_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Estado vazio de uma sala"""
+        return {
+            'video_url': room_data['stream_url'],
+            'clock': PlaybackClock(),
+            'events': RoomEventLog(),
+            'roster': PresenceRoster(),
+            'chat_history': ChatHistory()
+        }
+    
+    def get_room_stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas das salas em memória
+        
+        Returns:
+            dict: Contagem de salas, conexões e bytes estimados
+        """
+        stats = self.reaper.stats()
+        stats['connected_sids'] = len(client_wire)
+        stats['snapshots_total'] = self.snapshotter.snapshots_total
+        stats['rate_limits'] = self.rate_limiter.stats()
+        stats['backpressure'] = self.backpressure.stats()
+        stats['admission'] = self.admission.stats()
+        return stats
+    
+    def render_metrics(self) -> str:
+        """
+        Métricas dos handlers e medidores atuais em formato de texto Prometheus
+        
+        Returns:
+            str: Texto de exposição para o endpoint /metrics
+        """
+        with room_states_lock:
+            rooms = len(room_states)
+            live_rooms = sum(1 for state in room_states.values() if len(state['roster']))
+        logs = get_logging_stats()
+        cache = segment_cache.stats()
+        disk = disk_cache.stats()
+        proxy = get_proxy_server().stats()
+        
+        upstream = proxy['upstream']
+        admission = self.admission.stats()
+        
+        gauges = {
+            'streamhive_socket_connected': ('Conexões Socket.IO abertas', len(client_wire)),
+            'streamhive_rooms_in_memory': ('Salas com estado em memória', rooms),
+            'streamhive_rooms_live': ('Salas com participantes conectados', live_rooms),
+            'streamhive_room_sids': ('Conexões associadas a uma sala', memberships.sid_count()),
+            'streamhive_socket_degraded': ('Conexões fora do tráfego por back-pressure', self.backpressure.stats()['degraded_sids']),
+            'streamhive_join_active': ('Entradas em sala em atendimento', admission['active']),
+            'streamhive_join_waiting': ('Entradas em sala aguardando vaga', admission['waiting']),
+            'streamhive_chat_pending_writes': ('Mensagens de chat aguardando gravação', self.chat_store.pending_count()),
+            'streamhive_log_queue_depth': ('Registros de log aguardando escrita', logs['queued']),
+            'streamhive_proxy_cache_resident_bytes': ('Bytes de mídia no cache do proxy', cache['resident_bytes']),
+            'streamhive_proxy_cache_hit_ratio': ('Taxa de acerto do cache do proxy', cache['hit_ratio']),
+            'streamhive_proxy_disk_cache_bytes': ('Bytes de mídia presentes no cache em disco', disk['present_bytes']),
+            'streamhive_proxy_disk_cache_files': ('Arquivos no cache em disco', disk['files']),
+            'streamhive_proxy_disk_cache_hit_ratio': ('Pedidos atendidos inteiramente pelo disco', disk['hit_ratio']),
+            'streamhive_proxy_video_info_hit_ratio': ('Consultas de info do vídeo servidas do cache', proxy['video_info']['hit_ratio']),
+            'streamhive_proxy_upstream_connections_in_use': ('Conexões com upstreams em uso', upstream['in_use']),
+            'streamhive_proxy_upstream_connections_idle': ('Conexões com upstreams abertas e livres', upstream['idle']),
+            'streamhive_proxy_upstream_dns_hit_ratio': ('Taxa de acerto do cache de DNS do proxy', upstream['dns']['hit_ratio'])
+        }
+        
+        # Contadores monotônicos (desde o início do processo)
+        totals = {
+            'streamhive_join_admitted_total': ('Entradas em sala admitidas', admission['admitted_total']),
+            'streamhive_join_rejected_total': ('Entradas em sala recusadas por falta de vaga', admission['rejected_total']),
+            'streamhive_socket_rate_limited_total': ('Eventos recusados pelo limite de taxa', self.rate_limiter.stats()['rejected_total']),
+            'streamhive_socket_degraded_total': ('Conexões retiradas do tráfego por back-pressure', self.backpressure.stats()['degraded_total']),
+            'streamhive_chat_dropped_writes_total': ('Mensagens de chat descartadas após falhar na gravação', self.chat_store.dropped),
+            'streamhive_log_dropped_total': ('Registros de log descartados por fila cheia', logs['dropped']),
+            'streamhive_proxy_cache_hits_total': ('Respostas do proxy servidas do cache', cache['hits']),
+            'streamhive_proxy_cache_misses_total': ('Respostas do proxy buscadas no upstream', cache['misses']),
+            'streamhive_proxy_coalesced_streams_total': ('Streams servidos pelo upstream de outro cliente', proxy['streams']['followers']),
+            'streamhive_proxy_coalesced_probes_total': ('Consultas de info servidas pelo HEAD de outro cliente', proxy['probes']['shared']),
+            'streamhive_proxy_video_info_revalidations_total': ('Revalidações em segundo plano da info do vídeo', proxy['video_info']['revalidations']),
+            'streamhive_proxy_upstream_connections_opened_total': ('Conexões com upstreams abertas', upstream['connections_opened']),
+            'streamhive_proxy_upstream_tls_handshakes_total': ('Handshakes TLS com upstreams', upstream['tls_handshakes']),
+            'streamhive_proxy_upstream_pool_saturated_total': ('Pedidos que encontraram o pool do host cheio', upstream['saturated']),
+            'streamhive_proxy_upstream_pool_timeouts_total': ('Pedidos que desistiram esperando conexão livre', upstream['wait_timeouts']),
+            'streamhive_proxy_seek_prefetches_total': ('Seeks com pré-busca do ponto de destino', proxy['seeks']['prefetches']),
+            'streamhive_proxy_seek_prefetched_bytes_total': ('Bytes trazidos ao cache em disco por seeks', proxy['seeks']['prefetched_bytes']),
+            'streamhive_proxy_hls_prefetched_total': ('Segmentos HLS trazidos ao cache antes de serem pedidos', proxy['hls']['prefetched'])
+        }
+        
+        return self.metrics.render(gauges, totals)
+    
+    def _prefetch_seek(self, video_url: str, position: float):
+        """
+        Aquece o cache do proxy no ponto de um seek, antes dos participantes pedirem
+        
+        O player só passa pelo proxy vídeos diretos em HTTP; os demais não
+        tocam o proxy e não são pré-buscados.
+        """
+        if video_url and video_url.startswith('http://'):
+            get_proxy_server().prefetch_seek(video_url, position)
+    
+    def broadcast_room_event(self, room_id: str, event: str, payload: Dict[str, Any]):
+        """
+        Transmite um evento de estado para a sala, registrando-o no log versionado
+        
+        Args:
+            room_id: ID da sala
+            event: Nome do evento
+            payload: Dados do evento
+        """
+        state = room_states.get(room_id)
+        if state and 'events' in state:
+            payload = state['events'].record(event, payload)
+            self.reaper.touch(state)
+        
+        # Codifica uma única vez por formato, não por destinatário
+        self.batcher.emit(event, payload, to=wire_room(room_id, WIRE_JSON))
+        self.batcher.emit(event, encode_payload(event, payload), to=wire_room(room_id, WIRE_COMPACT))
+    
+    def _relay_netflix_state(self, room_id: str, netflix: Dict[str, Any]):
+        """
+        Retransmite o estado de navegação do Netflix já agregado
+        
+        Args:
+            room_id: ID da sala
+            netflix: Estado {'url', 'timestamp'}
+        """
+        state = room_states.get(room_id)
+        if state is None:
+            return
+        
+        # Guardado para quem entrar depois (room_state)
+        state['netflix'] = netflix
+        self.broadcast_room_event(room_id, 'netflix_sync', netflix)
+    
+    def emit_to_client(self, event: str, payload: Dict[str, Any]):
+        """
+        Envia um evento ao cliente atual no formato de fio negociado
+        
+        Args:
+            event: Nome do evento
+            payload: Dados do evento no formato verboso
+        """
+        if client_wire.get(request.sid) == WIRE_COMPACT:
+            payload = encode_payload(event, payload)
+        
+        emit(event, payload)
+        self.metrics.record_emit(event, payload)
+    
+    def _heartbeat_loop(self):
+        """
+        Envia periodicamente a posição autoritativa do relógio de cada sala
+        
+        Os clientes comparam o heartbeat com o próprio player e corrigem a
+        deriva com pequenos ajustes de velocidade em vez de seeks.
+        """
+        while True:
+            self.socketio.sleep(SYNC_HEARTBEAT_INTERVAL)
             
-            # Remover do mapeamento
-            if user_id in user_rooms:
-                del user_rooms[user_id]
+            try:
+                now = time.time()
+                for room_id, state in list(room_states.items()):
+                    clock = state.get('clock')
+                    if not clock or not len(state['roster']) or not clock.heartbeat_due(now):
+                        continue
+                    
+                    heartbeat = clock.heartbeat(now)
+                    self.socketio.emit('sync_heartbeat', heartbeat, to=room_id)
+                    self.metrics.record_emit('sync_heartbeat', heartbeat, room_id)
+                    
+            except Exception as e:
+                self.logger.error(f"Erro no heartbeat de sincronização: {e}")
+    
+    def _roster_loop(self):
+        """
+        Difunde as mudanças de presença acumuladas de cada sala
+        
+        Entradas e saídas viram um único `roster_diff` por janela, com no
+        máximo uma mensagem por sala a cada ROSTER_DIFF_INTERVAL_MS. Salas
+        acima de ROSTER_FULL_THRESHOLD recebem apenas a contagem.
+        """
+        while True:
+            self.socketio.sleep(ROSTER_DIFF_INTERVAL_MS / 1000.0)
             
-            # Sair da sala do socket
-            leave_room(room_id)
+            for room_id, state in list(room_states.items()):
+                try:
+                    roster = state['roster']
+                    if not roster.has_changes:
+                        continue
+                    
+                    diff = roster.take_diff()
+                    if not diff:
+                        continue
+                    
+                    if not roster.is_full_mode:
+                        diff = {
+                            'kicked': diff['kicked'],
+                            'count': diff['count'],
+                            'roster_version': diff['roster_version']
+                        }
+                    
+                    self.broadcast_room_event(room_id, 'roster_diff', diff)
+                    
+                except Exception as e:
+                    self.logger.error(f"Erro ao difundir presença da sala {room_id}: {e}")
+    
+    def handle_leave_room_internal(self, sid: str):
+        """
+        Lógica interna para uma conexão sair da sala em que estiver
+        
+        O usuário só deixa o roster quando sua última aba ou dispositivo sai.
+        
+        Args:
+            sid: ID da conexão Socket.IO
+        """
+        try:
+            room_id, user_id, last_connection = memberships.leave(sid)
+            if room_id is None:
+                return
+            
+            # A saída é difundida no próximo diff de presença
+            if last_connection and room_id in room_states:
+                room_states[room_id]['roster'].remove(user_id)
+            
+            self._detach_sid(sid, room_id)
             
             self.logger.info(f"Usuário {user_id} saiu da sala {room_id}")
             
         except Exception as e:
             self.logger.error(f"Erro ao sair da sala internamente: {e}")
+    
+    def _detach_sid(self, sid: str, room_id: str):
+        """Remove o sid da sala Socket.IO e da sub-sala do seu formato de fio"""
+        leave_room(room_id, sid=sid)
+        leave_room(wire_room(room_id, client_wire.get(sid, WIRE_JSON)), sid=sid)
+        self.backpressure.forget(sid)
 
 
 # Instância global (será inicializada no app.py)
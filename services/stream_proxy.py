@@ -0,0 +1,517 @@
+"""
+Streamhive Stream Proxy
+Motor de proxy assíncrono (asyncio/aiohttp) para streams de vídeo e páginas
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp import web
+
+from utils.proxy_tokens import verify_proxy_token
+from services.hls import HLS_PLAYLIST_MAX_BYTES, is_playlist, rewrite_playlist, proxied_url_builder
+from services.segment_cache import CachedResponse, segment_cache
+from services.disk_cache import BlockWriter, DiskEntry, disk_cache, response_extent
+from services.segment_prefetch import SegmentPrefetcher
+from services.upstream_pool import PROXY_DNS_TTL, PROXY_POOL_IDLE_TIMEOUT
+from proxy_server import (
+    FORWARDED_REQUEST_HEADERS, PASSTHROUGH_RESPONSE_HEADERS, PAGE_HEADERS_TO_REMOVE,
+    PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT, PROXY_USER_AGENT
+)
+
+
+# Endereço do motor quando executado como serviço próprio ou embutido no app
+PROXY_ENGINE_HOST = os.environ.get('PROXY_ENGINE_HOST', '0.0.0.0')
+PROXY_ENGINE_PORT = int(os.environ.get('PROXY_ENGINE_PORT', 7001))
+
+# Limites do buffer adaptativo de leitura do upstream (bytes)
+PROXY_BUFFER_MIN = int(os.environ.get('PROXY_BUFFER_MIN', 16 * 1024))
+PROXY_BUFFER_MAX = int(os.environ.get('PROXY_BUFFER_MAX', 1024 * 1024))
+
+# Conexões simultâneas com os upstreams (total e por host)
+PROXY_MAX_UPSTREAM_CONNECTIONS = int(os.environ.get('PROXY_MAX_UPSTREAM_CONNECTIONS', 4096))
+PROXY_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('PROXY_MAX_CONNECTIONS_PER_HOST', 0))
+
+# Dados aceitos no buffer de escrita de cada cliente antes de pausar a leitura do upstream
+PROXY_CLIENT_WRITE_BUFFER = int(os.environ.get('PROXY_CLIENT_WRITE_BUFFER', 256 * 1024))
+
+# Cabeçalhos de conexão (hop-by-hop) que nunca são repassados
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+STREAM_CORS_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
+    'Access-Control-Allow-Headers': 'Range, If-Range, Content-Type',
+    'Access-Control-Expose-Headers': 'Content-Length, Content-Range, Accept-Ranges',
+}
+
+# Decide se a requisição pode usar o proxy; devolve as claims do acesso (ou None)
+Authorizer = Callable[[web.Request], Optional[Dict[str, Any]]]
+
+
+def token_authorizer(secret: Optional[str] = None) -> Authorizer:
+    """
+    Autorização por token assinado (parâmetro `token`) ligado à URL pedida
+
+    Não usa banco nem sessão: é o modo do proxy executado separadamente.
+
+    Args:
+        secret: Chave de assinatura (padrão: PROXY_TOKEN_SECRET ou SECRET_KEY)
+    """
+    def authorize(request: web.Request) -> Optional[Dict[str, Any]]:
+        return verify_proxy_token(request.query.get('token'), request.query.get('url', ''), secret)
+    return authorize
+
+
+def any_authorizer(*authorizers: Authorizer) -> Authorizer:
+    """Aceita a requisição se qualquer uma das autorizações aceitar"""
+    def authorize(request: web.Request) -> Optional[Dict[str, Any]]:
+        for authorizer in authorizers:
+            claims = authorizer(request)
+            if claims:
+                return claims
+        return None
+    return authorize
+
+
+class AdaptiveBuffer:
+    """
+    Tamanho de leitura que acompanha a vazão do upstream
+
+    Leituras que enchem o buffer indicam dados disponíveis em volume, e o
+    buffer dobra (menos iterações e escritas por byte); leituras pequenas o
+    reduzem, para não reter memória em conexões lentas.
+    """
+
+    __slots__ = ('size',)
+
+    def __init__(self, size: int = PROXY_BUFFER_MIN):
+        self.size = size
+
+    def update(self, received: int):
+        if received >= self.size and self.size < PROXY_BUFFER_MAX:
+            self.size = min(PROXY_BUFFER_MAX, self.size * 2)
+        elif received < self.size // 4 and self.size > PROXY_BUFFER_MIN:
+            self.size = max(PROXY_BUFFER_MIN, self.size // 2)
+
+
+class AsyncProxyEngine:
+    """
+    Proxy de streaming sobre asyncio
+
+    Cada espectador custa uma corrotina e dois sockets, não uma thread do
+    worker. O controle de fluxo é de ponta a ponta: o upstream só é lido
+    quando o buffer de escrita do cliente drena, então um cliente lento
+    desacelera apenas a própria conexão com o upstream.
+    """
+
+    def __init__(self, authorize: Authorizer):
+        """
+        Inicializa o motor
+
+        Args:
+            authorize: Função que autoriza a requisição (devolve as claims do acesso)
+        """
+        self.authorize = authorize
+        self.logger = logging.getLogger(__name__)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.prefetcher: Optional[SegmentPrefetcher] = None
+        self.active_streams = 0
+        self.streams_total = 0
+        self.bytes_total = 0
+
+    async def start(self, app: web.Application = None):
+        """Cria a sessão HTTP do upstream (no loop do motor)"""
+        connector = aiohttp.TCPConnector(
+            limit=PROXY_MAX_UPSTREAM_CONNECTIONS,
+            limit_per_host=PROXY_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=PROXY_DNS_TTL,
+            keepalive_timeout=PROXY_POOL_IDLE_TIMEOUT or None  # 0: sem limite, como no pool síncrono
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None, connect=PROXY_CONNECT_TIMEOUT, sock_read=PROXY_READ_TIMEOUT),
+            headers={'User-Agent': PROXY_USER_AGENT},
+            # Bytes repassados como vieram: Content-Length e Range continuam valendo
+            auto_decompress=False
+        )
+        self.prefetcher = SegmentPrefetcher(self._fetch_segment, segment_cache)
+
+    async def close(self, app: web.Application = None):
+        """Fecha a sessão e as conexões com os upstreams"""
+        if self.session is not None:
+            await self.session.close()
+
+    async def handle_stream(self, request: web.Request) -> web.StreamResponse:
+        """GET /proxy/stream?url= — vídeo com suporte a Range"""
+        url = self._validated_url(request)
+        if isinstance(url, web.Response):
+            return url
+
+        # Com If-Range a resposta depende da versão do upstream: sem cache
+        range_header = request.headers.get('Range')
+        cacheable = 'If-Range' not in request.headers
+        if cacheable:
+            if not range_header:
+                self.prefetcher.on_request(url)
+            cached = segment_cache.get(url, range_header)
+            if cached is None and not range_header:
+                cached = await self.prefetcher.wait(url)
+            if cached is not None:
+                return self._cached_response(cached)
+
+            # Arquivos grandes: o que já foi baixado sai do disco
+            entry = disk_cache.get(url)
+            plan = entry.plan(range_header) if entry is not None else None
+            if plan is not None:
+                return await self._disk_response(request, url, entry, plan)
+
+        headers = {'Accept-Encoding': 'identity'}
+        for header in FORWARDED_REQUEST_HEADERS:
+            value = request.headers.get(header)
+            if value:
+                headers[header] = value
+
+        try:
+            async with self.session.get(url, headers=headers, allow_redirects=True) as upstream:
+                if not upstream.ok and upstream.status != 416:
+                    self.logger.error(f"Erro na requisição proxy: {upstream.status}")
+                    return web.json_response({'error': 'Erro no proxy'}, status=502)
+
+                if upstream.status == 200 and is_playlist(url, upstream.content_type):
+                    return await self._playlist_response(request, url, upstream)
+
+                response_headers = dict(STREAM_CORS_HEADERS)
+                response_headers['Content-Type'] = upstream.headers.get('Content-Type', 'application/octet-stream')
+                for header in PASSTHROUGH_RESPONSE_HEADERS:
+                    value = upstream.headers.get(header)
+                    if value:
+                        response_headers[header] = value
+
+                store = cacheable and segment_cache.admits(upstream.status, upstream.content_length)
+                writer = None
+                if cacheable and not store:
+                    writer = disk_cache.writer_for(url, upstream.status, upstream.headers,
+                                                   min_size=segment_cache.max_entry_bytes)
+                return await self._relay(request, upstream, response_headers,
+                                         cache_key=(url, range_header) if store else None, writer=writer)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Erro na requisição proxy: {e}")
+            return web.json_response({'error': 'Erro no proxy'}, status=502)
+
+    async def handle_page(self, request: web.Request) -> web.StreamResponse:
+        """GET /proxy/page?url= — página sem os cabeçalhos que impedem o embed"""
+        url = self._validated_url(request)
+        if isinstance(url, web.Response):
+            return url
+
+        try:
+            async with self.session.get(url, allow_redirects=True) as upstream:
+                if not upstream.ok:
+                    self.logger.error(f"Erro na requisição proxy para {url}: {upstream.status}")
+                    return web.json_response({'error': 'Erro no proxy da página'}, status=502)
+
+                response_headers = {
+                    name: value for name, value in upstream.headers.items()
+                    if name.lower() not in HOP_BY_HOP_HEADERS and name not in PAGE_HEADERS_TO_REMOVE
+                }
+                return await self._relay(request, upstream, response_headers)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Erro na requisição do proxy: {e}")
+            return web.json_response({'error': 'Erro no proxy da página'}, status=502)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """GET /proxy/health — estado do motor"""
+        return web.json_response({'status': 'healthy', 'proxy': self.stats()})
+
+    def stats(self) -> Dict[str, Any]:
+        """Streams ativos e volume transferido"""
+        return {
+            'active_streams': self.active_streams,
+            'streams_total': self.streams_total,
+            'bytes_total': self.bytes_total,
+            'cache': segment_cache.stats(),
+            'disk_cache': disk_cache.stats(),
+            'hls': self.prefetcher.stats() if self.prefetcher else {}
+        }
+
+    def _cached_response(self, cached: CachedResponse) -> web.Response:
+        """Resposta ao cliente a partir do cache, sem ir ao upstream"""
+        headers = dict(STREAM_CORS_HEADERS)
+        headers.update(cached.response_headers())
+        headers.setdefault('Content-Type', 'application/octet-stream')
+        self.streams_total += 1
+        self.bytes_total += len(cached.body)
+        return web.Response(status=cached.status, body=cached.body, headers=headers)
+
+    async def _playlist_response(self, request: web.Request, url: str,
+                                 upstream: aiohttp.ClientResponse) -> web.Response:
+        """
+        Playlist HLS reescrita para o proxy
+
+        Playlists de mídia passam a ser acompanhadas pela pré-busca: os
+        segmentos iniciais já são buscados enquanto o player processa a lista.
+        """
+        body = bytearray()
+        while True:
+            chunk = await upstream.content.read(PROXY_BUFFER_MAX)
+            if not chunk:
+                break
+            body += chunk
+            if len(body) > HLS_PLAYLIST_MAX_BYTES:
+                self.logger.error(f"Playlist muito grande: {url}")
+                return web.json_response({'error': 'Playlist muito grande'}, status=502)
+
+        # Playlists HLS são sempre UTF-8 (RFC 8216)
+        text = bytes(body).decode('utf-8', errors='replace')
+        playlist = rewrite_playlist(text, str(upstream.url), proxied_url_builder(request.get('proxy_claims')))
+        if not playlist.is_master:
+            self.prefetcher.track(url, playlist)
+
+        headers = dict(STREAM_CORS_HEADERS)
+        headers['Content-Type'] = 'application/vnd.apple.mpegurl'
+        return web.Response(text=playlist.text, headers=headers)
+
+    async def _fetch_segment(self, url: str):
+        """Segmento HLS inteiro do upstream, ou None se falhar ou passar do limite"""
+        try:
+            async with self.session.get(url, headers={'Accept-Encoding': 'identity'}) as upstream:
+                if upstream.status != 200 or (upstream.content_length or 0) > segment_cache.max_entry_bytes:
+                    return None
+
+                body = bytearray()
+                while True:
+                    chunk = await upstream.content.read(PROXY_BUFFER_MAX)
+                    if not chunk:
+                        break
+                    body += chunk
+                    if len(body) > segment_cache.max_entry_bytes:
+                        return None
+
+                return bytes(body), upstream.headers.get('Content-Type', 'application/octet-stream')
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Erro na pré-busca de {url}: {e}")
+            return None
+
+    async def _relay(self, request: web.Request, upstream: aiohttp.ClientResponse,
+                     headers: Dict[str, str], cache_key: Optional[Tuple[str, Optional[str]]] = None,
+                     writer: Optional[BlockWriter] = None) -> web.StreamResponse:
+        """
+        Copia o corpo do upstream para o cliente respeitando o ritmo de ambos
+
+        Com `cache_key` (url, range), o corpo completo também vai para o cache
+        compartilhado, e os próximos participantes não tocam o upstream; com
+        `writer`, os bytes são gravados no cache em disco enquanto passam.
+        """
+        response = await self._prepare(request, web.StreamResponse(status=upstream.status, headers=headers))
+
+        body = bytearray() if cache_key else None
+        self.active_streams += 1
+        self.streams_total += 1
+        try:
+            await self._pump(response, upstream, body, writer)
+            await response.write_eof()
+
+            if body is not None and len(body) == upstream.content_length:
+                segment_cache.put(cache_key[0], cache_key[1], upstream.status, upstream.headers, body)
+
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Cliente desconectou: sair do `async with` libera a conexão do upstream
+            upstream.close()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Cabeçalhos já enviados: sem como responder 502, a conexão é cortada
+            # e o cliente vê o corpo incompleto (e retoma com Range)
+            self.logger.error(f"Erro no upstream durante o streaming: {e}")
+            upstream.close()
+            if request.transport is not None:
+                request.transport.close()
+        finally:
+            self.active_streams -= 1
+            if writer is not None:
+                writer.close()
+
+        return response
+
+    async def _disk_response(self, request: web.Request, url: str, entry: DiskEntry,
+                             plan: Tuple[int, int, int]) -> web.StreamResponse:
+        """
+        Resposta a partir do cache em disco
+
+        O trecho já presente vai por sendfile; a partir do primeiro bloco
+        ausente, o restante do intervalo vem do upstream numa única
+        requisição e é gravado no disco enquanto passa.
+        """
+        status, start, end = plan
+        available = disk_cache.record(entry, start, end)
+        headers = dict(STREAM_CORS_HEADERS)
+        headers.update(entry.response_headers(status, start, end))
+        headers.setdefault('Content-Type', 'application/octet-stream')
+        response = await self._prepare(request, web.StreamResponse(status=status, headers=headers))
+
+        self.active_streams += 1
+        self.streams_total += 1
+        try:
+            if available > start:
+                await self._send_file(request, response, entry, start, min(available, end + 1) - start)
+
+            if available <= end:
+                upstream_headers = {'Accept-Encoding': 'identity', 'Range': f'bytes={available}-{end}'}
+                async with self.session.get(url, headers=upstream_headers, allow_redirects=True) as upstream:
+                    # O corpo já foi anunciado: só serve um 206 que começa onde o disco parou
+                    if upstream.status != 206 or response_extent(206, upstream.headers) != (available, entry.size):
+                        self.logger.error(f"Upstream não atendeu o intervalo {available}-{end}: {upstream.status}")
+                        request.transport.close()
+                        return response
+
+                    writer = disk_cache.writer(entry, available)
+                    try:
+                        await self._pump(response, upstream, writer=writer)
+                    except (ConnectionResetError, asyncio.CancelledError):
+                        upstream.close()
+                        raise
+                    finally:
+                        writer.close()
+
+            await response.write_eof()
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Erro ao completar o intervalo do cache em disco: {e}")
+            request.transport.close()
+        finally:
+            self.active_streams -= 1
+
+        return response
+
+    async def _prepare(self, request: web.Request, response: web.StreamResponse) -> web.StreamResponse:
+        """Envia os cabeçalhos e limita o buffer de escrita do cliente"""
+        await response.prepare(request)
+
+        # write() aguarda a drenagem quando o buffer do cliente passa deste limite
+        if request.transport is not None:
+            request.transport.set_write_buffer_limits(high=PROXY_CLIENT_WRITE_BUFFER)
+        return response
+
+    async def _pump(self, response: web.StreamResponse, upstream: aiohttp.ClientResponse,
+                    body: Optional[bytearray] = None, writer: Optional[BlockWriter] = None):
+        """Laço de cópia upstream -> cliente (e cópias para o cache)"""
+        buffer = AdaptiveBuffer()
+        while True:
+            chunk = await upstream.content.read(buffer.size)
+            if not chunk:
+                break
+            buffer.update(len(chunk))
+            if body is not None:
+                body += chunk
+            if writer is not None:
+                writer.write(chunk)
+            await response.write(chunk)
+            self.bytes_total += len(chunk)
+
+    async def _send_file(self, request: web.Request, response: web.StreamResponse,
+                         entry: DiskEntry, offset: int, count: int):
+        """Envia bytes do arquivo do cache pelo socket do cliente (sendfile quando disponível)"""
+        transport = request.transport
+        if transport is None:
+            raise ConnectionResetError('Conexão perdida')
+
+        with open(entry.path, 'rb') as file:
+            try:
+                await asyncio.get_running_loop().sendfile(transport, file, offset, count)
+            except NotImplementedError:
+                # Transporte sem suporte a sendfile: cópia pelo mapeamento do arquivo
+                with entry.mapped() as view:
+                    for position in range(offset, offset + count, PROXY_BUFFER_MAX):
+                        await response.write(view[position:min(position + PROXY_BUFFER_MAX, offset + count)])
+        self.bytes_total += count
+
+    def _validated_url(self, request: web.Request):
+        """URL do parâmetro `url`, ou a resposta de erro"""
+        claims = self.authorize(request)
+        if not claims:
+            return web.json_response({'error': 'Não autenticado'}, status=401)
+        request['proxy_claims'] = claims
+
+        url = request.query.get('url')
+        if not url:
+            return web.json_response({'error': 'URL não fornecida'}, status=400)
+
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ('http', 'https') or not parsed_url.netloc:
+            self.logger.error(f"URL inválida: {url}")
+            return web.json_response({'error': 'URL inválida'}, status=400)
+
+        return url
+
+
+def create_proxy_app(authorize: Authorizer) -> web.Application:
+    """
+    Aplicação aiohttp com as rotas do proxy
+
+    As rotas são as mesmas do app Flask (/proxy/stream e /proxy/page), então
+    um proxy reverso pode encaminhar /proxy/ para o motor sem mudar os clientes.
+
+    Args:
+        authorize: Função que autoriza a requisição (devolve as claims do acesso)
+
+    Returns:
+        web.Application: Aplicação pronta para web.run_app ou AppRunner
+    """
+    engine = AsyncProxyEngine(authorize)
+    app = web.Application()
+    app['engine'] = engine
+    app.on_startup.append(engine.start)
+    app.on_cleanup.append(engine.close)
+    app.router.add_get('/proxy/stream', engine.handle_stream)
+    app.router.add_get('/proxy/page', engine.handle_page)
+    app.router.add_get('/proxy/health', engine.handle_health)
+    return app
+
+
+def run_proxy_engine(authorize: Authorizer,
+                     host: str = PROXY_ENGINE_HOST, port: int = PROXY_ENGINE_PORT):
+    """Executa o motor como processo próprio (bloqueia até o encerramento)"""
+    web.run_app(create_proxy_app(authorize), host=host, port=port, access_log=None)
+
+
+def start_proxy_engine_thread(authorize: Authorizer,
+                              host: str = PROXY_ENGINE_HOST, port: int = PROXY_ENGINE_PORT) -> web.Application:
+    """
+    Executa o motor dentro do processo atual, num event loop em thread própria
+
+    Args:
+        authorize: Função que autoriza a requisição (devolve as claims do acesso)
+        host: Interface de escuta
+        port: Porta de escuta
+
+    Returns:
+        web.Application: Aplicação em execução
+    """
+    app = create_proxy_app(authorize)
+    loop = asyncio.new_event_loop()
+
+    async def serve():
+        runner = web.AppRunner(app, access_log=None, handle_signals=False)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve())
+        loop.run_forever()
+
+    threading.Thread(target=run, name='stream-proxy', daemon=True).start()
+    logging.getLogger(__name__).info(f"Proxy assíncrono escutando em {host}:{port}")
+    return app
@@ -0,0 +1,347 @@
+"""
+Streamhive Upstream Pool
+Conexões do proxy com os upstreams: pool por host, cache de DNS e descarte de conexões ociosas
+"""
+
+import os
+import queue
+import socket
+import ipaddress
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+
+# Hosts com pool mantido (o menos usado é fechado ao abrir o seguinte)
+PROXY_POOL_HOSTS = int(os.environ.get('PROXY_POOL_HOSTS', 64))
+
+# Conexões simultâneas por host (cada stream em andamento ocupa uma); acima
+# disso os pedidos esperam uma conexão livre
+PROXY_POOL_CONNECTIONS_PER_HOST = int(os.environ.get('PROXY_POOL_CONNECTIONS_PER_HOST', 128))
+
+# Espera máxima por uma conexão livre com o pool cheio (segundos)
+PROXY_POOL_WAIT_TIMEOUT = float(os.environ.get('PROXY_POOL_WAIT_TIMEOUT', 10))
+
+# Conexões paradas há mais que isso são fechadas (segundos; 0 desativa)
+PROXY_POOL_IDLE_TIMEOUT = float(os.environ.get('PROXY_POOL_IDLE_TIMEOUT', 30))
+
+# Validade dos endereços resolvidos (segundos)
+PROXY_DNS_TTL = float(os.environ.get('PROXY_DNS_TTL', 300))
+
+# Nomes mantidos no cache de DNS
+DNS_CACHE_SIZE = 256
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+class DnsCache:
+    """
+    Endereços resolvidos por (host, porta), válidos por `ttl` segundos
+
+    O pool já reaproveita conexões; o cache evita o getaddrinfo em cada
+    conexão nova (reabertas após o descarte de ociosas ou em picos).
+    """
+
+    def __init__(self, ttl: float = PROXY_DNS_TTL, max_entries: int = DNS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host: str, port: int) -> str:
+        """
+        Endereço de `host` (do cache ou resolvido agora)
+
+        Raises:
+            socket.gaierror: Nome não resolvido
+        """
+        if _is_ip(host):
+            return host
+
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, address)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return address
+
+    def forget(self, host: str, port: int):
+        """Descarta o endereço (a conexão com ele falhou)"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class _CountedConnection:
+    """Conexão que resolve o host pelo cache de DNS e conta aberturas e handshakes TLS"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            self._dns_host = upstream_pool.dns.resolve(host, self.port)
+        except socket.gaierror:
+            pass  # a conexão resolve de novo e reporta o erro do jeito do urllib3
+        try:
+            return super()._new_conn()
+        except Exception:
+            upstream_pool.dns.forget(host, self.port)
+            raise
+        finally:
+            self._dns_host = host
+
+    def connect(self):
+        super().connect()
+        upstream_pool.count('connections_opened')
+        if isinstance(self, HTTPSConnection):
+            upstream_pool.count('tls_handshakes')
+
+
+class _HTTPConnection(_CountedConnection, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CountedConnection, HTTPSConnection):
+    pass
+
+
+class _MeteredPool:
+    """Pool de um host com espera limitada, marcação de ociosidade e contagem de saturação"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        upstream_pool.track(self)
+
+    def _get_conn(self, timeout: Optional[float] = None):
+        upstream_pool.count('checkouts')
+        if self.pool is not None and self.pool.empty():
+            upstream_pool.count('saturated')  # todas as conexões do host em uso
+        try:
+            return super()._get_conn(PROXY_POOL_WAIT_TIMEOUT if timeout is None else timeout)
+        except EmptyPoolError:
+            upstream_pool.count('wait_timeouts')
+            raise
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+        super()._put_conn(conn)
+
+
+class _HTTPPool(_MeteredPool, HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSPool(_MeteredPool, HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class _UpstreamAdapter(HTTPAdapter):
+    """Adapter do requests com os pools acima"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPPool, 'https': _HTTPSPool}
+
+    def send(self, request, **kwargs):
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+
+class UpstreamPool:
+    """
+    Conexões keep-alive com os upstreams, compartilhadas por todas as threads
+
+    Cada host tem o próprio pool com no máximo PROXY_POOL_CONNECTIONS_PER_HOST
+    conexões; com todas em uso, o pedido espera uma ser devolvida em vez de
+    abrir (e depois descartar) outra, então o handshake TLS acontece uma vez
+    por conexão e não por pedido. Cada thread usa a própria requests.Session
+    (cookies e cabeçalhos não são compartilhados), todas sobre o mesmo
+    adapter. Uma thread de fundo fecha as conexões ociosas antes que o
+    upstream as derrube.
+    """
+
+    def __init__(self, hosts: int = PROXY_POOL_HOSTS,
+                 connections_per_host: int = PROXY_POOL_CONNECTIONS_PER_HOST,
+                 idle_timeout: float = PROXY_POOL_IDLE_TIMEOUT):
+        """
+        Inicializa o pool (as conexões são abertas sob demanda)
+
+        Args:
+            hosts: Hosts com pool mantido
+            connections_per_host: Conexões simultâneas por host
+            idle_timeout: Tempo parada após o qual a conexão é fechada
+        """
+        self.connections_per_host = connections_per_host
+        self.idle_timeout = idle_timeout
+        self.logger = logging.getLogger(__name__)
+        self.dns = DnsCache()
+        self.adapter = _UpstreamAdapter(pool_connections=hosts, pool_maxsize=connections_per_host,
+                                        pool_block=True)
+        self._pools: 'weakref.WeakSet[HTTPConnectionPool]' = weakref.WeakSet()
+        self._pools_lock = threading.Lock()
+        self._local = threading.local()
+        self._reaper: Optional[threading.Thread] = None
+        self._counters_lock = threading.Lock()
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.saturated = 0
+        self.wait_timeouts = 0
+        self.idle_closed = 0
+
+    def session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """
+        Sessão da thread atual sobre os pools compartilhados
+
+        Args:
+            headers: Cabeçalhos padrão aplicados quando a sessão é criada
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            if headers:
+                session.headers.update(headers)
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+            self._start_reaper()
+        return session
+
+    def count(self, counter: str, amount: int = 1):
+        """
+        Incrementa um contador (chamado de várias threads ao mesmo tempo)
+
+        Args:
+            counter: Nome do atributo do contador
+            amount: Valor somado
+        """
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def track(self, pool: HTTPConnectionPool):
+        """Registra o pool de um host (chamado pelo próprio pool)"""
+        with self._pools_lock:
+            self._pools.add(pool)
+
+    def close_idle(self, now: Optional[float] = None) -> int:
+        """
+        Fecha as conexões paradas há mais de `idle_timeout`
+
+        Returns:
+            int: Conexões fechadas
+        """
+        now = time.monotonic() if now is None else now
+        with self._pools_lock:
+            pools = list(self._pools)
+
+        closed = 0
+        for pool in pools:
+            slots = pool.pool
+            if slots is None:
+                continue
+
+            # A fila é LIFO: retirar tudo e devolver na mesma ordem
+            taken = []
+            while True:
+                try:
+                    taken.append(slots.get(block=False))
+                except queue.Empty:
+                    break
+
+            for conn in reversed(taken):
+                if conn is not None and now - getattr(conn, 'idle_since', now) >= self.idle_timeout:
+                    conn.close()
+                    conn = None  # a vaga continua no pool; reabre sob demanda
+                    closed += 1
+                if pool.pool is None:
+                    if conn is not None:
+                        conn.close()  # pool fechado no meio
+                    continue
+                slots.put(conn, block=False)
+
+        self.count('idle_closed', closed)
+        return closed
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso dos pools, aberturas de conexão, handshakes e saturação"""
+        with self._pools_lock:
+            pools = [pool for pool in self._pools if pool.pool is not None]
+
+        in_use = idle = 0
+        for pool in pools:
+            free = pool.pool.qsize()
+            in_use += self.connections_per_host - free
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._counters_lock:
+            return {
+                'hosts': len(pools),
+                'in_use': in_use,
+                'idle': idle,
+                'checkouts': self.checkouts,
+                'connections_opened': self.connections_opened,
+                'tls_handshakes': self.tls_handshakes,
+                'saturated': self.saturated,
+                'wait_timeouts': self.wait_timeouts,
+                'idle_closed': self.idle_closed,
+                'dns': self.dns.stats()
+            }
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+        with self._pools_lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name='upstream-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.idle_timeout / 2)
+            try:
+                self.close_idle()
+            except Exception as e:
+                self.logger.error(f"Erro ao fechar conexões ociosas do upstream: {e}")
+
+
+# Pool do processo, usado pelo proxy síncrono
+upstream_pool = UpstreamPool()
@@ -12,12 +12,17 @@ class Chat {
             showTimestamps: true,
             allowEmojis: true,
             maxMessageLength: 500,
+            // async (beforeId) => ({ messages, has_more }) para carregar mensagens antigas
+            fetchHistory: null,
             ...options
         };
 
         this.messages = [];
         this.isAtBottom = true;
         this.currentUser = null;
+        this.hasMoreHistory = true;
+        this.loadingHistory = false;
+        this.oldestMessageId = null;
         
         this.eventHandlers = {
             'message_sent': [],
@@ -218,6 +223,9 @@ class Chat {
         
         // Adicionar à lista
         this.messages.push(messageData);
+        if (this.oldestMessageId === null) {
+            this.oldestMessageId = id;
+        }
         
         // Manter limite de mensagens
         if (this.messages.length > this.options.maxMessages) {
@@ -237,7 +245,7 @@ class Chat {
         this.emit('message_received', messageData);
     }
 
-    renderMessage(messageData) {
+    renderMessage(messageData, prepend = false) {
         const { id, user_id, username, message, timestamp, formatted_time } = messageData;
         const isOwnMessage = this.currentUser && user_id === this.currentUser.id;
         
@@ -259,6 +267,14 @@ class Chat {
             </div>
         `;
         
+        if (prepend) {
+            // Mensagens antigas entram logo após a mensagem de boas-vindas, sem animação
+            const welcomeMessage = this.elements.messages.querySelector('.welcome-message');
+            const firstMessage = welcomeMessage ? welcomeMessage.nextSibling : this.elements.messages.firstChild;
+            this.elements.messages.insertBefore(messageElement, firstMessage);
+            return;
+        }
+        
         // Adicionar animação de entrada
         messageElement.style.opacity = '0';
         messageElement.style.transform = 'translateY(20px)';
@@ -291,6 +307,8 @@ class Chat {
 
     loadMessages(messages) {
         this.clearMessages(false);
+        this.hasMoreHistory = true;
+        this.oldestMessageId = messages.length ? messages[0].id : null;
         
         messages.forEach(messageData => {
             this.messages.push(messageData);
@@ -300,6 +318,41 @@ class Chat {
         this.scrollToBottom();
     }
 
+    async loadOlderMessages() {
+        if (!this.options.fetchHistory || this.loadingHistory || !this.hasMoreHistory) {
+            return;
+        }
+
+        const beforeId = this.oldestMessageId;
+        if (beforeId !== null && !Number.isInteger(beforeId)) {
+            // Mensagens anteriores ao histórico persistente não têm cursor
+            this.hasMoreHistory = false;
+            return;
+        }
+
+        this.loadingHistory = true;
+        try {
+            const { messages = [], has_more = false } = await this.options.fetchHistory(beforeId);
+            const container = this.elements.messages;
+            const previousHeight = container.scrollHeight;
+
+            // Inserir da mais nova para a mais antiga, mantendo a ordem cronológica
+            [...messages].reverse().forEach(messageData => this.renderMessage(messageData, true));
+            this.messages = [...messages, ...this.messages];
+            this.hasMoreHistory = has_more;
+            if (messages.length) {
+                this.oldestMessageId = messages[0].id;
+            }
+
+            // Manter a posição de leitura após inserir conteúdo acima
+            container.scrollTop += container.scrollHeight - previousHeight;
+        } catch (error) {
+            console.error('Erro ao carregar mensagens antigas:', error);
+        } finally {
+            this.loadingHistory = false;
+        }
+    }
+
     clearMessages(showConfirm = true) {
         if (showConfirm && !confirm('Tem certeza que deseja limpar o chat?')) {
             return false;
@@ -331,6 +384,11 @@ class Chat {
         if (this.isAtBottom) {
             this.hideScrollIndicator();
         }
+
+        // Próximo do topo: carregar a página anterior do histórico
+        if (messages.scrollTop <= threshold) {
+            this.loadOlderMessages();
+        }
     }
 
     scrollToBottom() {
@@ -124,7 +124,11 @@ class NetflixWebView {
         
         const netflixUrl = 'https://www.netflix.com';
         // ✅ CORREÇÃO: Carregar a URL através do nosso proxy
-        const proxyUrl = `/proxy/page?url=${encodeURIComponent(netflixUrl)}`;
+        const proxy = this.options.proxy || {};
+        let proxyUrl = `${proxy.base_url || ''}/proxy/page?url=${encodeURIComponent(netflixUrl)}`;
+        if (proxy.page_token) {
+            proxyUrl += `&token=${encodeURIComponent(proxy.page_token)}`;
+        }
 
         this.webview.src = proxyUrl;
         
@@ -365,7 +365,8 @@ class VideoPlayer {
         // Inicializar Netflix WebView
         this.netflixWebView = new NetflixWebView(netflixContainer, {
             allowOwnerInteraction: this.isOwner,
-            showControls: this.isOwner
+            showControls: this.isOwner,
+            proxy: this.options.proxy
         });
         
         // Configurar eventos
@@ -498,10 +499,14 @@ class VideoPlayer {
     }
 
     async loadHLSVideo(url) {
+        // Pelo proxy, a playlist volta reescrita e os segmentos seguintes já vêm pré-buscados
+        const useProxy = Boolean(this.options.proxy && this.options.proxy.hls);
+        const source = useProxy ? this.proxyUrl(url) : url;
+
         // Verificar se HLS.js é necessário
         if (this.video.canPlayType('application/vnd.apple.mpegurl')) {
             // Safari nativo
-            return this.loadDirectVideo(url);
+            return this.loadDirectVideo(source, useProxy);
         }
 
         // Carregar HLS.js se não estiver carregado
@@ -516,7 +521,7 @@ class VideoPlayer {
             });
 
             return new Promise((resolve, reject) => {
-                this.hlsPlayer.loadSource(url);
+                this.hlsPlayer.loadSource(source);
                 this.hlsPlayer.attachMedia(this.video);
 
                 this.hlsPlayer.on(Hls.Events.MANIFEST_PARSED, () => {
@@ -537,13 +542,23 @@ class VideoPlayer {
         }
     }
 
-    async loadDirectVideo(url) {
+    proxyUrl(url) {
+        // Proxy de mídia (pode ser um serviço separado) com o token emitido pela sala
+        const proxy = this.options.proxy || {};
+        let proxied = `${proxy.base_url || ''}/proxy/stream?url=${encodeURIComponent(url)}`;
+        if (proxy.stream_token) {
+            proxied += `&token=${encodeURIComponent(proxy.stream_token)}`;
+        }
+        return proxied;
+    }
+
+    async loadDirectVideo(url, proxied = false) {
         // Determinar URL final
         let finalUrl = url;
         
         // Se for HTTP, usar proxy
-        if (url.startsWith('http://')) {
-            finalUrl = `/proxy/stream?url=${encodeURIComponent(url)}`;
+        if (!proxied && url.startsWith('http://')) {
+            finalUrl = this.proxyUrl(url);
             console.log('🔒 Usando proxy para URL HTTP');
         }
         
@@ -811,7 +826,7 @@ class VideoPlayer {
             
             switch (action) {
                 case 'play':
-                    const now = Date.now() / 1000;
+                    const now = data.server_now || Date.now() / 1000;
                     const latency = now - timestamp;
                     const adjustedTime = current_time + latency;
                     
@@ -845,6 +860,56 @@ class VideoPlayer {
         }
     }
 
+    /**
+     * Corrige a deriva em relação ao relógio do servidor.
+     * Pequenas diferenças são compensadas ajustando a velocidade de reprodução;
+     * apenas diferenças grandes recorrem a um seek.
+     */
+    correctDrift(expectedTime, isPlaying, config = {}) {
+        if (this.isNetflixMode || !this.videoType || this.isSyncing) {
+            return;
+        }
+
+        const tolerance = config.tolerance || 0.1;
+        const hardSeekThreshold = config.hard_seek_threshold || 2;
+        const baseRate = parseFloat(this.controls.rateSelect.value) || 1;
+        const drift = this.getCurrentTime() - expectedTime;
+
+        if (!isPlaying) {
+            if (!this.getPaused() || Math.abs(drift) > tolerance) {
+                this.sync({ action: 'pause', current_time: expectedTime });
+            }
+            return;
+        }
+
+        if (this.getPaused()) {
+            this.sync({ action: 'seek', time: expectedTime });
+            this.play();
+            return;
+        }
+
+        // YouTube só aceita velocidades discretas, então corrige apenas com seek
+        const canNudge = this.videoType !== 'youtube';
+
+        if (Math.abs(drift) > hardSeekThreshold || (!canNudge && Math.abs(drift) > hardSeekThreshold / 2)) {
+            this.sync({ action: 'seek', time: expectedTime });
+            this.setNudgeRate(baseRate);
+        } else if (canNudge && Math.abs(drift) > tolerance) {
+            // Adiantado desacelera, atrasado acelera; no máximo ±5%
+            const nudge = Math.max(-0.05, Math.min(0.05, drift * 0.1));
+            this.setNudgeRate(baseRate * (1 - nudge));
+        } else if (canNudge) {
+            this.setNudgeRate(baseRate);
+        }
+    }
+
+    setNudgeRate(rate) {
+        // Não altera o seletor de velocidade: o ajuste é invisível ao usuário
+        if (this.video && Math.abs(this.video.playbackRate - rate) > 0.001) {
+            this.video.playbackRate = rate;
+        }
+    }
+
     // UI helpers
     showLoadingIndicator() {
         if (this.loadingIndicator) {
@@ -22,6 +22,9 @@ class RoomPage {
         this.chat = null;
         
         this.participants = {};
+        this.participantsCount = 0;
+        // Falso quando o servidor envia apenas a contagem (salas grandes)
+        this.rosterComplete = true;
         this.isConnected = false;
         this.isVideoLoaded = false;
         this.isChatOpen = false;
@@ -43,14 +46,15 @@ class RoomPage {
 
     setupComponents() {
 
-        this.socketClient = new SocketClient();
+        this.socketClient = new SocketClient({ wireFormat: 'compact' });
         this.setupSocketEvents();
         
 
         this.videoPlayer = new VideoPlayer('#videoPlayerContainer', {
             controls: true,
             autoplay: false,
-            muted: false
+            muted: false,
+            proxy: this.roomData.proxy
         });
         this.setupVideoEvents();
         
@@ -58,7 +62,11 @@ class RoomPage {
             maxMessages: 100,
             autoScroll: true,
             showTimestamps: true,
-            maxMessageLength: 500
+            maxMessageLength: 500,
+            fetchHistory: (before) => StreamhiveApp.api.get(`/api/rooms/${this.roomData.id}/messages`, {
+                before,
+                limit: 50
+            })
         });
         this.setupChatEvents();
         
@@ -86,8 +94,16 @@ class RoomPage {
             this.handleRoomJoined(data);
         });
 
+        this.socketClient.on('room_resynced', (data) => {
+            this.handleRoomResynced(data);
+        });
+
         this.socketClient.on('video_sync', (data) => {
-            this.videoPlayer.sync(data);
+            this.videoPlayer.sync({ ...data, server_now: this.socketClient.serverNow() });
+        });
+
+        this.socketClient.on('sync_heartbeat', (data) => {
+            this.handleSyncHeartbeat(data);
         });
 
         this.socketClient.on('new_message', (data) => {
@@ -98,25 +114,12 @@ class RoomPage {
             }
         });
 
-        this.socketClient.on('user_joined', (data) => {
-            this.addParticipant(data);
-            this.updateParticipantsCount();
+        this.socketClient.on('roster_diff', (data) => {
+            this.applyRosterDiff(data);
         });
 
-        this.socketClient.on('user_left', (data) => {
-            this.removeParticipant(data.user_id);
-            this.updateParticipantsCount();
-        });
-
-        this.socketClient.on('user_kicked', (data) => {
-            this.removeParticipant(data.user_id);
-            this.updateParticipantsCount();
-            
-            if (data.user_id === this.currentUser.id) {
-                setTimeout(() => {
-                    window.location.href = '/dashboard';
-                }, 2000);
-            }
+        this.socketClient.on('roster_page', (data) => {
+            this.applyRosterPage(data);
         });
 
         this.socketClient.on('room_deleted', (data) => {
@@ -128,6 +131,10 @@ class RoomPage {
     }
 
     openParticipantsModal() {
+        if (!this.rosterComplete) {
+            this.participants = {};
+            this.socketClient.requestRoster(this.roomData.id, 0);
+        }
         StreamhiveApp.modal.open('participantsModal');
     }
 
@@ -355,12 +362,30 @@ class RoomPage {
         }
 
         this.participants = data.participants || {};
+        this.participantsCount = data.participants_count || Object.keys(this.participants).length;
+        this.rosterComplete = Boolean(data.participants);
         this.updateParticipantsList();
         this.updateParticipantsCount();
 
         if (data.chat_messages) {
             this.chat.loadMessages(data.chat_messages);
         }
+        this.syncPlayback(data);
+    }
+
+    handleRoomResynced(data) {
+        // Participantes e chat já foram atualizados pelos eventos reaplicados
+        this.isConnected = true;
+        this.updateConnectionStatus('Conectado', true);
+        this.syncPlayback(data);
+    }
+
+    syncPlayback(data) {
+        // Estado atual da navegação Netflix para quem entra ou reconecta
+        if (data.netflix && !this.roomData.isOwner) {
+            this.videoPlayer.syncNetflix(data.netflix);
+        }
+
         if (data.is_playing || data.current_time > 0) {
             const syncVideo = () => {
                 if (this.isVideoLoaded) {
@@ -368,7 +393,8 @@ class RoomPage {
                         action: data.is_playing ? 'play' : 'pause',
                         current_time: data.current_time,
                         is_playing: data.is_playing,
-                        timestamp: data.timestamp
+                        timestamp: data.timestamp,
+                        server_now: this.socketClient.serverNow()
                     });
                 } else {
                     setTimeout(syncVideo, 100);
@@ -378,20 +404,91 @@ class RoomPage {
             setTimeout(syncVideo, 200);
         }
     }
-    addParticipant(data) {
-        this.participants[data.user_id] = {
-            username: data.username,
-            role: data.role,
-            joined_at: Date.now() / 1000
-        };
+    handleSyncHeartbeat(data) {
+        // O dono é a fonte das ações; apenas os espectadores seguem o relógio
+        if (this.roomData.isOwner || !this.isVideoLoaded) {
+            return;
+        }
+
+        const isPlaying = data.p === 1;
+        const elapsed = isPlaying ? Math.max(0, this.socketClient.serverNow() - data.s) : 0;
+
+        this.videoPlayer.correctDrift(data.t + elapsed, isPlaying, this.socketClient.syncConfig);
+    }
+
+    applyRosterDiff(data) {
+        const kicked = data.kicked || [];
+
+        if (!data.replay) {
+            this.notifyRosterChanges(data, kicked);
+        }
+
+        this.participantsCount = data.count;
+
+        if (!('added' in data)) {
+            // Sala grande: apenas a contagem é difundida
+            this.rosterComplete = false;
+        } else if (!this.rosterComplete) {
+            // Voltou ao modo completo depois de um período só com contagem
+            this.participants = {};
+            this.socketClient.requestRoster(this.roomData.id, 0);
+        } else {
+            data.added.forEach((member) => this.addParticipant(member));
+            (data.removed || []).forEach((userId) => this.removeParticipant(userId));
+        }
+
         this.updateParticipantsList();
+        this.updateParticipantsCount();
     }
 
-    removeParticipant(userId) {
-        if (this.participants[userId]) {
-            delete this.participants[userId];
-            this.updateParticipantsList();
+    applyRosterPage(data) {
+        (data.members || []).forEach((member) => this.addParticipant(member));
+
+        const loaded = data.offset + (data.members || []).length;
+        if (data.members && data.members.length && loaded < data.total) {
+            this.socketClient.requestRoster(this.roomData.id, loaded);
+        } else {
+            this.rosterComplete = true;
         }
+
+        this.participantsCount = data.total;
+        this.updateParticipantsList();
+        this.updateParticipantsCount();
+    }
+
+    notifyRosterChanges(data, kicked) {
+        const added = data.added || [];
+        const removed = (data.removed || []).filter((userId) => !kicked.includes(userId));
+
+        kicked.forEach((userId) => {
+            const participant = this.participants[userId];
+            const name = participant ? participant.username : 'Um participante';
+            StreamhiveApp.toast.show(`${name} foi removido da sala`, 'warning');
+        });
+
+        if (added.length === 1) {
+            StreamhiveApp.toast.show(`${added[0].username} entrou na sala`, 'info');
+        } else if (added.length > 1) {
+            StreamhiveApp.toast.show(`${added.length} pessoas entraram na sala`, 'info');
+        }
+
+        if (removed.length === 1 && this.participants[removed[0]]) {
+            StreamhiveApp.toast.show(`${this.participants[removed[0]].username} saiu da sala`, 'info');
+        } else if (removed.length > 1) {
+            StreamhiveApp.toast.show(`${removed.length} pessoas saíram da sala`, 'info');
+        }
+    }
+
+    addParticipant(member) {
+        this.participants[member.user_id] = {
+            username: member.username,
+            role: member.role,
+            joined_at: member.joined_at || Date.now() / 1000
+        };
+    }
+
+    removeParticipant(userId) {
+        delete this.participants[userId];
     }
 
     updateParticipantsList() {
@@ -426,7 +523,7 @@ class RoomPage {
 
 
     updateParticipantsCount() {
-        const count = Object.keys(this.participants).length;
+        const count = this.participantsCount;
         if (this.elements.participantsCountBadge) {
             this.elements.participantsCountBadge.textContent = count;
         }
@@ -607,7 +704,7 @@ class RoomPage {
     }
 
     get participantCount() {
-        return Object.keys(this.participants).length;
+        return this.participantsCount;
     }
 }
 
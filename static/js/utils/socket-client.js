@@ -3,27 +3,154 @@
  * Gerenciamento de conexões WebSocket
  */
 
+/**
+ * Schema do formato compacto (espelha utils/wire_format.py).
+ * Chave longa -> chave curta, ou [chave curta, tipo aninhado].
+ */
+const WIRE_MESSAGE_SCHEMA = { id: 'i', user_id: 'u', username: 'n', message: 'm', timestamp: 's', v: 'v' };
+
+const WIRE_SCHEMAS = {
+    video_sync: { action: 'a', current_time: 't', is_playing: 'p', time: 'k', timestamp: 's', v: 'v' },
+    new_message: WIRE_MESSAGE_SCHEMA,
+    netflix_sync: { url: 'u', timestamp: 's', v: 'v' },
+    roster_diff: {
+        added: ['A', '[member]'], removed: 'D', kicked: 'K', count: 'c', roster_version: 'R', v: 'v'
+    },
+    roster_page: { members: ['L', '[member]'], offset: 'f', total: 'c', roster_version: 'R' },
+    room_state: {
+        video_url: 'U', current_time: 't', is_playing: 'p', netflix: 'N',
+        participants: ['P', '{participant}'], participants_count: 'c', roster_version: 'R',
+        chat_messages: ['M', '[new_message]'],
+        user_role: 'r', room_owner_id: 'o', version: 'v', epoch: 'e', timestamp: 's'
+    },
+    room_resync: {
+        events: ['E', '[event]'], version: 'v', epoch: 'e', current_time: 't',
+        is_playing: 'p', netflix: 'N', user_role: 'r', room_owner_id: 'o', timestamp: 's'
+    },
+    participant: { username: 'n', role: 'r', joined_at: 'j' },
+    member: { user_id: 'u', username: 'n', role: 'r', joined_at: 'j' }
+};
+
+const WIRE_BOOLEAN_KEYS = new Set(['is_playing']);
+
+// Índices invertidos (chave curta -> [chave longa, tipo aninhado])
+const WIRE_DECODERS = Object.fromEntries(
+    Object.entries(WIRE_SCHEMAS).map(([event, schema]) => [
+        event,
+        Object.fromEntries(Object.entries(schema).map(([longKey, spec]) => (
+            Array.isArray(spec) ? [spec[0], [longKey, spec[1]]] : [spec, [longKey, null]]
+        )))
+    ])
+);
+
+function decodeWirePayload(event, payload) {
+    const decoder = WIRE_DECODERS[event];
+    if (!decoder || !payload || typeof payload !== 'object') {
+        return payload;
+    }
+
+    const decoded = {};
+    Object.entries(payload).forEach(([shortKey, value]) => {
+        const [longKey, kind] = decoder[shortKey] || [shortKey, null];
+
+        if (kind) {
+            decoded[longKey] = decodeWireNested(kind, value);
+        } else {
+            decoded[longKey] = WIRE_BOOLEAN_KEYS.has(longKey) ? Boolean(value) : value;
+        }
+    });
+
+    // Campos omitidos no fio e derivados localmente
+    if (event === 'new_message' && typeof decoded.timestamp === 'number') {
+        const date = new Date(decoded.timestamp * 1000);
+        decoded.formatted_time = `${String(date.getHours()).padStart(2, '0')}:${String(date.getMinutes()).padStart(2, '0')}`;
+    }
+    if (event === 'video_sync' && !('time' in decoded)) {
+        decoded.time = null;
+    }
+
+    return decoded;
+}
+
+// Listas pré-serializadas pelo servidor chegam como anexo binário (JSON em UTF-8)
+const wireTextDecoder = new TextDecoder();
+
+function parseWireJson(value) {
+    if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+        return JSON.parse(wireTextDecoder.decode(value));
+    }
+    return value;
+}
+
+function decodeWireNested(kind, value) {
+    const name = kind.slice(1, -1);
+    value = parseWireJson(value);
+
+    if (kind.startsWith('[')) {
+        if (name === 'event') {
+            return (value || []).map(({ v, e, d }) => ({ v, e, d: decodeWirePayload(e, d) }));
+        }
+        return (value || []).map((item) => decodeWirePayload(name, item));
+    }
+
+    return Object.fromEntries(
+        Object.entries(value || {}).map(([key, item]) => [key, decodeWirePayload(name, item)])
+    );
+}
+
+
 class SocketClient {
-    constructor() {
+    constructor(options = {}) {
         this.socket = null;
         this.isConnected = false;
         this.currentRoom = null;
         this.userRole = null;
         this.reconnectAttempts = 0;
+
+        // Estado versionado da sala para ressincronização incremental
+        this.roomId = null;
+        this.roomVersion = null;
+        this.roomEpoch = null;
+        this.roomSynced = false;
+        this.pendingEvents = [];
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
+        this.maxReconnectDelay = 30000;
+        this.joinRetryTimer = null;
+
+        // Formato de fio pedido ao servidor ('json' ou 'compact')
+        this.requestedWire = options.wireFormat || 'json';
+        this.wireFormat = 'json';
+
+        // Estimativa de offset do relógio do servidor (estilo NTP)
+        this.clockOffset = 0;
+        this.clockRtt = null;
+        this.clockSamples = [];
+        this.maxClockSamples = 8;
+        this.clockSyncTimer = null;
+        this.clockSyncInterval = 30000;
+        this.syncConfig = {
+            tolerance: 0.1,
+            hard_seek_threshold: 2,
+            heartbeat_interval: 2
+        };
         
         this.eventHandlers = {
             'connected': [],
             'disconnected': [],
             'room_joined': [],
+            'room_resynced': [],
             'room_left': [],
             'video_sync': [],
+            'sync_heartbeat': [],
             'new_message': [],
-            'user_joined': [],
-            'user_left': [],
-            'user_kicked': [],
+            'netflix_sync': [],
+            'roster_diff': [],
+            'roster_page': [],
             'room_deleted': [],
+            'kicked': [],
+            'rate_limited': [],
+            'join_deferred': [],
             'error': []
         };
     }
@@ -38,7 +165,8 @@ class SocketClient {
             this.socket = io({
                 transports: ['websocket', 'polling'],
                 timeout: 20000,
-                forceNew: true
+                forceNew: true,
+                auth: { wire: this.requestedWire }
             });
 
             this.setupEventListeners();
@@ -50,6 +178,9 @@ class SocketClient {
     }
 
     setupEventListeners() {
+        this.batchHandlers = {};
+        this.socket.on('batch', (frame) => this.handleBatch(frame));
+
         this.socket.on('connect', () => {
             this.isConnected = true;
             this.reconnectAttempts = 0;
@@ -57,12 +188,28 @@ class SocketClient {
         });
 
         this.socket.on('connected', (data) => {
+            this.wireFormat = data.wire || 'json';
+            if (data.sync) {
+                this.syncConfig = { ...this.syncConfig, ...data.sync };
+            }
+            this.startClockSync();
             StreamhiveApp.toast.show(`Conectado como ${data.username}`, 'success');
         });
 
+        this.socket.on('clock_pong', (data) => {
+            this.handleClockPong(data);
+        });
+
+        this.socket.on('sync_heartbeat', (data) => {
+            this.emit('sync_heartbeat', data);
+        });
+
         this.socket.on('disconnect', (reason) => {
             console.log('❌ Socket desconectado:', reason);
             this.isConnected = false;
+            this.roomSynced = false;
+            this.pendingEvents = [];
+            this.stopClockSync();
             
             if (reason === 'io server disconnect') {
                 StreamhiveApp.toast.show('Desconectado do servidor', 'warning');
@@ -73,33 +220,39 @@ class SocketClient {
             this.emit('disconnected', { reason });
         });
 
-        this.socket.on('room_state', (data) => {
+        this.listen('room_state', (data) => {
+            // O histórico do chat chega como array JSON pré-serializado
+            data.chat_messages = parseWireJson(data.chat_messages);
             this.currentRoom = data;
             this.userRole = data.user_role;
+            this.roomVersion = data.version;
+            this.roomEpoch = data.epoch;
             this.emit('room_joined', data);
+            this.flushPendingEvents();
         });
 
-        this.socket.on('video_sync', (data) => {
-            this.emit('video_sync', data);
-        });
+        this.listen('room_resync', (data) => {
+            this.userRole = data.user_role;
+            this.roomEpoch = data.epoch;
+            if (this.currentRoom) {
+                this.currentRoom.current_time = data.current_time;
+                this.currentRoom.is_playing = data.is_playing;
+            }
 
-        this.socket.on('new_message', (data) => {
-            this.emit('new_message', data);
-        });
+            (data.events || []).forEach(({ e, d }) => this.handleRoomEvent(e, d, true));
+            this.roomVersion = data.version;
 
-        this.socket.on('user_joined', (data) => {
-            StreamhiveApp.toast.show(`${data.username} entrou na sala`, 'info');
-            this.emit('user_joined', data);
+            this.emit('room_resynced', data);
+            this.flushPendingEvents();
         });
 
-        this.socket.on('user_left', (data) => {
-            StreamhiveApp.toast.show(`${data.username} saiu da sala`, 'info');
-            this.emit('user_left', data);
+        // Eventos versionados: aplicados em ordem e sem duplicatas
+        ['video_sync', 'new_message', 'netflix_sync', 'roster_diff'].forEach((event) => {
+            this.listen(event, (data) => this.handleRoomEvent(event, data));
         });
 
-        this.socket.on('user_kicked', (data) => {
-            StreamhiveApp.toast.show(data.message, 'warning');
-            this.emit('user_kicked', data);
+        this.listen('roster_page', (data) => {
+            this.emit('roster_page', data);
         });
 
         this.socket.on('room_deleted', (data) => {
@@ -111,6 +264,40 @@ class SocketClient {
             }, 3000);
         });
 
+        this.socket.on('kicked', (data) => {
+            StreamhiveApp.toast.show(data.message, 'error');
+            this.roomId = null;
+            this.roomVersion = null;
+            this.roomEpoch = null;
+            this.emit('kicked', data);
+
+            setTimeout(() => {
+                window.location.href = data.redirect;
+            }, 2000);
+        });
+
+        this.socket.on('rate_limited', (data) => {
+            if (data.event === 'chat_message') {
+                StreamhiveApp.toast.show('Você está enviando mensagens rápido demais', 'warning');
+            } else if (data.event === 'join_room') {
+                this.scheduleJoinRetry(this.roomId, data.retry_after);
+            }
+            this.emit('rate_limited', data);
+        });
+
+        // Servidor sobrecarregado (ex.: rajada de reconexões): tentar entrar de novo mais tarde
+        this.socket.on('join_deferred', (data) => {
+            this.scheduleJoinRetry(data.room_id ?? this.roomId, data.retry_after);
+            this.emit('join_deferred', data);
+        });
+
+        // Conexão lenta que perdeu eventos da sala: ressincronizar a partir da última versão
+        this.socket.on('resync_required', () => {
+            if (this.roomId !== null) {
+                this.joinRoom(this.roomId);
+            }
+        });
+
         this.socket.on('error', (data) => {
             StreamhiveApp.toast.show(data.message || 'Erro de conexão', 'error');
             this.emit('error', data);
@@ -118,21 +305,131 @@ class SocketClient {
 
         this.socket.on('connect_error', (error) => {
             console.error('❌ Erro de conexão:', error);
-            this.handleConnectionError();
+            // Conexão recusada por sobrecarga traz a espera sugerida pelo servidor
+            this.handleConnectionError(error && error.data ? error.data.retry_after : null);
+        });
+    }
+
+    listen(event, handler) {
+        // Decodifica o formato compacto antes de repassar o evento
+        const decodeAndHandle = (data) => {
+            handler(this.wireFormat === 'compact' ? decodeWirePayload(event, data) : data);
+        };
+        this.batchHandlers[event] = decodeAndHandle;
+        this.socket.on(event, decodeAndHandle);
+    }
+
+    handleBatch(frame) {
+        // Frame agrupado pelo servidor: [[evento, payload], ...] em ordem
+        (frame || []).forEach(([event, data]) => {
+            const handler = this.batchHandlers[event];
+            if (handler) {
+                handler(data);
+            }
         });
     }
 
-    handleReconnection() {
-        if (this.reconnectAttempts >= this.maxReconnectAttempts) {
+    handleRoomEvent(event, data, replay = false) {
+        // Eventos que chegam antes do estado inicial aguardam o snapshot
+        if (!this.roomSynced && !replay) {
+            this.pendingEvents.push({ e: event, d: data });
+            return;
+        }
+
+        if (typeof data.v === 'number') {
+            if (this.roomVersion !== null && data.v <= this.roomVersion) {
+                return;
+            }
+            this.roomVersion = data.v;
+        }
+
+        this.emit(event, replay ? { ...data, replay: true } : data);
+    }
+
+    flushPendingEvents() {
+        this.roomSynced = true;
+        const pending = this.pendingEvents;
+        this.pendingEvents = [];
+        pending.forEach(({ e, d }) => this.handleRoomEvent(e, d));
+    }
+
+    startClockSync() {
+        this.stopClockSync();
+        this.clockSamples = [];
+
+        // Rajada inicial para convergir rápido, depois pings esparsos
+        for (let i = 0; i < 5; i++) {
+            setTimeout(() => this.sendClockPing(), i * 200);
+        }
+        this.clockSyncTimer = setInterval(() => this.sendClockPing(), this.clockSyncInterval);
+    }
+
+    stopClockSync() {
+        if (this.clockSyncTimer) {
+            clearInterval(this.clockSyncTimer);
+            this.clockSyncTimer = null;
+        }
+    }
+
+    sendClockPing() {
+        if (this.socket && this.isConnected) {
+            this.socket.emit('clock_ping', { c: Date.now() / 1000 });
+        }
+    }
+
+    handleClockPong(data) {
+        if (!data || typeof data.c !== 'number' || typeof data.s !== 'number') {
+            return;
+        }
+
+        const received = Date.now() / 1000;
+        const rtt = received - data.c;
+        // Assume trajeto simétrico: o servidor respondeu no meio do RTT
+        const offset = data.s - (data.c + rtt / 2);
+
+        this.clockSamples.push({ rtt, offset });
+        if (this.clockSamples.length > this.maxClockSamples) {
+            this.clockSamples.shift();
+        }
+
+        // A amostra de menor RTT é a que tem menor erro de assimetria
+        const best = this.clockSamples.reduce((a, b) => (b.rtt < a.rtt ? b : a));
+        this.clockOffset = best.offset;
+        this.clockRtt = best.rtt;
+    }
+
+    serverNow() {
+        return Date.now() / 1000 + this.clockOffset;
+    }
+
+    backoffDelay(retryAfter = null) {
+        // Espera sugerida pelo servidor com jitter de ±20% (o servidor já
+        // escalona os horários de retorno); sem sugestão, exponencial com
+        // jitter completo, para que os clientes de um worker reiniciado
+        // não voltem todos no mesmo instante.
+        if (typeof retryAfter === 'number' && retryAfter > 0) {
+            return retryAfter * 1000 * (0.8 + Math.random() * 0.4);
+        }
+
+        const ceiling = Math.min(this.maxReconnectDelay, this.reconnectDelay * 2 ** this.reconnectAttempts);
+        return Math.random() * ceiling;
+    }
+
+    handleReconnection(retryAfter = null) {
+        // Recusa por sobrecarga não conta como falha: o servidor está de pé
+        const hinted = typeof retryAfter === 'number' && retryAfter > 0;
+
+        if (!hinted && this.reconnectAttempts >= this.maxReconnectAttempts) {
             console.log('❌ Máximo de tentativas de reconexão atingido');
             StreamhiveApp.toast.show('Falha na reconexão. Recarregue a página.', 'error');
             return;
         }
 
-        this.reconnectAttempts++;
-        const delay = this.reconnectDelay * this.reconnectAttempts;
-    
-        
+        const delay = this.backoffDelay(retryAfter);
+        if (!hinted) {
+            this.reconnectAttempts++;
+        }
+
         setTimeout(() => {
             if (!this.isConnected) {
                 this.connect();
@@ -140,21 +437,50 @@ class SocketClient {
         }, delay);
     }
 
-    handleConnectionError() {
+    handleConnectionError(retryAfter = null) {
         console.error('❌ Erro de conexão do socket');
         this.isConnected = false;
         
-        if (this.reconnectAttempts < this.maxReconnectAttempts) {
-            this.handleReconnection();
+        if (retryAfter || this.reconnectAttempts < this.maxReconnectAttempts) {
+            this.handleReconnection(retryAfter);
         }
     }
 
+    scheduleJoinRetry(roomId, retryAfter) {
+        if (roomId === null || roomId === undefined) {
+            return;
+        }
+
+        clearTimeout(this.joinRetryTimer);
+        this.joinRetryTimer = setTimeout(() => {
+            this.joinRetryTimer = null;
+            if (this.isConnected && this.roomId === roomId) {
+                this.joinRoom(roomId);
+            }
+        }, this.backoffDelay(retryAfter));
+    }
+
     joinRoom(roomId) {
         if (!this.isConnected) {
             console.warn('Socket não conectado');
             return false;
         }
-        this.socket.emit('join_room', { room_id: roomId });
+
+        const payload = { room_id: roomId };
+
+        // Reconexão na mesma sala: pedir apenas os eventos perdidos
+        if (this.roomId === roomId && this.roomEpoch && this.roomVersion !== null) {
+            payload.since_version = this.roomVersion;
+            payload.epoch = this.roomEpoch;
+        } else {
+            this.roomVersion = null;
+            this.roomEpoch = null;
+        }
+
+        this.roomId = roomId;
+        this.roomSynced = false;
+        this.pendingEvents = [];
+        this.socket.emit('join_room', payload);
         return true;
     }
 
@@ -165,14 +491,18 @@ class SocketClient {
         this.socket.emit('leave_room', { room_id: roomId });
         this.currentRoom = null;
         this.userRole = null;
+        this.roomId = null;
+        this.roomVersion = null;
+        this.roomEpoch = null;
         return true;
     }
 
     sendNetflixSync(roomId, data) {
-        if (this.connected && this.socket) {
+        if (this.isConnected && this.socket) {
+            // Apenas a URL; o servidor valida e descarta o resto
             this.socket.emit('netflix_sync', {
                 room_id: roomId,
-                ...data
+                url: data.url
             });
             return true;
         }
@@ -215,6 +545,19 @@ class SocketClient {
         return true;
     }
 
+    requestRoster(roomId, offset = 0, limit = 100) {
+        if (!this.isConnected) {
+            return false;
+        }
+
+        this.socket.emit('get_roster', {
+            room_id: roomId,
+            offset: offset,
+            limit: limit
+        });
+        return true;
+    }
+
     kickUser(roomId, userId) {
         if (!this.isConnected || this.userRole !== 'owner') {
             return false;
@@ -266,6 +609,7 @@ class SocketClient {
     }
 
     disconnect() {
+        this.stopClockSync();
         if (this.socket) {
             this.socket.disconnect();
             this.socket = null;
@@ -0,0 +1,16 @@
+"""
+Configuração dos testes: raiz do projeto no path e ambiente mínimo para importar os serviços
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ.setdefault('PROXY_TOKEN_SECRET', 'test-proxy-secret')
+os.environ.setdefault('PROXY_DISK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'streamhive-tests-cache'))
+os.environ.setdefault('ROOM_STATE_DIR', os.path.join(tempfile.gettempdir(), 'streamhive-tests-rooms'))
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from services.admission import ADMISSION_MIN_RETRY_AFTER, AdmissionController
+
+
+def test_admits_up_to_the_limit_then_rejects_when_queue_is_full():
+    admission = AdmissionController(max_concurrent=2, max_queue=0)
+
+    assert admission.acquire() is None
+    assert admission.acquire() is None
+    assert admission.acquire() == ADMISSION_MIN_RETRY_AFTER
+    assert admission.stats()['rejected_total'] == 1
+
+    admission.release(0.1)
+    assert admission.acquire() is None
+    assert admission.stats()['admitted_total'] == 3
+
+
+def test_waiter_takes_the_released_slot():
+    admission = AdmissionController(max_concurrent=1, max_queue=1)
+    assert admission.acquire() is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(admission.acquire(timeout=5)))
+    waiter.start()
+    while admission.waiting == 0:
+        time.sleep(0.001)
+
+    assert admission.acquire(timeout=0) is not None  # fila cheia: recusado na hora
+    admission.release(0.05)
+    waiter.join(5)
+
+    assert results == [None]
+    assert admission.active == 1
+    assert admission.waiting == 0
+
+
+def test_queue_timeout_rejects():
+    admission = AdmissionController(max_concurrent=1, max_queue=4)
+    assert admission.acquire() is None
+    assert admission.acquire(timeout=0.05) is not None
+    assert admission.waiting == 0
+
+
+def test_rejected_burst_is_spread_over_time():
+    admission = AdmissionController(max_concurrent=2, max_queue=0)
+    admission.acquire()
+    admission.release(2.0)  # uma vaga a cada segundo
+    admission.acquire()
+    admission.acquire()
+
+    waits = [admission.reject() for _ in range(4)]
+    assert waits == sorted(waits)
+    assert waits[-1] - waits[0] >= 2.9
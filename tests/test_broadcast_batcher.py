@@ -0,0 +1,67 @@
+import threading
+
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+
+from services.broadcast_batcher import BroadcastBatcher
+
+
+def _setup():
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+
+    @socketio.on('connect')
+    def connect(auth):
+        join_room('sala')
+
+    batcher = BroadcastBatcher(socketio, window_ms=60_000)  # só descarga explícita
+    return batcher, socketio.test_client(app)
+
+
+def test_pending_events_go_out_as_one_batch_before_a_bypass_event():
+    batcher, client = _setup()
+    batcher.emit('chat_message', {'m': 1}, to='sala')
+    batcher.emit('user_joined', {'u': 2}, to='sala')
+    batcher.emit('video_sync', {'t': 3}, to='sala')
+
+    received = [(packet['name'], packet['args']) for packet in client.get_received()]
+    assert received == [
+        ('batch', [[['chat_message', {'m': 1}], ['user_joined', {'u': 2}]]]),
+        ('video_sync', [{'t': 3}])
+    ]
+
+
+def test_single_pending_event_is_sent_unwrapped():
+    batcher, client = _setup()
+    batcher.emit('chat_message', {'m': 1}, to='sala')
+    assert client.get_received() == []
+
+    batcher.flush('sala')
+    assert [(packet['name'], packet['args']) for packet in client.get_received()] == \
+        [('chat_message', [{'m': 1}])]
+
+
+def test_bypass_does_not_wait_for_another_rooms_send():
+    batcher, client = _setup()
+    other = next(f'outra-{n}' for n in range(1000)
+                 if batcher._send_lock(f'outra-{n}') is not batcher._send_lock('sala'))
+
+    holding, release = threading.Event(), threading.Event()
+
+    def slow_send():
+        with batcher._send_lock(other):  # envio longo de outra sala em andamento
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=slow_send)
+    thread.start()
+    holding.wait(5)
+
+    sent = threading.Thread(target=batcher.emit, args=('video_sync', {'t': 1}), kwargs={'to': 'sala'})
+    sent.start()
+    sent.join(2)
+    assert not sent.is_alive()
+
+    release.set()
+    thread.join(5)
+    assert [packet['name'] for packet in client.get_received()] == ['video_sync']
@@ -0,0 +1,65 @@
+import json
+
+from services.chat_history import ChatHistory, ChatRecord
+from utils.wire_format import WIRE_COMPACT, WIRE_JSON
+
+
+def _record(n):
+    return ChatRecord(id=str(n), user_id='1', username='ana', message=f'msg {n}', timestamp=1000.0 + n)
+
+
+def test_ring_buffer_keeps_latest_messages_in_order():
+    history = ChatHistory(capacity=3)
+    for n in range(5):
+        history.append(_record(n))
+
+    assert len(history) == 3
+    assert [record.id for record in history] == ['2', '3', '4']
+    assert [message['id'] for message in history.to_list()] == ['2', '3', '4']
+
+
+def test_replay_is_latest_messages_as_json_array():
+    history = ChatHistory(capacity=10)
+    for n in range(6):
+        history.append(_record(n))
+
+    replay = json.loads(history.serialized(WIRE_JSON, limit=4))
+    assert [message['id'] for message in replay] == ['2', '3', '4', '5']
+    assert replay[-1] == _record(5).to_dict()
+
+    compact = json.loads(history.serialized(WIRE_COMPACT, limit=2))
+    assert compact == [{'i': '4', 'u': '1', 'n': 'ana', 'm': 'msg 4', 's': 1004.0},
+                       {'i': '5', 'u': '1', 'n': 'ana', 'm': 'msg 5', 's': 1005.0}]
+
+    assert history.serialized(limit=0) == b'[]'
+    assert ChatHistory().serialized() == b'[]'
+
+
+def test_record_is_serialized_once_per_wire_format():
+    record = _record(1)
+
+    first = record.serialized(WIRE_JSON)
+    assert record.serialized(WIRE_JSON) is first
+    assert record.serialized(WIRE_COMPACT) is not first
+
+
+def test_iteration_is_a_snapshot():
+    history = ChatHistory(capacity=2)
+    history.append(_record(1))
+    history.append(_record(2))
+
+    cursor = iter(history)
+    history.append(_record(3))
+
+    assert [record.id for record in cursor] == ['1', '2']
+
+
+def test_extend_round_trips_verbose_messages():
+    source = ChatHistory()
+    for n in range(3):
+        source.append(_record(n))
+
+    restored = ChatHistory()
+    restored.extend(source.to_list())
+
+    assert restored.serialized() == source.serialized()
@@ -0,0 +1,55 @@
+import time
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+from database.connection import DatabaseManager
+from services.chat_history import ChatRecord
+from services.chat_store import CHAT_WRITE_MAX_ATTEMPTS, ChatStore
+
+
+def _store(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'chat.db'))
+    assert db.initialize_database()
+    return ChatStore(SocketIO(Flask(__name__), async_mode='threading'), db)
+
+
+def _record(store, message):
+    return ChatRecord(id=store.next_id(), user_id='1', username='ana', message=message, timestamp=time.time())
+
+
+def test_invalid_row_does_not_block_the_queue(tmp_path):
+    store = _store(tmp_path)
+    good = _record(store, 'oi')
+    bad = _record(store, {'não': 'serializável'})
+    store.enqueue('1', good)
+    store.enqueue('1', bad)
+
+    for _ in range(CHAT_WRITE_MAX_ATTEMPTS):
+        store.flush()
+
+    assert store.pending_count() == 0
+    assert store.dropped == 1
+    messages, _ = store.get_messages('1')
+    assert [message['id'] for message in messages] == [good.id]
+
+
+def test_failed_batch_is_retried_in_order(tmp_path):
+    store = _store(tmp_path)
+    record = _record(store, 'oi')
+    store.enqueue('sala', record)  # room_id inválido: a conversão falha no lote
+
+    store.flush()
+    assert store.pending_count() == 1
+    assert store.dropped == 0
+
+
+def test_last_id_is_seeded_at_startup(tmp_path):
+    store = _store(tmp_path)
+    record = _record(store, 'oi')
+    store.enqueue('1', record)
+    store.flush()
+
+    restarted = ChatStore(store.socketio, store.db)
+    assert restarted._last_id == record.id
+    assert restarted.next_id() == record.id + 1
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from services.disk_cache import DiskCache, response_extent
+
+BLOCK = 1024
+HEADERS = {'Content-Type': 'video/mp4', 'ETag': '"v1"'}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(directory=str(tmp_path), max_bytes=64 * BLOCK, block_size=BLOCK)
+    yield cache
+    cache.clear()
+
+
+def _fill(cache, entry, data, start):
+    writer = cache.writer(entry, start)
+    writer.write(data[start:])
+    writer.close()
+
+
+def test_response_extent():
+    assert response_extent(200, {'Content-Length': '10'}) == (0, 10)
+    assert response_extent(206, {'Content-Range': 'bytes 5-9/10'}) == (5, 10)
+    assert response_extent(206, {'Content-Range': 'bytes 5-9/*'}) is None
+
+
+def test_writer_marks_only_complete_blocks(cache):
+    data = bytes(range(256)) * 20  # 5120 bytes, 5 blocos
+    entry = cache.open('u', len(data), HEADERS)
+
+    _fill(cache, entry, data, 1500)  # o bloco 1 fica cortado
+    assert [entry.has_block(index) for index in range(entry.blocks)] == [False, False, True, True, True]
+    assert entry.available_until(2048, len(data) - 1) == len(data)
+    assert entry.available_until(1500, len(data) - 1) == 1500
+    assert entry.read(2048, 100) == data[2048:2148]
+    assert cache.record(entry, 0, 100) == 0
+    assert cache.record(entry, 2048, 4000) == 4001
+    assert cache.stats()['partial_hits'] == 0
+
+
+def test_open_replaces_entry_when_resource_changes(cache):
+    entry = cache.open('u', 4 * BLOCK, HEADERS)
+    assert cache.open('u', 4 * BLOCK, HEADERS) is entry
+    assert cache.open('u', 4 * BLOCK, {'ETag': '"v2"'}) is not entry
+    assert cache.open('u', 5 * BLOCK, {'ETag': '"v2"'}).size == 5 * BLOCK
+
+
+def test_quota_evicts_least_recently_watched(tmp_path):
+    cache = DiskCache(directory=str(tmp_path), max_bytes=4 * BLOCK, block_size=BLOCK)
+    data = b'x' * (3 * BLOCK)
+    old = cache.open('old', len(data), HEADERS)
+    _fill(cache, old, data, 0)
+    new = cache.open('new', len(data), HEADERS)
+    _fill(cache, new, data, 0)
+
+    assert cache.get('old') is None
+    assert cache.get('new') is new
+    assert cache.stats()['evictions'] == 1
+    cache.clear()
+
+
+def test_removed_entry_stays_readable_until_last_reader(cache):
+    data = b'abcd' * BLOCK
+    entry = cache.open('u', len(data), HEADERS)
+    _fill(cache, entry, data, 0)
+
+    with entry.mapped() as view:
+        cache.clear()  # remove o arquivo no meio da resposta
+        assert view[:8] == data[:8]
+        assert not view.closed
+    assert view.closed
+
+    with pytest.raises(OSError):
+        entry.read(0, 4)
+
+
+def test_concurrent_readers_share_one_mapping(cache):
+    data = b'z' * (4 * BLOCK)
+    entry = cache.open('u', len(data), HEADERS)
+    _fill(cache, entry, data, 0)
+
+    barrier = threading.Barrier(8)
+    views = []
+
+    def read():
+        barrier.wait()
+        with entry.mapped() as view:
+            views.append(view)
+            assert view[:4] == b'zzzz'
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(views) == 8
+    assert len({id(view) for view in views}) == 1
+    assert entry._readers == 0
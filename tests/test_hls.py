@@ -0,0 +1,52 @@
+from urllib.parse import parse_qs, urlsplit
+
+from services.hls import is_playlist, proxied_url_builder, rewrite_playlist
+from utils.proxy_tokens import verify_proxy_token
+
+MEDIA = '''#EXTM3U
+#EXT-X-KEY:METHOD=AES-128,URI="keys/k1"
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:4,
+seg0.ts
+
+#EXTINF:4,
+https://other.test/seg1.ts
+'''
+
+
+def test_is_playlist_by_content_type_or_extension():
+    assert is_playlist('https://cdn.test/x', 'application/vnd.apple.mpegURL; charset=utf-8')
+    assert is_playlist('https://cdn.test/v/index.M3U8?token=1', 'text/plain')
+    assert not is_playlist('https://cdn.test/v/seg0.ts', 'video/mp2t')
+
+
+def test_media_playlist_uris_are_resolved_and_proxied():
+    playlist = rewrite_playlist(MEDIA, 'https://cdn.test/v/index.m3u8', lambda url: f'P({url})')
+
+    assert not playlist.is_master and not playlist.ended
+    assert playlist.segments == ['https://cdn.test/v/seg0.ts', 'https://other.test/seg1.ts']
+    lines = playlist.text.splitlines()
+    assert '#EXT-X-KEY:METHOD=AES-128,URI="P(https://cdn.test/v/keys/k1)"' in lines
+    assert '#EXT-X-MAP:URI="P(https://cdn.test/v/init.mp4)"' in lines
+    assert 'P(https://cdn.test/v/seg0.ts)' in lines
+    assert '' in lines  # linhas em branco preservadas
+
+
+def test_master_playlist_has_no_segments():
+    text = '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\nlow/index.m3u8\n#EXT-X-ENDLIST\n'
+    playlist = rewrite_playlist(text, 'https://cdn.test/v/master.m3u8', lambda url: url)
+    assert playlist.is_master and playlist.ended
+    assert playlist.segments == []
+    assert 'https://cdn.test/v/low/index.m3u8' in playlist.text
+
+
+def test_proxied_urls_carry_tokens_scoped_to_each_uri():
+    claims = {'uid': '7', 'rid': '3', 'exp': 4102444800}
+    proxied = proxied_url_builder(claims, base='https://proxy.test', secret='segredo')
+
+    query = parse_qs(urlsplit(proxied('https://cdn.test/v/seg0.ts')).query)
+    assert query['url'] == ['https://cdn.test/v/seg0.ts']
+    assert verify_proxy_token(query['token'][0], 'https://cdn.test/v/seg0.ts', secret='segredo')['rid'] == '3'
+
+    unsigned = proxied_url_builder(None, secret='segredo')('https://cdn.test/v/seg0.ts')
+    assert unsigned == '/proxy/stream?url=https%3A%2F%2Fcdn.test%2Fv%2Fseg0.ts'
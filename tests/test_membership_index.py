@@ -0,0 +1,40 @@
+from services.membership_index import MembershipIndex
+
+
+def test_users_in_room_tracks_joins_and_leaves():
+    index = MembershipIndex()
+    assert index.join('s1', 'u1', 'r1')
+    assert not index.join('s2', 'u1', 'r1')  # segunda aba do mesmo usuário
+    assert index.join('s3', 'u2', 'r1')
+    assert index.join('s4', 'u3', 'r2')
+
+    assert index.users_in_room('r1') == {'u1', 'u2'}
+    assert index.users_in_room('r2') == {'u3'}
+
+    assert index.leave('s1') == ('r1', 'u1', False)
+    assert index.users_in_room('r1') == {'u1', 'u2'}
+    assert index.leave('s2') == ('r1', 'u1', True)
+    assert index.users_in_room('r1') == {'u2'}
+
+
+def test_remove_user_and_room_clear_room_users():
+    index = MembershipIndex()
+    index.join('s1', 'u1', 'r1')
+    index.join('s2', 'u1', 'r1')
+    index.join('s3', 'u2', 'r1')
+
+    assert sorted(index.remove_user('r1', 'u1')) == ['s1', 's2']
+    assert index.users_in_room('r1') == {'u2'}
+    assert index.room_of('s1') is None
+
+    assert index.remove_room('r1') == ['s3']
+    assert index.users_in_room('r1') == set()
+    assert index.room_count() == 0
+    assert index._room_users == {}
+
+
+def test_users_in_room_returns_a_copy():
+    index = MembershipIndex()
+    index.join('s1', 'u1', 'r1')
+    index.users_in_room('r1').add('intruso')
+    assert index.users_in_room('r1') == {'u1'}
@@ -0,0 +1,73 @@
+import time
+
+from services.metadata_cache import MetadataCache
+
+
+class Probe:
+    """Sondagem do upstream com respostas programadas"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def _wait(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_fresh_entries_are_served_from_memory_as_copies():
+    probe = Probe({'size': 1})
+    cache = MetadataCache(probe, ttl=60)
+
+    info = cache.get('u')
+    info['size'] = 2
+    assert cache.get('u') == {'size': 1}
+    assert probe.calls == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_stale_entry_is_served_while_revalidating():
+    probe = Probe({'size': 1}, {'size': 2})
+    cache = MetadataCache(probe, ttl=0, stale_ttl=60)
+    assert cache.get('u') == {'size': 1}
+
+    assert cache.get('u') == {'size': 1}  # vencida: servida na hora
+    _wait(lambda: cache._entries['u'].info == {'size': 2})
+    assert cache.stats()['revalidations'] == 1
+
+
+def test_failed_revalidation_keeps_old_info_and_backs_off():
+    probe = Probe({'size': 1}, None)
+    cache = MetadataCache(probe, ttl=0, stale_ttl=60, negative_ttl=60)
+    cache.get('u')
+
+    cache.get('u')
+    _wait(lambda: not cache._entries['u'].revalidating)
+    assert cache.get('u') == {'size': 1}
+    assert probe.calls == 2  # dentro do retry_at: sem nova sondagem
+
+
+def test_failures_are_cached_briefly():
+    probe = Probe(None)
+    cache = MetadataCache(probe, negative_ttl=60)
+    assert cache.get('u') is None
+    assert cache.get('u') is None
+    assert probe.calls == 1
+    assert cache.stats()['negative_hits'] == 1
+
+    cache.invalidate('u')
+    cache.get('u')
+    assert probe.calls == 2
+
+
+def test_least_recently_used_urls_are_forgotten():
+    cache = MetadataCache(Probe({'size': 1}), max_entries=2)
+    for url in ('a', 'b', 'a', 'c'):
+        cache.get(url)
+    assert list(cache._entries) == ['a', 'c']
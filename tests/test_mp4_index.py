@@ -0,0 +1,78 @@
+import struct
+
+import pytest
+
+from services.mp4_index import MP4_PROBE_BYTES, Mp4Error, load_index, parse_moov
+
+SAMPLE_BYTES = 100
+DATA_START = 1000
+
+
+def box(kind, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def full(kind, *fields):
+    return box(kind, b'\0\0\0\0', struct.pack(f'>{len(fields)}I', *fields))
+
+
+def video_trak(samples=10, sync=(1, 6), data_start=DATA_START):
+    """Trilha de vídeo: amostras de 1s, uma por chunk, quadros-chave em `sync` (base 1)"""
+    stbl = box(
+        b'stbl',
+        full(b'stts', 1, samples, 1000),
+        full(b'stss', len(sync), *sync),
+        full(b'stsc', 1, 1, 1, 1),
+        full(b'stsz', SAMPLE_BYTES, samples),
+        full(b'stco', samples, *(data_start + i * SAMPLE_BYTES for i in range(samples)))
+    )
+    mdhd = box(b'mdhd', b'\0' * 12, struct.pack('>II', 1000, samples * 1000), b'\0' * 4)
+    hdlr = box(b'hdlr', b'\0' * 8, b'vide', b'\0' * 12)
+    return box(b'trak', box(b'mdia', mdhd, hdlr, box(b'minf', stbl)))
+
+
+def test_seek_range_starts_at_previous_keyframe():
+    index = parse_moov(box(b'moov', video_trak()), 5000)
+
+    assert index.duration == 10.0
+    # 6.5s cai na amostra 6; o quadro-chave anterior é a amostra 5 (stss 6)
+    assert index.byte_ranges(6.5, 1.0) == [(DATA_START + 5 * SAMPLE_BYTES, DATA_START + 8 * SAMPLE_BYTES - 1)]
+    assert index.byte_ranges(100.0, 1.0) == [(DATA_START + 5 * SAMPLE_BYTES, DATA_START + 10 * SAMPLE_BYTES - 1)]
+
+
+def test_fragmented_or_trackless_moov_is_rejected():
+    with pytest.raises(Mp4Error):
+        parse_moov(box(b'moov', box(b'mvex')), 5000)
+    with pytest.raises(Mp4Error):
+        parse_moov(box(b'moov', box(b'udta')), 5000)
+    with pytest.raises(Mp4Error):
+        parse_moov(box(b'moov', struct.pack('>I4s', 64, b'trak')), 5000)
+
+
+def _fetcher(data, requests):
+    def fetch(start, end):
+        requests.append((start, end))
+        return data[start:end + 1], len(data)
+    return fetch
+
+
+def test_load_index_walks_past_mdat_to_a_trailing_moov():
+    ftyp = box(b'ftyp', b'isom\0\0\0\0')
+    mdat_size = 2 * MP4_PROBE_BYTES
+    mdat = struct.pack('>I4s', mdat_size, b'mdat') + b'\0' * (mdat_size - 8)
+    data = ftyp + mdat + box(b'moov', video_trak(data_start=len(ftyp) + 8))
+    requests = []
+
+    index = load_index(_fetcher(data, requests))
+
+    assert index is not None and index.size == len(data)
+    assert len(requests) == 3  # início, cabeçalho do moov, moov inteiro
+    assert requests[0] == (0, MP4_PROBE_BYTES - 1)
+
+
+def test_load_index_ignores_non_mp4_and_fragmented_files():
+    assert load_index(_fetcher(b'<html>' + b'\0' * 100, [])) is None
+
+    ftyp = box(b'ftyp', b'isom\0\0\0\0')
+    assert load_index(_fetcher(ftyp + box(b'moof') + box(b'mdat'), [])) is None
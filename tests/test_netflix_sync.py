@@ -0,0 +1,17 @@
+from services.netflix_sync import NETFLIX_URL_MAX_LENGTH, normalize_netflix_url
+
+
+def test_keeps_only_watch_relevant_query_params():
+    assert normalize_netflix_url('https://netflix.com/watch/80100172?trackId=1&t=42&tctx=x#frag') == \
+        'https://www.netflix.com/watch/80100172?t=42'
+    assert normalize_netflix_url('https://WWW.Netflix.com') == 'https://www.netflix.com/'
+
+
+def test_rejects_other_hosts_schemes_and_garbage():
+    assert normalize_netflix_url('http://www.netflix.com/watch/1') is None
+    assert normalize_netflix_url('https://netflix.com.evil.test/watch/1') is None
+    assert normalize_netflix_url('https://evil.test/?u=https://www.netflix.com') is None
+    assert normalize_netflix_url('https://[::1') is None
+    assert normalize_netflix_url(None) is None
+    assert normalize_netflix_url({'url': 'https://www.netflix.com'}) is None
+    assert normalize_netflix_url('https://www.netflix.com/' + 'a' * NETFLIX_URL_MAX_LENGTH) is None
@@ -0,0 +1,37 @@
+from services.playback_clock import SYNC_HEARTBEAT_INTERVAL, SYNC_PAUSED_HEARTBEAT_INTERVAL, PlaybackClock
+
+
+def test_position_advances_only_while_playing():
+    clock = PlaybackClock(position=10.0, anchor=100.0)
+    assert clock.current_time(now=105.0) == 10.0
+
+    clock.play(now=105.0)
+    assert clock.current_time(now=107.5) == 12.5
+
+    clock.pause(now=110.0)
+    assert clock.current_time(now=200.0) == 15.0
+
+
+def test_seek_keeps_play_state_and_clamps_negative_positions():
+    clock = PlaybackClock(anchor=0.0)
+    clock.play(now=0.0)
+    clock.seek(-3, now=10.0)
+    assert clock.is_playing
+    assert clock.current_time(now=12.0) == 2.0
+
+
+def test_rate_scales_elapsed_time():
+    clock = PlaybackClock(position=0.0, anchor=0.0, is_playing=True, rate=1.5)
+    assert clock.current_time(now=4.0) == 6.0
+
+
+def test_heartbeat_interval_depends_on_state():
+    clock = PlaybackClock(anchor=0.0)
+    payload = clock.heartbeat(now=1000.0)
+    assert payload == {'t': 0.0, 's': 1000.0, 'p': 0}
+
+    assert not clock.heartbeat_due(1000.0 + SYNC_HEARTBEAT_INTERVAL)
+    assert clock.heartbeat_due(1000.0 + SYNC_PAUSED_HEARTBEAT_INTERVAL)
+
+    clock.play(now=1000.0)
+    assert clock.heartbeat_due(1000.0 + SYNC_HEARTBEAT_INTERVAL)
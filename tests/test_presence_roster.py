@@ -0,0 +1,71 @@
+from services.presence_roster import PresenceRoster
+
+
+def test_join_and_leave_produce_net_diffs():
+    roster = PresenceRoster()
+    roster.add('1', 'ana', 'owner')
+    roster.add('2', 'bia', 'viewer')
+
+    diff = roster.take_diff()
+    assert {member['user_id'] for member in diff['added']} == {'1', '2'}
+    assert diff['removed'] == [] and diff['kicked'] == []
+    assert diff['count'] == 2
+    assert diff['roster_version'] == 1
+
+    roster.remove('2')
+    diff = roster.take_diff()
+    assert diff['added'] == []
+    assert diff['removed'] == ['2']
+    assert diff['count'] == 1
+    assert diff['roster_version'] == 2
+
+    assert roster.take_diff() is None
+
+
+def test_reconnect_within_window_cancels_out():
+    roster = PresenceRoster()
+    roster.add('1', 'ana', 'owner')
+    roster.take_diff()
+
+    roster.remove('1')
+    roster.add('1', 'ana', 'owner')
+
+    assert roster.take_diff() is None
+    assert roster.version == 1
+
+
+def test_join_then_leave_before_publish_is_silent():
+    roster = PresenceRoster()
+    roster.add('1', 'ana', 'owner')
+    roster.take_diff()
+
+    roster.add('2', 'bia', 'viewer')
+    roster.remove('2')
+
+    assert roster.take_diff() is None
+
+
+def test_kick_and_role_change():
+    roster = PresenceRoster()
+    roster.add('1', 'ana', 'owner')
+    roster.add('2', 'bia', 'viewer')
+    roster.take_diff()
+
+    roster.add('1', 'ana', 'moderator')
+    roster.remove('2', kicked=True)
+    diff = roster.take_diff()
+
+    assert [(m['user_id'], m['role']) for m in diff['added']] == [('1', 'moderator')]
+    assert diff['removed'] == ['2']
+    assert diff['kicked'] == ['2']
+
+
+def test_restored_roster_is_already_published():
+    roster = PresenceRoster()
+    roster.restore([{'user_id': '1', 'username': 'ana', 'role': 'owner', 'joined_at': 10.0}], version=5)
+
+    roster.add('1', 'ana', 'owner')
+    assert roster.take_diff() is None
+
+    roster.remove('1')
+    assert roster.take_diff() == {'added': [], 'removed': ['1'], 'kicked': [], 'count': 0, 'roster_version': 6}
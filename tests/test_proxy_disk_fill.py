@@ -0,0 +1,68 @@
+import http.server
+import socketserver
+import threading
+import time
+
+from proxy_server import ProxyServer
+from services.disk_cache import disk_cache
+
+BLOCK = 1024 * 1024
+DATA = bytes(range(256)) * (3 * BLOCK // 256)
+
+
+def _serve_ranges():
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            start, end = self.headers['Range'][len('bytes='):].split('-')
+            start, end = int(start), min(int(end), len(DATA) - 1)
+            requests_seen.append(start)
+            time.sleep(0.2)  # o segundo pedido chega enquanto o primeiro ainda busca
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(DATA)}')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+            self.wfile.write(DATA[start:end + 1])
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v.mp4', requests_seen
+
+
+def test_concurrent_disk_gaps_share_one_upstream_fill():
+    server, url, requests_seen = _serve_ranges()
+    try:
+        proxy = ProxyServer()
+        entry = disk_cache.open(url, len(DATA), {'Content-Type': 'video/mp4'})
+        assert entry.block_size == BLOCK
+        end = len(DATA) - 1
+        starts = [BLOCK + 100, BLOCK + 5000]
+        bodies = {}
+
+        def read(start):
+            bodies[start] = b''.join(proxy._shared_fill(url, entry, start, end))
+
+        threads = [threading.Thread(target=read, args=(start,)) for start in starts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        assert requests_seen == [BLOCK]
+        for start in starts:
+            assert bodies[start] == DATA[start:]
+        assert entry.available_until(BLOCK, end) == len(DATA)
+        assert proxy.tees.stats()['open'] == 0
+    finally:
+        server.shutdown()
+        disk_cache.clear()
@@ -0,0 +1,113 @@
+import http.server
+import socketserver
+import threading
+
+from flask import Flask
+
+from proxy_server import ProxyServer
+from services.disk_cache import disk_cache
+
+DATA = bytes(range(256)) * 40
+
+
+def _serve_ranges():
+    seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            range_header = self.headers.get('Range')
+            seen.append((self.path, range_header, self.headers.get('If-Range')))
+
+            if not range_header:
+                self._reply(200, DATA)
+                return
+
+            start, end = range_header[len('bytes='):].split('-')
+            start = int(start)
+            end = min(int(end) if end else len(DATA) - 1, len(DATA) - 1)
+            if start >= len(DATA):
+                self._reply(416, b'', {'Content-Range': f'bytes */{len(DATA)}'})
+                return
+            self._reply(206, DATA[start:end + 1], {'Content-Range': f'bytes {start}-{end}/{len(DATA)}'})
+
+        def _reply(self, status, body, extra=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (extra or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}', seen
+
+
+def _proxy(proxy, url, headers=None):
+    with Flask(__name__).test_request_context(headers=headers or {}):
+        response = proxy.proxy_stream(url)
+        return response.status_code, response.headers, response.get_data()
+
+
+def test_range_passthrough_uses_one_upstream_request():
+    server, base, seen = _serve_ranges()
+    proxy = ProxyServer()
+    try:
+        status, headers, body = _proxy(proxy, f'{base}/full.mp4')
+        assert status == 200
+        assert body == DATA
+        assert headers['Content-Length'] == str(len(DATA))
+
+        status, headers, body = _proxy(proxy, f'{base}/partial.mp4', {'Range': 'bytes=100-199'})
+        assert status == 206
+        assert body == DATA[100:200]
+        assert headers['Content-Length'] == '100'
+        assert headers['Content-Range'] == f'bytes 100-199/{len(DATA)}'
+
+        status, headers, body = _proxy(proxy, f'{base}/beyond.mp4', {'Range': f'bytes={len(DATA) + 10}-'})
+        assert status == 416
+        assert body == b''
+        assert headers['Content-Range'] == f'bytes */{len(DATA)}'
+
+        status, _, body = _proxy(proxy, f'{base}/validated.mp4', {'Range': 'bytes=0-9', 'If-Range': '"v1"'})
+        assert status == 206
+        assert body == DATA[:10]
+    finally:
+        server.shutdown()
+        disk_cache.clear()
+
+    assert seen == [
+        ('/full.mp4', None, None),
+        ('/partial.mp4', 'bytes=100-199', None),
+        ('/beyond.mp4', f'bytes={len(DATA) + 10}-', None),
+        ('/validated.mp4', 'bytes=0-9', '"v1"')
+    ]
+
+
+def test_client_disconnect_releases_upstream():
+    server, base, seen = _serve_ranges()
+    proxy = ProxyServer()
+    try:
+        with Flask(__name__).test_request_context(headers={'Range': 'bytes=0-'}):
+            response = proxy.proxy_stream(f'{base}/abandoned.mp4')
+            assert response.status_code == 206
+            next(iter(response.response))
+            assert proxy.tees.stats()['open'] == 1
+            response.close()
+
+        assert proxy.tees.stats()['open'] == 0
+        assert len(seen) == 1
+    finally:
+        server.shutdown()
+        disk_cache.clear()
@@ -0,0 +1,60 @@
+from proxy_server import PROXY_SEEK_PREFETCH_CONCURRENCY, ProxyServer
+
+
+def test_seek_without_free_slot_keeps_running_prefetch():
+    proxy = ProxyServer()
+    for _ in range(PROXY_SEEK_PREFETCH_CONCURRENCY):
+        assert proxy._seek_slots.acquire(blocking=False)
+    proxy._seek_generation['http://example.test/v.mp4'] = 1
+
+    assert not proxy.prefetch_seek('http://example.test/v.mp4', 42.0)
+    assert not proxy.prefetch_seek('http://example.test/other.mp4', 42.0)
+
+    assert proxy._seek_generation == {'http://example.test/v.mp4': 1}
+    assert proxy.stats()['seeks']['prefetches'] == 0
+
+
+def _serve(status, body=b''):
+    import http.server
+    import socketserver
+    import threading
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v.mp4'
+
+
+def test_transient_upstream_error_is_not_cached_as_unindexable():
+    server, url = _serve(503)
+    try:
+        proxy = ProxyServer()
+        assert proxy._mp4_index(url) == (None, {})
+        assert url not in proxy._indexes
+    finally:
+        server.shutdown()
+
+
+def test_upstream_without_range_support_is_cached_as_unindexable():
+    server, url = _serve(200, b'not an mp4')
+    try:
+        proxy = ProxyServer()
+        assert proxy._mp4_index(url)[0] is None
+        assert proxy._indexes[url][0] is None
+    finally:
+        server.shutdown()
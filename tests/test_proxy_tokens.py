@@ -0,0 +1,44 @@
+from utils.proxy_tokens import issue_proxy_token, url_allowed, verify_proxy_token
+
+SECRET = 'segredo'
+URL = 'https://cdn.test/videos'
+
+
+def test_valid_token_returns_claims():
+    token = issue_proxy_token(URL, 7, 3, secret=SECRET, now=1000, ttl=60)
+    claims = verify_proxy_token(token, URL, secret=SECRET, now=1059)
+    assert claims['uid'] == '7' and claims['rid'] == '3' and claims['exp'] == 1060
+
+
+def test_expired_tampered_or_foreign_tokens_are_rejected():
+    token = issue_proxy_token(URL, 7, 3, secret=SECRET, now=1000, ttl=60)
+    payload, signature = token.rsplit('.', 1)
+
+    assert verify_proxy_token(token, URL, secret=SECRET, now=1061) is None
+    assert verify_proxy_token(token, URL, secret='outro', now=1000) is None
+    assert verify_proxy_token(payload + 'x.' + signature, URL, secret=SECRET, now=1000) is None
+    assert verify_proxy_token(token, URL + '/seg1.ts', secret=SECRET, now=1000) is None
+    assert verify_proxy_token('', URL, secret=SECRET) is None
+    assert verify_proxy_token('semponto', URL, secret=SECRET) is None
+
+
+def test_prefix_tokens_cover_whole_path_segments_only():
+    token = issue_proxy_token(URL, 7, 3, prefix=True, secret=SECRET, now=1000)
+    assert verify_proxy_token(token, URL + '/hls/seg1.ts', secret=SECRET, now=1000) is not None
+
+    assert url_allowed(URL, URL + '/seg1.ts', prefix=True)
+    assert not url_allowed(URL, URL + '-privados/seg1.ts', prefix=True)
+    assert not url_allowed('https://cdn.test', 'https://cdn.test.evil.com/x', prefix=True)
+    assert not url_allowed('', URL)
+
+
+def test_prefix_scope_cannot_be_escaped_with_dot_segments():
+    base = 'https://cdn.test/videos/room1'
+    assert not url_allowed(base, base + '/../room2/secret.mp4', prefix=True)
+    assert not url_allowed(base, base + '/%2e%2e/room2/secret.mp4', prefix=True)
+    assert not url_allowed(base, base + '%2F..%2Froom2/secret.mp4', prefix=True)
+    assert url_allowed(base, base + '/hls/../seg1.ts', prefix=True)
+    assert url_allowed(base, 'https://CDN.test/videos/room1/seg1.ts', prefix=True)
+
+    token = issue_proxy_token(base, 7, 3, prefix=True, secret=SECRET, now=1000)
+    assert verify_proxy_token(token, base + '/../room2/secret.mp4', secret=SECRET, now=1000) is None
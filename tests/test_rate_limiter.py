@@ -0,0 +1,57 @@
+from services.rate_limiter import DEFAULT_RATE_LIMITS, SocketRateLimiter, TokenBucket, parse_rate_limits
+
+LIMITS = {'chat_message': (1.0, 2)}
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(2, now=0.0)
+    assert bucket.take(1.0, 2, now=0.0) == 0.0
+    assert bucket.take(1.0, 2, now=0.0) == 0.0
+    assert bucket.take(1.0, 2, now=0.0) == 1.0
+    assert bucket.take(1.0, 2, now=1.0) == 0.0
+    assert bucket.take(1.0, 2, now=100.0) == 0.0 and bucket.tokens == 1  # limitado à rajada
+
+
+def test_parse_rate_limits_overrides_and_ignores_invalid_items():
+    limits = parse_rate_limits('chat_message=3:6, bogus, clock_ping=x:1')
+    assert limits['chat_message'] == (3.0, 6.0)
+    assert limits['clock_ping'] == DEFAULT_RATE_LIMITS['clock_ping']
+    assert 'bogus' not in limits
+
+
+def test_connection_limit_and_unlimited_events():
+    limiter = SocketRateLimiter(limits=LIMITS)
+    assert limiter.check('chat_message', 'a', now=0.0) is None
+    assert limiter.check('chat_message', 'a', now=0.0) is None
+    assert limiter.check('chat_message', 'a', now=0.0) == 1.0
+    assert limiter.check('chat_message', 'b', now=0.0) is None  # outra conexão, outro balde
+    assert limiter.check('leave_room', 'a', now=0.0) is None
+    assert limiter.stats()['rejected_total'] == {'chat_message': 1}
+
+
+def test_user_limit_spans_tabs_without_charging_rejected_connection():
+    limiter = SocketRateLimiter(limits=LIMITS, user_multiplier=1)
+    assert limiter.check('chat_message', 'tab1', user_id=7, now=0.0) is None
+    assert limiter.check('chat_message', 'tab2', user_id=7, now=0.0) is None
+    assert limiter.check('chat_message', 'tab3', user_id=7, now=0.0) is not None
+
+    # O token da conexão recusada pelo balde do usuário foi devolvido
+    assert limiter._sid_buckets['tab3']['chat_message'].tokens == 2
+
+
+def test_prune_drops_full_user_buckets_and_forget_drops_connections():
+    limiter = SocketRateLimiter(limits=LIMITS)
+    limiter.check('chat_message', 'a', user_id=1, now=0.0)
+    assert limiter.prune(now=0.0) == 0
+    assert limiter.prune(now=10.0) == 1
+
+    limiter.forget_sid('a')
+    assert limiter.stats()['sid_buckets'] == 0
+
+
+def test_notice_is_throttled_per_connection():
+    limiter = SocketRateLimiter(limits=LIMITS)
+    assert limiter.should_notify('a', now=0.0)
+    assert not limiter.should_notify('a', now=0.5)
+    assert limiter.should_notify('b', now=0.5)
+    assert limiter.should_notify('a', now=1.0)
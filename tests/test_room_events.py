@@ -0,0 +1,49 @@
+from services.room_events import ROOM_RESYNC_MAX_EVENTS, RoomEventLog
+
+
+def test_record_assigns_increasing_versions_without_touching_payload():
+    log = RoomEventLog()
+    payload = {'action': 'play'}
+    assert log.record('video_action', payload) == {'action': 'play', 'v': 1}
+    assert log.record('chat_message', {}) == {'v': 2}
+    assert payload == {'action': 'play'}
+
+
+def test_since_returns_missed_events_without_superseded_sync():
+    log = RoomEventLog()
+    log.record('video_action', {'action': 'play'})
+    log.record('video_sync', {'t': 1})
+    log.record('chat_message', {'m': 'oi'})
+
+    assert log.since(3, log.epoch) == []
+    assert [entry['e'] for entry in log.since(1, log.epoch)] == ['chat_message']
+    assert [entry['v'] for entry in log.since(0, log.epoch)] == [1, 3]
+
+
+def test_snapshot_needed_for_unknown_epoch_or_lost_history():
+    log = RoomEventLog(maxlen=2)
+    for _ in range(3):
+        log.record('chat_message', {})
+
+    assert log.since(1, 'outro') is None
+    assert log.since(4, log.epoch) is None  # versão do futuro
+    assert log.since(0, log.epoch) is None  # evento 1 já saiu do buffer
+    assert log.since(1, log.epoch) is not None
+
+
+def test_too_many_missed_events_fall_back_to_snapshot():
+    log = RoomEventLog(maxlen=ROOM_RESYNC_MAX_EVENTS + 10)
+    for _ in range(ROOM_RESYNC_MAX_EVENTS + 1):
+        log.record('chat_message', {})
+    assert log.since(0, log.epoch) is None
+    assert len(log.since(1, log.epoch)) == ROOM_RESYNC_MAX_EVENTS
+
+
+def test_restore_continues_numbering_without_events():
+    log = RoomEventLog()
+    log.record('chat_message', {})
+    log.restore('abcd', 41)
+
+    assert log.since(41, 'abcd') == []
+    assert log.since(40, 'abcd') is None
+    assert log.record('chat_message', {})['v'] == 42
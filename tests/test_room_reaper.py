@@ -0,0 +1,74 @@
+import threading
+
+from services import room_reaper
+from services.chat_history import ChatHistory
+from services.membership_index import MembershipIndex
+from services.playback_clock import PlaybackClock
+from services.presence_roster import PresenceRoster
+from services.room_events import RoomEventLog
+from services.room_reaper import ROOM_IDLE_GRACE_SECONDS, RoomReaper
+from services.room_store import RoomStateStore
+
+
+class _SocketIO:
+    # Sem a varredura em segundo plano: o teste chama sweep() diretamente
+    def start_background_task(self, target, *args, **kwargs):
+        pass
+
+
+def _state(last_active=0.0):
+    return {
+        'video_url': 'https://cdn.example/v.mp4',
+        'clock': PlaybackClock(position=10.0, anchor=0.0, is_playing=True),
+        'events': RoomEventLog(),
+        'roster': PresenceRoster(),
+        'chat_history': ChatHistory(),
+        'last_active': last_active
+    }
+
+
+def _reaper(tmp_path, rooms):
+    memberships = MembershipIndex()
+    reaper = RoomReaper(_SocketIO(), rooms, memberships, threading.RLock(), RoomStateStore(str(tmp_path)))
+    return reaper, memberships
+
+
+def test_idle_room_is_evicted_after_grace_and_saved_paused(tmp_path):
+    rooms = {'1': _state(), '2': _state()}
+    reaper, memberships = _reaper(tmp_path, rooms)
+    memberships.join('sid-a', 'u1', '2')
+
+    assert reaper.sweep(now=100.0) == []
+    assert reaper.sweep(now=100.0 + ROOM_IDLE_GRACE_SECONDS - 1) == []
+    assert reaper.sweep(now=100.0 + ROOM_IDLE_GRACE_SECONDS) == ['1']
+
+    assert list(rooms) == ['2']
+    assert reaper.stats()['evicted_total'] == 1
+
+    # Guardado pausado na posição do momento em que a sala ficou vazia
+    saved = reaper.store.load('1')
+    assert saved['clock']['position'] == 110.0
+    assert saved['clock']['is_playing'] is False
+
+
+def test_reconnect_resets_idle_timer(tmp_path):
+    rooms = {'1': _state()}
+    reaper, memberships = _reaper(tmp_path, rooms)
+
+    reaper.sweep(now=100.0)
+    memberships.join('sid-a', 'u1', '1')
+    reaper.sweep(now=150.0)
+    memberships.leave('sid-a')
+
+    assert reaper.sweep(now=200.0) == []
+    assert reaper.sweep(now=200.0 + ROOM_IDLE_GRACE_SECONDS) == ['1']
+
+
+def test_over_budget_evicts_least_recently_used_idle_room(tmp_path, monkeypatch):
+    rooms = {'old': _state(last_active=1.0), 'new': _state(last_active=2.0), 'live': _state(last_active=0.0)}
+    reaper, memberships = _reaper(tmp_path, rooms)
+    memberships.join('sid-a', 'u1', 'live')
+    monkeypatch.setattr(room_reaper, 'ROOM_STATE_MEMORY_BUDGET', 2 * room_reaper.estimate_room_bytes(rooms['new']))
+
+    assert reaper.sweep(now=100.0) == ['old']
+    assert set(rooms) == {'new', 'live'}
@@ -0,0 +1,91 @@
+import os
+import threading
+
+from services import socket_service as socket_module
+from services.chat_history import ChatHistory
+from services.playback_clock import PlaybackClock
+from services.presence_roster import PresenceRoster
+from services.room_events import RoomEventLog
+from services.room_snapshotter import RoomSnapshotter
+from services.room_store import RoomStateStore, restore_clock, serialize_room_state
+
+ROOM_ID = '7'
+VIDEO_URL = 'https://cdn.example/v.mp4'
+
+
+def _state():
+    state = {
+        'video_url': VIDEO_URL,
+        'clock': PlaybackClock(position=42.0, anchor=1000.0, is_playing=True, rate=1.25),
+        'events': RoomEventLog(),
+        'roster': PresenceRoster(),
+        'chat_history': ChatHistory()
+    }
+    state['events'].record('video_play', {'position': 42.0})
+    state['roster'].add('1', 'ana', 'owner')
+    state['chat_history'].extend([{
+        'id': '1', 'user_id': '1', 'username': 'ana', 'message': 'oi', 'timestamp': 1000.0
+    }])
+    return state
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = RoomStateStore(str(tmp_path))
+    data = serialize_room_state(_state(), now=1010.0)
+
+    assert store.save(ROOM_ID, data)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+    loaded = store.load(ROOM_ID)
+    assert loaded == data
+    assert loaded['clock']['position'] == 54.5
+    assert loaded['chat_messages'][0]['message'] == 'oi'
+
+    clock = restore_clock(loaded['clock'])
+    assert clock.current_time(1010.0) == 54.5
+    assert clock.is_playing and clock.rate == 1.25
+
+    # Estado de sala despejada é consumido na recarga
+    assert store.load(ROOM_ID) is None
+
+
+def test_snapshot_is_incremental_and_kept_for_restart(tmp_path):
+    store = RoomStateStore(str(tmp_path))
+    state = _state()
+    snapshotter = RoomSnapshotter(None, {ROOM_ID: state}, threading.RLock(), store)
+
+    assert snapshotter.snapshot(now=1010.0) == 1
+    assert snapshotter.snapshot(now=1020.0) == 0
+
+    state['events'].record('video_pause', {'position': 50.0})
+    assert snapshotter.snapshot(now=1030.0) == 1
+
+    live = store.load_live()
+    assert list(live) == [ROOM_ID]
+    assert live[ROOM_ID]['events']['version'] == state['events'].version
+    assert store.load_live() == live
+
+
+def test_restore_room_states_brings_back_snapshot(tmp_path, monkeypatch):
+    from app import socket_service
+
+    store = RoomStateStore(str(tmp_path))
+    state = _state()
+    RoomSnapshotter(None, {ROOM_ID: state}, threading.RLock(), store).snapshot(now=1010.0)
+
+    monkeypatch.setattr(socket_module, 'room_states', {})
+    monkeypatch.setattr(socket_service.reaper, 'store', store)
+    monkeypatch.setattr(
+        socket_service.room_service, 'get_room_by_id',
+        lambda room_id: {'id': room_id, 'stream_url': VIDEO_URL}
+    )
+
+    assert socket_service.restore_room_states() == 1
+
+    restored = socket_module.room_states[ROOM_ID]
+    assert restored['clock'].current_time(1010.0) == 54.5
+    assert restored['events'].epoch == state['events'].epoch
+    assert restored['events'].version == state['events'].version
+    assert restored['roster'].snapshot().keys() == {'1'}
+    assert restored['roster'].take_diff() is None
+    assert [record.message for record in restored['chat_history']] == ['oi']
@@ -0,0 +1,50 @@
+from services.segment_cache import SegmentCache, parse_range
+
+HEADERS = {'Content-Type': 'video/mp2t', 'Set-Cookie': 'x=1'}
+
+
+def test_parse_range_forms():
+    assert parse_range('bytes=0-9', 100) == (0, 9)
+    assert parse_range('Bytes = 90-', 100) == (90, 99)
+    assert parse_range('bytes=-10', 100) == (90, 99)
+    assert parse_range('bytes=50-500', 100) == (50, 99)
+    assert parse_range('bytes=100-', 100) is None
+    assert parse_range('bytes=0-1,5-6', 100) is None
+    assert parse_range('items=0-1', 100) is None
+
+
+def test_range_is_served_from_cached_full_body():
+    cache = SegmentCache(max_bytes=1000, max_entry_bytes=100)
+    cache.put('u', None, 200, HEADERS, bytes(range(100)))
+
+    part = cache.get('u', 'bytes=10-19')
+    assert part.status == 206
+    assert part.body == bytes(range(10, 20))
+    assert part.headers['Content-Range'] == 'bytes 10-19/100'
+    assert 'Set-Cookie' not in part.headers
+    assert cache.get('u').response_headers()['Content-Length'] == '100'
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = SegmentCache(max_bytes=250, max_entry_bytes=100)
+    for name in 'abc':
+        cache.put(name, None, 200, HEADERS, b'x' * 100)
+
+    assert not cache.contains('a')
+    assert cache.get('b') is not None  # 'b' passa a ser o mais recente
+    cache.put('d', None, 200, HEADERS, b'x' * 100)
+
+    assert not cache.contains('c')
+    assert cache.contains('b') and cache.contains('d')
+    stats = cache.stats()
+    assert stats['resident_bytes'] == 200 and stats['evictions'] == 2
+
+
+def test_oversized_or_failed_responses_are_not_cached():
+    cache = SegmentCache(max_bytes=1000, max_entry_bytes=100)
+    assert not cache.admits(200, 101)
+    assert not cache.admits(404, 10)
+    assert not cache.admits(200, None)
+    cache.put('u', None, 200, HEADERS, b'x' * 101)
+    cache.put('v', None, 500, HEADERS, b'x')
+    assert cache.stats()['entries'] == 0
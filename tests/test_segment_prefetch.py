@@ -0,0 +1,94 @@
+import http.server
+import socketserver
+import threading
+
+import pytest
+from flask import Flask
+
+from proxy_server import ProxyServer
+from services.hls import rewrite_playlist
+from services.segment_cache import SegmentCache
+from services.segment_prefetch import ThreadedSegmentPrefetcher, _SegmentTracker
+
+PLAYLIST = '#EXTM3U\n#EXTINF:4,\nseg0.ts\n#EXTINF:4,\nseg1.ts\n#EXTINF:4,\nseg2.ts\n#EXTINF:4,\nseg3.ts\n#EXT-X-ENDLIST\n'
+
+
+def test_threaded_prefetcher_fetches_ahead_of_the_request():
+    fetched = []
+    release = threading.Event()
+
+    def fetch(url):
+        fetched.append(url)
+        release.wait(5)
+        return url.encode(), 'video/mp2t'
+
+    cache = SegmentCache(max_bytes=1024 * 1024)
+    prefetcher = ThreadedSegmentPrefetcher(fetch, cache, ahead=2)
+    playlist = rewrite_playlist(PLAYLIST, 'http://cdn.test/v/index.m3u8', lambda url: url)
+
+    prefetcher.track('http://cdn.test/v/index.m3u8', playlist)
+    prefetcher.on_request('http://cdn.test/v/seg0.ts')  # seg1 já em andamento: não repete
+    release.set()
+
+    # Em andamento ou já terminada, a pré-busca é encontrada
+    for name in ('seg0', 'seg1', 'seg2'):
+        url = f'http://cdn.test/v/{name}.ts'
+        assert prefetcher.wait(url).body == url.encode()
+    assert sorted(fetched) == ['http://cdn.test/v/seg0.ts', 'http://cdn.test/v/seg1.ts', 'http://cdn.test/v/seg2.ts']
+    assert prefetcher.wait('http://cdn.test/v/seg3.ts') is None
+
+
+def test_prefetch_finished_before_wait_is_served_from_cache():
+    cache = SegmentCache(max_bytes=1024 * 1024)
+    prefetcher = ThreadedSegmentPrefetcher(lambda url: (b'seg', 'video/mp2t'), cache, ahead=1)
+    prefetcher._inflight['http://cdn.test/v/seg0.ts'] = threading.Event()
+    prefetcher._prefetch('http://cdn.test/v/seg0.ts')  # termina antes do wait
+
+    assert prefetcher.wait('http://cdn.test/v/seg0.ts').body == b'seg'
+
+
+def test_tracker_without_scheduler_cannot_be_created():
+    with pytest.raises(TypeError):
+        _SegmentTracker(SegmentCache())
+
+
+def _serve_hls():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path.endswith('.m3u8'):
+                body, content_type = PLAYLIST.encode(), 'application/vnd.apple.mpegurl'
+            else:
+                body, content_type = self.path.encode() * 100, 'video/mp2t'
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v/'
+
+
+def test_flask_proxy_prefetches_segments_of_rewritten_playlists():
+    server, base = _serve_hls()
+    app = Flask(__name__)
+    try:
+        proxy = ProxyServer()
+        with app.test_request_context('/proxy/stream'):
+            assert proxy.proxy_stream(base + 'index.m3u8').status_code == 200
+
+        cached = proxy.prefetcher.wait(base + 'seg0.ts')
+        assert cached is not None and cached.body == b'/v/seg0.ts' * 100
+        assert proxy.stats()['hls']['tracked_playlists'] == 1
+    finally:
+        server.shutdown()
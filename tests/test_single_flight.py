@@ -0,0 +1,125 @@
+import threading
+import time
+
+from services.single_flight import SingleFlight, StreamTee, TeeRegistry
+
+
+def _chunks(count, size=4):
+    for index in range(count):
+        yield bytes([index]) * size
+
+
+def test_single_flight_shares_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return 'ok'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(2)
+
+    assert calls == [1]
+    assert results == ['ok'] * 6
+    assert flight.stats() == {'executed': 1, 'shared': 5, 'in_flight': 0}
+
+
+def test_single_flight_propagates_errors_and_forgets_key():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError('falhou')
+
+    for _ in range(2):
+        try:
+            flight.do('k', boom)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('exceção não propagada')
+    assert flight.stats()['executed'] == 2
+
+
+def test_tee_fans_out_full_body():
+    tee = StreamTee(client_buffer=1024)
+    first, second = tee.subscribe(), tee.subscribe()
+    done = []
+    tee.start(200, {}, _chunks(10), lambda: None, on_done=done.append)
+
+    bodies = {}
+
+    def read(name, subscriber):
+        bodies[name] = b''.join(subscriber)
+        subscriber.close()
+
+    threads = [threading.Thread(target=read, args=(name, sub)) for name, sub in (('a', first), ('b', second))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+
+    expected = b''.join(_chunks(10))
+    assert bodies == {'a': expected, 'b': expected}
+    assert done == [True]
+
+
+def test_tee_detaches_stalled_client():
+    tee = StreamTee(client_buffer=8, stall_timeout=0.1)
+    fast, slow = tee.subscribe(), tee.subscribe()
+    tee.start(200, {}, _chunks(10), lambda: None)
+
+    body = b''.join(fast)
+    assert body == b''.join(_chunks(10))
+    assert slow.detached
+    assert slow.offset == 0
+
+
+def test_finish_does_not_hold_tee_lock_while_releasing_registry():
+    # on_done tira o tee do registro; outro cliente pode estar em acquire()
+    # com o lock do registro, esperando o lock do tee (ordem inversa)
+    registry = TeeRegistry()
+    key = ('url', '')
+    tee, subscriber, leader = registry.acquire(key)
+    assert leader
+    joined = threading.Event()
+
+    def on_done(complete):
+        follower = threading.Thread(target=lambda: (registry.acquire(key), joined.set()), daemon=True)
+        follower.start()
+        follower.join(1)
+        registry.release(key, tee)
+
+    tee.start(200, {}, _chunks(2), lambda: None, on_done=on_done)
+    reader = threading.Thread(target=lambda: list(subscriber), daemon=True)
+    reader.start()
+    reader.join(3)
+
+    assert not reader.is_alive()
+    assert joined.is_set()
+
+
+def test_last_subscriber_leaving_closes_upstream_once():
+    tee = StreamTee()
+    subscribers = [tee.subscribe() for _ in range(3)]
+    closed = []
+    tee.start(200, {}, _chunks(5), lambda: closed.append(1), on_done=lambda complete: closed.append(complete))
+
+    for subscriber in subscribers:
+        subscriber.close()
+        subscriber.close()
+
+    assert closed == [1, False]
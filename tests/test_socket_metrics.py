@@ -0,0 +1,20 @@
+import pytest
+
+from services.socket_metrics import SocketMetrics
+
+
+def test_totals_are_exported_as_counters_and_gauges_as_gauges():
+    text = SocketMetrics().render(
+        {'streamhive_rooms_live': ('Salas', 3)},
+        {'streamhive_log_dropped_total': ('Descartados', 7),
+         'streamhive_socket_rate_limited_total': ('Recusados', {'chat_message': 2})}
+    )
+
+    assert '# TYPE streamhive_rooms_live gauge\nstreamhive_rooms_live 3\n' in text
+    assert '# TYPE streamhive_log_dropped_total counter\nstreamhive_log_dropped_total 7\n' in text
+    assert 'streamhive_socket_rate_limited_total{event="chat_message"} 2\n' in text
+
+
+def test_counter_without_total_suffix_is_rejected():
+    with pytest.raises(ValueError):
+        SocketMetrics().render({}, {'streamhive_log_dropped': ('Descartados', 7)})
@@ -0,0 +1,29 @@
+from app import app, socketio, socket_service
+
+
+def _connect():
+    flask_client = app.test_client()
+    with flask_client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'ana'
+    return socketio.test_client(app, flask_test_client=flask_client)
+
+
+def _metric(name, event):
+    prefix = f'{name}{{event="{event}"}} '
+    for line in socket_service.metrics.render().splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix):])
+    return 0
+
+
+def test_disconnect_counts_one_call_and_no_error():
+    calls = _metric('streamhive_socket_handler_calls_total', 'disconnect')
+    errors = _metric('streamhive_socket_handler_errors_total', 'disconnect')
+
+    client = _connect()
+    assert client.is_connected()
+    client.disconnect()
+
+    assert _metric('streamhive_socket_handler_calls_total', 'disconnect') == calls + 1
+    assert _metric('streamhive_socket_handler_errors_total', 'disconnect') == errors
@@ -0,0 +1,120 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from services.stream_proxy import create_proxy_app
+
+BODY = bytes(range(256)) * 40
+
+
+def _upstream(hits):
+    async def media(request):
+        hits.append(request.headers.get('Range'))
+        return web.Response(body=BODY, content_type='video/mp4')
+
+    async def ranged(request):
+        hits.append(request.headers.get('Range'))
+        start, end = request.headers['Range'][len('bytes='):].split('-')
+        start = int(start)
+        if start >= len(BODY):
+            return web.Response(status=416, headers={'Content-Range': f'bytes */{len(BODY)}'})
+        end = min(int(end), len(BODY) - 1)
+        return web.Response(status=206, body=BODY[start:end + 1], content_type='video/mp4',
+                            headers={'Content-Range': f'bytes {start}-{end}/{len(BODY)}'})
+
+    async def missing(request):
+        hits.append(None)
+        return web.Response(status=404)
+
+    async def broken(request):
+        response = web.StreamResponse(headers={'Content-Length': str(len(BODY)), 'Content-Type': 'video/mp4'})
+        await response.prepare(request)
+        await response.write(BODY[:100])
+        request.transport.close()  # upstream cai no meio do corpo
+        return response
+
+    app = web.Application()
+    app.router.add_get('/v.mp4', media)
+    app.router.add_get('/ranged.mp4', ranged)
+    app.router.add_get('/missing.mp4', missing)
+    app.router.add_get('/broken.mp4', broken)
+    return app
+
+
+async def _with_proxy(test):
+    hits = []
+    async with TestServer(_upstream(hits)) as upstream:
+        proxy = TestClient(TestServer(create_proxy_app(lambda request: {'uid': '1'})))
+        async with proxy:
+            await test(proxy, str(upstream.make_url('')), hits)
+
+
+def test_relay_streams_body_and_serves_repeats_from_cache():
+    async def test(proxy, base, hits):
+        for _ in range(2):
+            response = await proxy.get('/proxy/stream', params={'url': base + '/v.mp4'})
+            assert response.status == 200
+            assert await response.read() == BODY
+            assert response.headers['Access-Control-Allow-Origin'] == '*'
+        assert hits == [None]
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_relay_passes_range_responses_through():
+    async def test(proxy, base, hits):
+        response = await proxy.get('/proxy/stream', params={'url': base + '/ranged.mp4'},
+                                   headers={'Range': 'bytes=100-199'})
+        assert response.status == 206
+        assert await response.read() == BODY[100:200]
+        assert response.headers['Content-Length'] == '100'
+        assert response.headers['Content-Range'] == f'bytes 100-199/{len(BODY)}'
+
+        response = await proxy.get('/proxy/stream', params={'url': base + '/ranged.mp4'},
+                                   headers={'Range': f'bytes={len(BODY)}-{len(BODY) + 9}'})
+        assert response.status == 416
+        assert response.headers['Content-Range'] == f'bytes */{len(BODY)}'
+
+        assert hits == ['bytes=100-199', f'bytes={len(BODY)}-{len(BODY) + 9}']
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_upstream_failure_before_headers_answers_502():
+    async def test(proxy, base, hits):
+        response = await proxy.get('/proxy/stream', params={'url': base + '/missing.mp4'})
+        assert response.status == 502
+        assert (await response.json()) == {'error': 'Erro no proxy'}
+        assert hits == [None]
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_upstream_failure_after_headers_cuts_the_stream_instead_of_answering_502():
+    async def test(proxy, base, hits):
+        response = await proxy.get('/proxy/stream', params={'url': base + '/broken.mp4'})
+        assert response.status == 200
+        try:
+            body = await asyncio.wait_for(response.read(), 5)
+        except aiohttp.ClientPayloadError:
+            body = None
+        assert body != BODY
+        assert b'Erro no proxy' not in (body or b'')
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_unauthorized_and_invalid_urls_are_rejected():
+    async def test(proxy, base, hits):
+        assert (await proxy.get('/proxy/stream', params={'url': 'ftp://x/y'})).status == 400
+        assert (await proxy.get('/proxy/stream')).status == 400
+
+    asyncio.run(_with_proxy(test))
+
+    async def unauthorized():
+        async with TestClient(TestServer(create_proxy_app(lambda request: None))) as proxy:
+            assert (await proxy.get('/proxy/stream', params={'url': 'http://x/y'})).status == 401
+
+    asyncio.run(unauthorized())
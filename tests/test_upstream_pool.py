@@ -0,0 +1,119 @@
+import http.server
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import threading
+import time
+
+import pytest
+import requests
+
+from services import upstream_pool as pool_module
+from services.upstream_pool import UpstreamPool
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _serve(context=None):
+    server = _Server(('127.0.0.1', 0), _Handler)
+    if context is not None:
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # As conexões contam no pool do módulo; cada teste usa um novo
+    fresh = UpstreamPool(hosts=4, connections_per_host=4, idle_timeout=0)
+    monkeypatch.setattr(pool_module, 'upstream_pool', fresh)
+    return fresh
+
+
+@pytest.mark.filterwarnings('ignore::urllib3.exceptions.InsecureRequestWarning')
+def test_requests_reuse_one_tls_connection(pool, tmp_path):
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl indisponível para gerar o certificado')
+
+    cert, key = tmp_path / 'cert.pem', tmp_path / 'key.pem'
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=127.0.0.1', '-keyout', str(key), '-out', str(cert)],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+    server = _serve(context)
+    url = f'https://127.0.0.1:{server.server_address[1]}/seg.ts'
+
+    try:
+        session = pool.session()
+        for _ in range(5):
+            assert session.get(url, timeout=5, verify=False).content == b'ok'
+    finally:
+        server.shutdown()
+
+    stats = pool.stats()
+    assert stats['checkouts'] == 5
+    assert stats['connections_opened'] == 1
+    assert stats['tls_handshakes'] == 1
+    assert stats['idle'] == 1
+
+
+def test_close_idle_closes_only_stale_connections(pool):
+    server = _serve()
+    url = f'http://127.0.0.1:{server.server_address[1]}/seg.ts'
+
+    try:
+        assert pool.session().get(url, timeout=5).content == b'ok'
+        pool.idle_timeout = 30  # depois da sessão: sem a thread de descarte
+        assert pool.stats()['idle'] == 1
+
+        assert pool.close_idle(now=time.monotonic()) == 0
+        assert pool.close_idle(now=time.monotonic() + 31) == 1
+        assert pool.stats()['idle'] == 0
+        assert pool.stats()['idle_closed'] == 1
+
+        # A vaga continua no pool e a conexão é reaberta sob demanda
+        assert pool.session().get(url, timeout=5).content == b'ok'
+        assert pool.stats()['connections_opened'] == 2
+    finally:
+        server.shutdown()
+
+
+def test_failed_connect_forgets_cached_address(pool, monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]  # porta livre: a conexão é recusada
+
+    monkeypatch.setattr(socket, 'getaddrinfo',
+                        lambda *args, **kwargs: [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port))])
+    forgotten = []
+    original_forget = pool.dns.forget
+    monkeypatch.setattr(pool.dns, 'forget', lambda host, p: (forgotten.append((host, p)), original_forget(host, p)))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.session().get(f'http://upstream.test:{port}/seg.ts', timeout=5)
+
+    assert ('upstream.test', port) in forgotten
+    assert pool.dns.stats()['entries'] == 0
+    assert pool.stats()['connections_opened'] == 0
@@ -0,0 +1,78 @@
+import pytest
+
+from utils import wire_format
+from utils.wire_format import WIRE_COMPACT, WIRE_JSON, WIRE_SCHEMAS, encode_payload, negotiate_wire_format
+
+
+def _decode(event, payload):
+    # Espelha decodeWirePayload de static/js/utils/socket-client.js
+    schema = WIRE_SCHEMAS.get(event)
+    if not schema or not isinstance(payload, dict):
+        return payload
+
+    decoder = {}
+    for long_key, spec in schema.items():
+        if isinstance(spec, tuple):
+            decoder[spec[0]] = (long_key, spec[1])
+        else:
+            decoder[spec] = (long_key, None)
+
+    decoded = {}
+    for short_key, value in payload.items():
+        long_key, kind = decoder.get(short_key, (short_key, None))
+        if kind is None:
+            decoded[long_key] = bool(value) if long_key == 'is_playing' else value
+        elif kind == '[event]':
+            decoded[long_key] = [{'v': item['v'], 'e': item['e'], 'd': _decode(item['e'], item['d'])}
+                                 for item in value]
+        elif kind.startswith('['):
+            decoded[long_key] = [_decode(kind[1:-1], item) for item in value]
+        else:
+            decoded[long_key] = {key: _decode(kind[1:-1], item) for key, item in value.items()}
+    return decoded
+
+
+def test_short_keys_are_unique_per_schema():
+    for event, schema in WIRE_SCHEMAS.items():
+        short_keys = [spec[0] if isinstance(spec, tuple) else spec for spec in schema.values()]
+        assert len(short_keys) == len(set(short_keys)), event
+
+
+@pytest.mark.parametrize('event,payload', [
+    ('video_sync', {'action': 'play', 'current_time': 12.5, 'is_playing': True,
+                    'time': 12.5, 'timestamp': 1000.25, 'v': 3}),
+    ('netflix_sync', {'url': 'https://netflix.example/watch/1', 'timestamp': 1000.0, 'v': 4}),
+    ('roster_diff', {'added': [{'user_id': '2', 'username': 'bia', 'role': 'viewer', 'joined_at': 999.5}],
+                     'removed': ['3'], 'kicked': ['4'], 'count': 2, 'roster_version': 7, 'v': 5}),
+    ('room_resync', {'events': [{'v': 6, 'e': 'video_sync', 'd': {'action': 'pause', 'is_playing': False, 'v': 6}}],
+                     'version': 6, 'epoch': 'ab12', 'current_time': 30.0, 'is_playing': False,
+                     'user_role': 'viewer', 'room_owner_id': '1', 'timestamp': 1001.0}),
+    ('room_state', {'video_url': 'https://cdn.example/v.mp4', 'is_playing': True,
+                    'participants': {'1': {'username': 'ana', 'role': 'owner', 'joined_at': 990.0}},
+                    'participants_count': 1, 'roster_version': 2})
+])
+def test_compact_payload_round_trips(event, payload):
+    encoded = encode_payload(event, payload)
+
+    assert len(str(encoded)) < len(str(payload))
+    assert _decode(event, encoded) == payload
+
+
+def test_encoding_drops_derivable_and_empty_fields():
+    message = {'id': '9', 'user_id': '1', 'username': 'ana', 'message': 'oi',
+               'timestamp': 1000.123456, 'formatted_time': '10:00', 'v': None}
+
+    encoded = encode_payload('new_message', message)
+
+    assert encoded == {'i': '9', 'u': '1', 'n': 'ana', 'm': 'oi', 's': 1000.123}
+    assert encode_payload('unknown_event', message) is message
+
+
+def test_negotiation(monkeypatch):
+    assert negotiate_wire_format({'wire': 'compact'}) == WIRE_COMPACT
+    assert negotiate_wire_format({'wire': 'msgpack'}) == WIRE_JSON
+    assert negotiate_wire_format(None) == WIRE_JSON
+    assert negotiate_wire_format('compact') == WIRE_JSON
+
+    monkeypatch.setattr(wire_format, 'COMPACT_WIRE_ENABLED', False)
+    assert negotiate_wire_format({'wire': 'compact'}) == WIRE_JSON
@@ -0,0 +1,171 @@
+"""
+Streamhive - Benchmark do formato de fio
+Compara tamanho e tempo de codificação dos formatos JSON verboso e compacto
+
+Uso:
+    python tools/bench_wire_format.py [--events 20000] [--participants 30]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.wire_format import WIRE_JSON, WIRE_COMPACT, encode_payload  # noqa: E402
+from services.chat_history import ChatHistory, ChatRecord  # noqa: E402
+
+
+def _dumps(payload) -> str:
+    """Mesma serialização usada pelo python-socketio nos pacotes"""
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def build_traffic(events: int, participants: int, seed: int = 42):
+    """
+    Gera uma sequência realista de eventos de uma sala
+
+    Mistura aproximada: 70% chat, 20% controles de vídeo e 10% entradas e saídas.
+    """
+    rng = random.Random(seed)
+    users = {str(uid): f'usuario_{uid}' for uid in range(1, participants + 1)}
+    now = time.time()
+    phrases = [
+        'kkkkkk', 'que cena!', 'alguém mais travou?', 'volta um pouco',
+        'essa parte é muito boa', 'pausa rapidinho que vou pegar pipoca',
+        'não acredito que ele fez isso', '👀', 'bora próximo episódio',
+    ]
+
+    traffic = []
+    version = 0
+    for i in range(events):
+        version += 1
+        now += rng.uniform(0.05, 1.5)
+        uid = rng.choice(list(users))
+        roll = rng.random()
+
+        if roll < 0.7:
+            traffic.append(('new_message', {
+                'id': f'{uid}_{int(now * 1000)}',
+                'user_id': uid,
+                'username': users[uid],
+                'message': rng.choice(phrases),
+                'timestamp': now,
+                'formatted_time': time.strftime('%H:%M', time.localtime(now)),
+                'v': version
+            }))
+        elif roll < 0.9:
+            action = rng.choice(['play', 'pause', 'seek'])
+            position = rng.uniform(0, 7200)
+            traffic.append(('video_sync', {
+                'action': action,
+                'current_time': position,
+                'is_playing': action != 'pause',
+                'time': position if action == 'seek' else None,
+                'timestamp': now,
+                'v': version
+            }))
+        else:
+            joined = rng.random() < 0.5
+            traffic.append(('roster_diff', {
+                'added': [{
+                    'user_id': uid,
+                    'username': users[uid],
+                    'role': 'participant',
+                    'joined_at': now
+                }] if joined else [],
+                'removed': [] if joined else [uid],
+                'kicked': [],
+                'count': participants,
+                'roster_version': version,
+                'v': version
+            }))
+
+    chat = ChatHistory()
+    for event, payload in traffic:
+        if event == 'new_message':
+            chat.append(ChatRecord.from_dict(payload))
+    traffic.append(('room_state', {
+        'video_url': 'http://cdn.example.com/filmes/o-filme-em-alta-definicao.mp4',
+        'current_time': 1834.2871,
+        'is_playing': True,
+        'participants': {
+            uid: {'username': name, 'role': 'participant', 'joined_at': now - 600}
+            for uid, name in users.items()
+        },
+        'participants_count': participants,
+        'roster_version': version,
+        'chat_messages': chat,
+        'user_role': 'participant',
+        'room_owner_id': 1,
+        'version': version,
+        'epoch': '9f8e7d6c',
+        'timestamp': now
+    }))
+    return traffic
+
+
+def prepare(event, payload, wire):
+    """
+    Separa o histórico do chat, enviado como anexo binário pré-serializado
+
+    Returns:
+        Tuple (payload sem o histórico, bytes do anexo)
+    """
+    if event == 'room_state':
+        attachment = payload['chat_messages'].serialized(wire)
+        return dict(payload, chat_messages={'_placeholder': True, 'num': 0}), attachment
+    return payload, b''
+
+
+def measure(traffic, encoder):
+    """Retorna (bytes totais, segundos) para serializar todo o tráfego"""
+    total = 0
+    start = time.perf_counter()
+    for event, payload in traffic:
+        total += encoder(event, payload)
+    return total, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--participants', type=int, default=30)
+    args = parser.parse_args()
+
+    traffic = build_traffic(args.events, args.participants)
+
+    def encode_json(event, payload):
+        payload, attachment = prepare(event, payload, WIRE_JSON)
+        return len(_dumps(payload).encode('utf-8')) + len(attachment)
+
+    def encode_compact(event, payload):
+        payload, attachment = prepare(event, payload, WIRE_COMPACT)
+        return len(_dumps(encode_payload(event, payload)).encode('utf-8')) + len(attachment)
+
+    json_bytes, json_time = measure(traffic, encode_json)
+    compact_bytes, compact_time = measure(traffic, encode_compact)
+
+    print(f'Eventos: {len(traffic)} ({args.participants} participantes)')
+    print(f'{"formato":<10} {"bytes":>12} {"bytes/evento":>14} {"tempo (ms)":>12} {"µs/evento":>10}')
+    for name, size, elapsed in (('json', json_bytes, json_time), ('compact', compact_bytes, compact_time)):
+        print(f'{name:<10} {size:>12} {size / len(traffic):>14.1f} {elapsed * 1000:>12.1f} '
+              f'{elapsed * 1e6 / len(traffic):>10.2f}')
+    print(f'Redução de tamanho: {(1 - compact_bytes / json_bytes) * 100:.1f}%')
+
+    print('\nPor evento (primeira ocorrência):')
+    seen = set()
+    for event, payload in traffic:
+        if event in seen:
+            continue
+        seen.add(event)
+        verbose = encode_json(event, payload)
+        compact = encode_compact(event, payload)
+        print(f'  {event:<12} {verbose:>7} -> {compact:>7} bytes ({(1 - compact / verbose) * 100:.0f}% menor)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Streamhive - Simulação de rajada de reconexões
+Mede o tempo até todos os clientes voltarem às salas após o reinício de um worker
+
+Cada cliente reconecta no mesmo instante e envia `join_room`. No servidor
+simulado, cada entrada ocupa o banco (capacidade limitada) por um tempo
+fixo, como a consulta de participação e o envio do room_state. Clientes
+que não recebem resposta dentro do timeout desistem e tentam de novo com
+backoff, mas o servidor continua processando a entrada abandonada.
+
+Compara o servidor sem controle de admissão com o AdmissionController,
+que recusa o excedente com uma espera sugerida (honrada com jitter).
+
+Uso:
+    python tools/sim_reconnect_storm.py [--clients 2000] [--service-ms 5] [--db-capacity 4]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.admission import AdmissionController  # noqa: E402
+
+
+class SimulatedServer:
+    """Servidor de entradas em sala com banco de capacidade limitada"""
+
+    def __init__(self, service_ms: float, db_capacity: int, admission: AdmissionController = None):
+        self.service = service_ms / 1000.0
+        self.db = threading.Semaphore(db_capacity)
+        self.admission = admission
+        self.executed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def join_room(self, reply):
+        """Handler de join_room; `reply(retry_after)` faz o papel do emit ao cliente"""
+        if self.admission is not None:
+            retry_after = self.admission.acquire()
+            if retry_after is not None:
+                with self._lock:
+                    self.rejected += 1
+                reply(retry_after)
+                return
+
+        started = time.monotonic()
+        try:
+            with self.db:
+                time.sleep(self.service)
+            with self._lock:
+                self.executed += 1
+            reply(None)
+        finally:
+            if self.admission is not None:
+                self.admission.release(time.monotonic() - started)
+
+
+def run_client(server: SimulatedServer, storm_start: float, timeout: float, results: list, rng: random.Random):
+    """Reconecta e tenta entrar na sala até conseguir"""
+    attempts = 0
+    while True:
+        attempts += 1
+        done = threading.Event()
+        answer = {}
+
+        def reply(retry_after, answer=answer, done=done):
+            answer['retry_after'] = retry_after
+            done.set()
+
+        # python-socketio atende cada evento numa thread própria
+        threading.Thread(target=server.join_room, args=(reply,), daemon=True).start()
+
+        if not done.wait(timeout):
+            # Sem resposta: backoff exponencial com jitter completo
+            time.sleep(rng.random() * min(30.0, 1.0 * 2 ** attempts))
+            continue
+
+        retry_after = answer['retry_after']
+        if retry_after is None:
+            results.append((time.monotonic() - storm_start, attempts))
+            return
+
+        # Recusado: espera sugerida com jitter de ±20% (como o socket-client.js)
+        time.sleep(retry_after * (0.8 + rng.random() * 0.4))
+
+
+def simulate(label: str, clients: int, server: SimulatedServer, timeout: float, seed: int):
+    """Executa uma rajada e imprime o relatório"""
+    results = []
+    storm_start = time.monotonic()
+    threads = [
+        threading.Thread(target=run_client, args=(server, storm_start, timeout, results, random.Random(seed + i)))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for latency, _ in results)
+    attempts = [count for _, count in results]
+    quantiles = statistics.quantiles(latencies, n=100)
+    wasted = server.executed - clients
+
+    print(f'\n{label}')
+    print(f'  recuperação completa:  {latencies[-1]:.2f} s')
+    print(f'  entrada p50/p95/p99:   {quantiles[49]:.2f} / {quantiles[94]:.2f} / {quantiles[98]:.2f} s')
+    print(f'  tentativas por cliente: média {statistics.mean(attempts):.2f}, máx {max(attempts)}')
+    print(f'  entradas processadas:  {server.executed} ({wasted} desperdiçadas por timeout do cliente)')
+    print(f'  recusas com espera:    {server.rejected}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--service-ms', type=float, default=5.0, help='tempo de banco por entrada')
+    parser.add_argument('--db-capacity', type=int, default=4, help='entradas que o banco atende em paralelo')
+    parser.add_argument('--timeout', type=float, default=2.0, help='timeout do cliente por tentativa')
+    parser.add_argument('--max-concurrent', type=int, default=8)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--queue-timeout', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    ideal = args.clients * args.service_ms / 1000.0 / args.db_capacity
+    print(f'{args.clients} clientes, {args.service_ms} ms por entrada, banco com {args.db_capacity} vagas')
+    print(f'limite teórico (banco sempre ocupado): {ideal:.2f} s')
+
+    simulate('Sem controle de admissão', args.clients,
+             SimulatedServer(args.service_ms, args.db_capacity), args.timeout, args.seed)
+
+    admission = AdmissionController(args.max_concurrent, args.max_queue, args.queue_timeout)
+    simulate('Com controle de admissão', args.clients,
+             SimulatedServer(args.service_ms, args.db_capacity, admission), args.timeout, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Streamhive Logging
+Pipeline de logs assíncrono (fila + thread de escrita), em JSON e com amostragem por logger
+"""
+
+import os
+import sys
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Dict, Optional
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:  # python-json-logger < 3
+    try:
+        from pythonjsonlogger.jsonlogger import JsonFormatter
+    except ImportError:
+        JsonFormatter = None
+
+
+# Nível mínimo dos logs da aplicação
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# 'json' (uma linha JSON por registro) ou 'text'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+
+# Registros que cabem na fila antes de começarem a ser descartados
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+# Amostragem padrão dos loggers de alto volume: logger -> fração mantida
+DEFAULT_LOG_SAMPLE_RATES: Dict[str, float] = {
+    'services.socket_service.events': 0.1
+}
+
+# Log de pacotes do Socket.IO / Engine.IO (um registro por pacote; só para depuração)
+SOCKETIO_PACKET_LOGGING = os.environ.get('SOCKETIO_PACKET_LOGGING', '0') == '1'
+
+TEXT_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+JSON_LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s %(message)s'
+
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Lê taxas de amostragem no formato 'logger=fração,logger=fração'
+
+    Args:
+        spec: Texto da variável LOG_SAMPLE_RATES
+
+    Returns:
+        dict: Taxas padrão com as substituições informadas
+    """
+    rates = dict(DEFAULT_LOG_SAMPLE_RATES)
+    if not spec:
+        return rates
+
+    for item in spec.split(','):
+        try:
+            name, rate = item.strip().split('=', 1)
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            print(f"Taxa de amostragem de log inválida ignorada: {item!r}", file=sys.stderr)
+
+    return rates
+
+
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES'))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos registros INFO/DEBUG de loggers ruidosos
+
+    A taxa vem do prefixo mais específico configurado para o logger
+    (`a.b.c` usa a taxa de `a.b.c`, senão de `a.b`, senão de `a`).
+    WARNING e acima nunca são descartados.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+
+        rate = self._resolved.get(record.name)
+        if rate is None:
+            rate = self._resolved[record.name] = self._rate_for(record.name)
+
+        return rate >= 1.0 or random.random() < rate
+
+    def _rate_for(self, name: str) -> float:
+        """Taxa do prefixo configurado mais específico"""
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que descarta registros com a fila cheia em vez de bloquear
+
+    O handler só enfileira; formatação e escrita acontecem na thread do
+    QueueListener. Se a saída não acompanhar, os handlers de eventos
+    continuam rápidos e os registros excedentes são contados em `dropped`.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def build_formatter() -> logging.Formatter:
+    """
+    Formatter da saída final conforme LOG_FORMAT
+
+    Returns:
+        logging.Formatter: JSON (python-json-logger) ou texto
+    """
+    if LOG_FORMAT == 'json' and JsonFormatter is not None:
+        return JsonFormatter(JSON_LOG_FORMAT, rename_fields={'asctime': 'time', 'levelname': 'level', 'name': 'logger'})
+    return logging.Formatter(TEXT_LOG_FORMAT)
+
+
+def configure_logging() -> NonBlockingQueueHandler:
+    """
+    Configura o logging da aplicação (idempotente)
+
+    O logger raiz recebe apenas o QueueHandler; um QueueListener em thread
+    própria formata e escreve em stderr. A fila é esvaziada na saída.
+
+    Returns:
+        NonBlockingQueueHandler: Handler instalado no logger raiz
+    """
+    global _listener, _queue_handler
+
+    if _queue_handler is not None:
+        return _queue_handler
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(build_formatter())
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    # Amostragem antes de enfileirar: registros descartados não custam nada
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    # Sem log de pacotes, os loggers do Socket.IO ficam só com avisos e erros
+    if not SOCKETIO_PACKET_LOGGING:
+        for name in ('socketio', 'engineio', 'socketio.server', 'engineio.server'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    if LOG_FORMAT == 'json' and JsonFormatter is None:
+        logging.getLogger(__name__).warning("python-json-logger não instalado; usando logs em texto")
+
+    return _queue_handler
+
+
+def get_logging_stats() -> Dict[str, int]:
+    """Registros na fila e descartados por fila cheia"""
+    if _queue_handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
@@ -0,0 +1,141 @@
+"""
+Streamhive Proxy Tokens
+Tokens de acesso ao proxy assinados (HMAC) e com validade, verificáveis sem banco ou sessão
+"""
+
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import posixpath
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+
+# Validade dos tokens emitidos na renderização da sala (segundos)
+PROXY_TOKEN_TTL = int(os.environ.get('PROXY_TOKEN_TTL', 12 * 3600))
+
+
+def proxy_token_secret() -> Optional[str]:
+    """Chave de assinatura, compartilhada entre o app e o proxy separado (lida a cada uso, após o .env)"""
+    return os.environ.get('PROXY_TOKEN_SECRET') or os.environ.get('SECRET_KEY')
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _signature(payload: str, secret: str) -> str:
+    return _b64encode(hmac.new(secret.encode('utf-8'), payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_proxy_token(url: str, user_id: Any, room_id: Any, prefix: bool = False,
+                      ttl: Optional[int] = None, secret: Optional[str] = None,
+                      now: Optional[float] = None) -> str:
+    """
+    Emite um token que autoriza o proxy de uma URL
+
+    Args:
+        url: URL autorizada
+        user_id: ID do usuário
+        room_id: ID da sala
+        prefix: Autoriza também as URLs abaixo de `url` (páginas, segmentos HLS)
+        ttl: Validade em segundos (padrão: PROXY_TOKEN_TTL)
+        secret: Chave de assinatura (padrão: PROXY_TOKEN_SECRET ou SECRET_KEY)
+        now: Timestamp atual
+
+    Returns:
+        str: Token no formato `<claims base64url>.<assinatura base64url>`
+    """
+    secret = secret or proxy_token_secret()
+    now = time.time() if now is None else now
+
+    claims = {
+        'url': url,
+        'uid': str(user_id),
+        'rid': str(room_id),
+        'exp': int(now + (PROXY_TOKEN_TTL if ttl is None else ttl))
+    }
+    if prefix:
+        claims['prefix'] = True
+
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f'{payload}.{_signature(payload, secret)}'
+
+
+def verify_proxy_token(token: Optional[str], url: str, secret: Optional[str] = None,
+                       now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Verifica um token para a URL pedida
+
+    Args:
+        token: Token recebido
+        url: URL que o cliente quer acessar pelo proxy
+        secret: Chave de assinatura (padrão: PROXY_TOKEN_SECRET ou SECRET_KEY)
+        now: Timestamp atual
+
+    Returns:
+        dict: Claims (url, uid, rid, exp) se válido, senão None
+    """
+    secret = secret or proxy_token_secret()
+    if not token or not secret or '.' not in token:
+        return None
+
+    payload, signature = token.rsplit('.', 1)
+    if not hmac.compare_digest(signature, _signature(payload, secret)):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+
+    now = time.time() if now is None else now
+    if not isinstance(claims, dict) or claims.get('exp', 0) < now:
+        return None
+
+    if not url_allowed(claims.get('url', ''), url, claims.get('prefix', False)):
+        return None
+
+    return claims
+
+
+def url_allowed(authorized: str, url: str, prefix: bool = False) -> bool:
+    """
+    Indica se `url` é coberta pela URL autorizada no token
+
+    Com `prefix`, a comparação é por segmento de caminho: um token para
+    `https://host/videos` cobre `https://host/videos/seg1.ts`, mas não
+    `https://host/videos-privados` nem `https://host.evil.com`. Os caminhos
+    são comparados decodificados e sem segmentos `.`/`..`, como o upstream
+    os resolve, para que `videos/../privado` não escape do escopo.
+    """
+    if not authorized or not url:
+        return False
+    if url == authorized or not prefix:
+        return url == authorized
+
+    base, target = _scope(authorized), _scope(url)
+    if base is None or target is None or base[:2] != target[:2]:
+        return False
+    return target[2][:len(base[2])] == base[2]
+
+
+def _scope(url: str) -> Optional[Tuple[str, str, List[str]]]:
+    """(esquema, host, segmentos do caminho resolvido) ou None se o caminho sair da raiz"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    path = posixpath.normpath('/' + unquote(parts.path))
+    segments = [segment for segment in path.split('/') if segment]
+    if '..' in segments:
+        return None
+    return parts.scheme.lower(), parts.netloc.lower(), segments
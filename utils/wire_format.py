@@ -0,0 +1,169 @@
+"""
+Streamhive Wire Format
+Codificação compacta (chaves curtas) dos eventos Socket.IO
+"""
+
+import os
+from typing import Dict, Any, Optional, Union, Tuple
+
+
+# Formatos aceitos na negociação do `connect`
+WIRE_JSON = 'json'
+WIRE_COMPACT = 'compact'
+SUPPORTED_WIRE_FORMATS = (WIRE_JSON, WIRE_COMPACT)
+
+# Permite desligar a codificação compacta sem alterar os clientes
+COMPACT_WIRE_ENABLED = os.environ.get('SOCKET_COMPACT_WIRE', '1') != '0'
+
+
+# Schema: chave longa -> chave curta, ou (chave curta, tipo aninhado)
+# Os tipos aninhados são '[schema]' (lista) e '{schema}' (mapa de valores)
+MESSAGE_SCHEMA = {
+    'id': 'i',
+    'user_id': 'u',
+    'username': 'n',
+    'message': 'm',
+    'timestamp': 's',
+    'v': 'v'
+}
+
+PARTICIPANT_SCHEMA = {
+    'username': 'n',
+    'role': 'r',
+    'joined_at': 'j'
+}
+
+MEMBER_SCHEMA = dict(PARTICIPANT_SCHEMA, user_id='u')
+
+WIRE_SCHEMAS: Dict[str, Dict[str, Union[str, Tuple[str, str]]]] = {
+    'video_sync': {
+        'action': 'a',
+        'current_time': 't',
+        'is_playing': 'p',
+        'time': 'k',
+        'timestamp': 's',
+        'v': 'v'
+    },
+    'new_message': MESSAGE_SCHEMA,
+    'netflix_sync': {
+        'url': 'u',
+        'timestamp': 's',
+        'v': 'v'
+    },
+    'roster_diff': {
+        'added': ('A', '[member]'),
+        'removed': 'D',
+        'kicked': 'K',
+        'count': 'c',
+        'roster_version': 'R',
+        'v': 'v'
+    },
+    'roster_page': {
+        'members': ('L', '[member]'),
+        'offset': 'f',
+        'total': 'c',
+        'roster_version': 'R'
+    },
+    'room_state': {
+        'video_url': 'U',
+        'current_time': 't',
+        'is_playing': 'p',
+        'netflix': 'N',
+        'participants': ('P', '{participant}'),
+        'participants_count': 'c',
+        'roster_version': 'R',
+        # Já chega como array JSON serializado (bytes) no formato do cliente
+        'chat_messages': 'M',
+        'user_role': 'r',
+        'room_owner_id': 'o',
+        'version': 'v',
+        'epoch': 'e',
+        'timestamp': 's'
+    },
+    'room_resync': {
+        'events': ('E', '[event]'),
+        'version': 'v',
+        'epoch': 'e',
+        'current_time': 't',
+        'is_playing': 'p',
+        'netflix': 'N',
+        'user_role': 'r',
+        'room_owner_id': 'o',
+        'timestamp': 's'
+    },
+    'participant': PARTICIPANT_SCHEMA,
+    'member': MEMBER_SCHEMA
+}
+
+
+def negotiate_wire_format(auth: Optional[Dict[str, Any]]) -> str:
+    """
+    Escolhe o formato de fio a partir do payload de autenticação do `connect`
+
+    Args:
+        auth: Payload `auth` enviado pelo cliente Socket.IO
+
+    Returns:
+        str: 'compact' se pedido e habilitado, senão 'json'
+    """
+    requested = (auth or {}).get('wire') if isinstance(auth, dict) else None
+    if requested == WIRE_COMPACT and COMPACT_WIRE_ENABLED:
+        return WIRE_COMPACT
+    return WIRE_JSON
+
+
+def _encode_value(value: Any) -> Any:
+    """Reduz valores escalares: booleanos viram 0/1 e floats ficam com 3 casas"""
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def _encode_nested(kind: str, value: Any) -> Any:
+    """Codifica listas '[schema]' e mapas '{schema}'"""
+    name = kind[1:-1]
+
+    if kind.startswith('['):
+        if name == 'event':
+            return [
+                {'v': item['v'], 'e': item['e'], 'd': encode_payload(item['e'], item['d'])}
+                for item in value
+            ]
+        return [encode_payload(name, item) for item in value]
+
+    return {key: encode_payload(name, item) for key, item in value.items()}
+
+
+def encode_payload(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte o payload de um evento para o formato compacto
+
+    Chaves sem schema são mantidas, valores None são omitidos e campos
+    deriváveis pelo cliente (como `formatted_time`) são descartados.
+
+    Args:
+        event: Nome do evento
+        payload: Payload no formato JSON verboso
+
+    Returns:
+        dict: Payload com chaves curtas
+    """
+    schema = WIRE_SCHEMAS.get(event)
+    if not schema or not isinstance(payload, dict):
+        return payload
+
+    encoded = {}
+    for key, value in payload.items():
+        if value is None or key == 'formatted_time':
+            continue
+
+        spec = schema.get(key, key)
+        if isinstance(spec, tuple):
+            short_key, kind = spec
+            encoded[short_key] = _encode_nested(kind, value)
+        else:
+            encoded[spec] = _encode_value(value)
+
+    return encoded